@@ -0,0 +1,155 @@
+"""
+Benchmark suite for the store API. Each scenario drives a real URL route:
+
+    products list     GET  /store/products/
+    product detail    GET  /store/products/{id}/
+    cart add_product  POST /store/cart/add_product/              (JWT)
+    order complete    POST /store/orders/{id}/complete_order/    (JWT, one pending order per request)
+    orders list       GET  /store/orders/                         (JWT, order history from the order lines)
+    login             POST /api/auth/login/                       (password hashing, fewer requests)
+
+By default the requests go through Django's test client from worker threads,
+against a freshly seeded temporary database. With --base-url they are sent as
+real HTTP requests to a running server instead. The suite then seeds the
+database from the current settings (point CSTORE_DB_NAME at the server's
+database). Queries per request are read from the X-Query-Count header of one
+sample request per scenario; against a server, that header only appears when
+the server runs with CSTORE_METRICS=1 and DEBUG.
+
+The JSON output (--json) is meant to be diffed between commits.
+
+Usage: python benchmarks/bench_api.py [--users 500] [--products 500] [--requests 400]
+                                      [--concurrency 8] [--base-url http://127.0.0.1:8000] [--json results.json]
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import urllib.request
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import drivers  # noqa: E402
+from benchmarks.utils import report, setup_django, setup_temp_database, summarize  # noqa: E402
+
+PASSWORD = 'bench-passwort'
+
+
+def seed(args):
+    from django.contrib.auth import get_user_model
+
+    from benchmarks.seed import seed_catalog, seed_orders
+    from cstore.authentication import ClaimsTokenObtainPairSerializer
+    from store.models import Product
+
+    products = [product.id for product in seed_catalog(products=args.products)]
+    # Eine offene Bestellung pro Anfrage des Checkout-Szenarios (plus eine für die Stichprobe)
+    orders = seed_orders(users=max(args.users, args.requests + 1), password=PASSWORD, status='pending')
+    # Genug Bestand für die angelegten Produkte, damit kein Checkout an der Menge scheitert
+    Product.objects.filter(id__in=products).update(quantity=10 ** 6)
+    users = {user.id: user for user in get_user_model().objects.filter(id__in=[order.user_id for order in orders])}
+    tokens = {
+        user_id: str(ClaimsTokenObtainPairSerializer.get_token(user).access_token) for user_id, user in users.items()
+    }
+    return {
+        'products': products,
+        'orders': [(order.id, order.user_id) for order in orders],
+        'users': [(user.id, user.username) for user in users.values()],
+        'tokens': tokens,
+    }
+
+
+def build_scenarios(data):
+    # Szenario: (Name, Anteil an --requests, Funktion Index -> (Methode, Pfad, JSON-Körper, Header))
+    products, orders, users, tokens = data['products'], data['orders'], data['users'], data['tokens']
+
+    def auth(user_id):
+        return {'Authorization': f'Bearer {tokens[user_id]}'}
+
+    def add_product(i):
+        user_id = users[i % len(users)][0]
+        body = {'product_id': products[i % len(products)], 'quantity': 1}
+        return 'POST', '/store/cart/add_product/', body, auth(user_id)
+
+    def complete_order(i):
+        order_id, user_id = orders[i]
+        return 'POST', f'/store/orders/{order_id}/complete_order/', None, auth(user_id)
+
+    def orders_list(i):
+        return 'GET', '/store/orders/', None, auth(orders[i % len(orders)][1])
+
+    def login(i):
+        return 'POST', '/api/auth/login/', {'username': users[i % len(users)][1], 'password': PASSWORD}, {}
+
+    return [
+        ('products list', 1, lambda i: ('GET', '/store/products/', None, {})),
+        ('product detail', 1, lambda i: ('GET', f'/store/products/{products[i % len(products)]}/', None, {})),
+        ('cart add_product', 1, add_product),
+        ('order complete', 1, complete_order),
+        ('orders list', 1, orders_list),
+        ('login', 0.05, login),
+    ]
+
+
+def client_call(build, counter):
+    # Anfrage über den Django-Testclient; jede Anfrage erhält einen eigenen Index
+    def call(client):
+        method, path, body, headers = build(next(counter))
+        if method == 'GET':
+            return client.get(path, headers=headers)
+        return client.post(path, json.dumps(body or {}), content_type='application/json', headers=headers)
+    return call
+
+
+def http_request(base_url, build, counter):
+    def make():
+        method, path, body, headers = build(next(counter))
+        data = json.dumps(body).encode() if body is not None else None
+        if data is not None:
+            headers = {**headers, 'Content-Type': 'application/json'}
+        return urllib.request.Request(base_url.rstrip('/') + path, data=data, headers=headers, method=method)
+    return make
+
+
+def sample_queries(response_headers):
+    value = response_headers.get('X-Query-Count')
+    return int(value) if value is not None else None
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--users', type=int, default=500)
+    parser.add_argument('--products', type=int, default=500)
+    parser.add_argument('--requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--base-url')
+    parser.add_argument('--json', dest='output')
+    args = parser.parse_args()
+
+    if args.base_url:
+        setup_django()
+    else:
+        setup_temp_database(DEBUG=False, ALLOWED_HOSTS=['*'], METRICS_ENABLED=True, METRICS_RESPONSE_HEADER=True)
+    from django.test import Client
+
+    data = seed(args)
+    results = []
+    for name, share, build in build_scenarios(data):
+        requests = max(1, int(args.requests * share))
+        counter = itertools.count()
+        if args.base_url:
+            with urllib.request.urlopen(http_request(args.base_url, build, counter)(), timeout=30) as response:
+                queries = sample_queries(response.headers)
+            latencies, elapsed, errors = drivers.http_load(
+                http_request(args.base_url, build, counter), args.concurrency, requests)
+        else:
+            queries = sample_queries(client_call(build, counter)(Client()))
+            latencies, elapsed, errors = drivers.threaded_client_load(
+                client_call(build, counter), args.concurrency, requests)
+        results.append(summarize(name, latencies, elapsed, errors=errors, queries=queries))
+    report(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,66 @@
+"""
+Load test comparing the WSGI (sync DRF views) and ASGI (async views) read paths.
+
+Without arguments both stacks are driven in-process against a freshly seeded
+temporary database: the WSGI side through Django's test client from worker
+threads, the ASGI side through AsyncClient tasks on one event loop.
+
+To measure real servers, start them against the same database and pass their
+base URLs, e.g.:
+
+    gunicorn cstore.wsgi -w 4 -b 127.0.0.1:8000
+    uvicorn cstore.asgi:application --workers 4 --port 8001
+    python benchmarks/bench_asgi.py --wsgi-url http://127.0.0.1:8000 --asgi-url http://127.0.0.1:8001
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import drivers  # noqa: E402
+from benchmarks.utils import report, setup_temp_database, summarize  # noqa: E402
+
+# Gleiche Lesezugriffe einmal als synchrone DRF-Route und einmal als asynchrone Route
+ROUTES = [
+    ('product list', '/store/products/', '/store/async/products/'),
+    ('product detail', '/store/products/{product}/', '/store/async/products/{product}/'),
+]
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--wsgi-url')
+    parser.add_argument('--asgi-url')
+    parser.add_argument('--concurrency', type=int, default=16)
+    parser.add_argument('--requests', type=int, default=800)
+    parser.add_argument('--products', type=int, default=200)
+    parser.add_argument('--product-id', type=int, default=1)
+    parser.add_argument('--json', dest='output')
+    args = parser.parse_args()
+
+    results = []
+    if args.wsgi_url and args.asgi_url:
+        for name, sync_path, async_path in ROUTES:
+            for label, base, path in (('wsgi', args.wsgi_url, sync_path), ('asgi', args.asgi_url, async_path)):
+                url = base.rstrip('/') + path.format(product=args.product_id)
+                latencies, elapsed, errors = drivers.http_load(url, args.concurrency, args.requests)
+                results.append(summarize(f'{label} {name}', latencies, elapsed, errors=errors))
+    else:
+        setup_temp_database(DEBUG=False, ALLOWED_HOSTS=['*'])
+        from benchmarks.seed import seed_catalog
+
+        product = seed_catalog(products=args.products)[0].id
+        for name, sync_path, async_path in ROUTES:
+            sync_url, async_url = sync_path.format(product=product), async_path.format(product=product)
+            latencies, elapsed, errors = drivers.threaded_client_load(
+                lambda client: client.get(sync_url), args.concurrency, args.requests)
+            results.append(summarize(f'wsgi {name}', latencies, elapsed, errors=errors))
+            latencies, elapsed, errors = drivers.async_client_load(
+                lambda client: client.get(async_url), args.concurrency, args.requests)
+            results.append(summarize(f'asgi {name}', latencies, elapsed, errors=errors))
+    report(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,92 @@
+"""
+Query plans and timings for the hot filters in store/views.py, with and
+without the indexes from migration 0013. It seeds a temporary database,
+runs each query with the indexes, then drops them (restoring the plain
+foreign-key index on store_order.user_id) and runs the queries again.
+
+Usage: python benchmarks/bench_indexes.py [--products 20000] [--users 20000] [--iterations 50] [--json results.json]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.utils import measure, report, setup_temp_database  # noqa: E402
+
+
+def build_queries(user_id):
+    from django.db.models import Count
+
+    from store.models import Cart, Order, Product
+
+    products = Product.objects.filter(category='sale', price__gte=100, price__lte=200)
+    return [
+        # ProductViewSet.run_search mit Kategorie- und Preisfilter
+        ('search page', products.order_by('id')[:20], list),
+        ('search count', products.order_by(), lambda queryset: queryset.count()),
+        # Kategorie-Facette wie in store.search.facets
+        ('search facets', Product.objects.filter(id__in=products.order_by().values('id'))
+         .values('category').annotate(count=Count('id')).order_by('-count', 'category'), list),
+        # OrderViewSet.get_queryset und async_views.order_list
+        ('orders of user', Order.objects.filter(user_id=user_id).order_by('-created_at'), list),
+        # Cart.objects.get_or_create(user=...) in den Warenkorb-Views (OneToOne, bereits eindeutig indiziert)
+        ('cart of user', Cart.objects.filter(user_id=user_id), list),
+    ]
+
+
+def run(label, queries, iterations):
+    results = []
+    print(f'\n== {label}')
+    for name, queryset, execute in queries:
+        print(f'-- {name}')
+        for line in queryset.explain().splitlines():
+            print(f'   {line}')
+        # all() umgeht den Ergebnis-Cache des QuerySets, damit jede Iteration die Datenbank abfragt
+        results.append(measure(f'{label}: {name}', lambda: execute(queryset.all()), iterations))
+    return results
+
+
+def drop_indexes():
+    from django.db import connection
+
+    from store.models import Order, Product
+
+    with connection.schema_editor() as editor:
+        for model in (Product, Order):
+            for index in model._meta.indexes:
+                editor.remove_index(model, index)
+        # Vor der Migration hatte Order.user den einfachen Fremdschlüsselindex
+        editor.execute('CREATE INDEX store_order_user_id_plain ON store_order (user_id)')
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=20000)
+    parser.add_argument('--users', type=int, default=20000)
+    parser.add_argument('--iterations', type=int, default=50)
+    parser.add_argument('--json', dest='output')
+    args = parser.parse_args()
+
+    setup_temp_database()
+    from django.db import connection
+
+    from benchmarks.seed import seed_catalog, seed_orders
+
+    seed_catalog(products=args.products, comments_per_product=0)
+    orders = seed_orders(users=args.users)
+    queries = build_queries(orders[len(orders) // 2].user_id)
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+
+    after = run('with indexes', queries, args.iterations)
+    drop_indexes()
+    with connection.cursor() as cursor:
+        cursor.execute('ANALYZE')
+    before = run('without indexes', queries, args.iterations)
+    print()
+    report(before + after, args.output)
+
+
+if __name__ == '__main__':
+    main()
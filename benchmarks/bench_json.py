@@ -0,0 +1,56 @@
+"""
+Throughput benchmark for cstore.renderers.FastJSONRenderer against DRF's
+JSONRenderer. It uses serialized product rows and raw .values() rows with
+Decimal and datetime objects, and checks that both renderers produce
+identical bytes.
+
+Usage: python benchmarks/bench_json.py [--products 2000] [--iterations 20] [--json results.json]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.utils import measure, report, setup_temp_database  # noqa: E402
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--products', type=int, default=2000)
+    parser.add_argument('--iterations', type=int, default=20)
+    parser.add_argument('--json', dest='output')
+    args = parser.parse_args()
+
+    setup_temp_database()
+    from django.utils import timezone
+    from rest_framework.renderers import JSONRenderer
+
+    from benchmarks.seed import seed_catalog
+    from cstore import renderers
+    from store.models import Product
+    from store.serializers import ProductSerializer
+
+    seed_catalog(products=args.products, comments_per_product=1)
+    serialized = ProductSerializer(Product.objects.prefetch_related('tags', 'comments__user'), many=True).data
+    # Rohdaten mit Decimal-Preisen und Zeitstempeln wie Order.created_at
+    now = timezone.now()
+    raw = [
+        dict(row, created_at=now, total=row['price'] * row['quantity'])
+        for row in Product.objects.values('id', 'name', 'price', 'quantity', 'description', 'comment_count')
+    ]
+
+    drf, fast = JSONRenderer(), renderers.FastJSONRenderer()
+    results = []
+    for label, data in (('serialized products', serialized), ('raw values (Decimal/datetime)', raw)):
+        if drf.render(data) != fast.render(data):
+            raise SystemExit(f'Output differs for {label}')
+        results.append(measure(f'drf {label}', lambda: drf.render(data), args.iterations))
+        results.append(measure(f'fast {label}', lambda: fast.render(data), args.iterations))
+        results.append(measure(f'fast streamed {label}', lambda: b''.join(fast.render_iter(data)), args.iterations))
+    print('orjson:', 'yes' if renderers.orjson is not None else 'no (stdlib fallback)')
+    report(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
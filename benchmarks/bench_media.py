@@ -0,0 +1,56 @@
+"""
+Benchmark for serving product images with cstore.media.serve compared to
+django.views.static.serve.
+
+Usage: python benchmarks/bench_media.py [--iterations 500] [--file products/airpods.png] [--json results.json]
+"""
+import argparse
+import os
+import sys
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.utils import measure, report, setup_django  # noqa: E402
+
+
+def consume(response):
+    # Antwort vollständig lesen, wie es ein Client tun würde
+    if response.streaming:
+        for _ in response.streaming_content:
+            pass
+    response.close()
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__)
+    parser.add_argument('--iterations', type=int, default=500)
+    parser.add_argument('--file', default='products/airpods.png')
+    parser.add_argument('--json', dest='output')
+    args = parser.parse_args()
+
+    setup_django()
+    from django.conf import settings
+    from django.test import RequestFactory
+    from django.views.static import serve as static_serve
+
+    from cstore.media import serve
+
+    factory = RequestFactory()
+    root = settings.MEDIA_ROOT
+    first = serve(factory.get('/'), args.file)
+    etag, last_modified = first['ETag'], first['Last-Modified']
+    consume(first)
+
+    scenarios = [
+        ('static.serve full', lambda: consume(static_serve(factory.get('/'), args.file, document_root=root))),
+        ('media.serve full', lambda: consume(serve(factory.get('/'), args.file))),
+        ('static.serve if-modified-since', lambda: consume(static_serve(
+            factory.get('/', HTTP_IF_MODIFIED_SINCE=last_modified), args.file, document_root=root))),
+        ('media.serve if-none-match', lambda: consume(serve(factory.get('/', HTTP_IF_NONE_MATCH=etag), args.file))),
+        ('media.serve range 4 KiB', lambda: consume(serve(factory.get('/', HTTP_RANGE='bytes=0-4095'), args.file))),
+    ]
+    report([measure(name, func, args.iterations) for name, func in scenarios], args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,99 @@
+"""
+Benchmark for user registration (POST /api/auth/create/) under a signup burst.
+
+Three runs against a freshly seeded temporary database:
+
+    signups             registrations only (signups/s and latency)
+    cart alone          authenticated POST /store/cart/add_product/ as a baseline
+    cart during burst   the same cart traffic while the signup burst runs in parallel
+
+Password hashes run in the bounded pool from cstore.hashers. --iterations sets
+PASSWORD_HASH_ITERATIONS, --hash-workers PASSWORD_HASH_WORKERS. When the pool and
+its queue are full, a signup is rejected with 503 and counted as an error. Compare
+the "cart during burst" latencies across worker counts to see how much CPU
+signups take from cart traffic.
+
+Usage: python benchmarks/bench_signup.py [--signups 200] [--cart-requests 400] [--concurrency 8]
+                                         [--iterations 0] [--hash-workers 2] [--json results.json]
+"""
+import argparse
+import itertools
+import json
+import os
+import sys
+import threading
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks import drivers  # noqa: E402
+from benchmarks.utils import report, setup_temp_database, summarize  # noqa: E402
+
+
+def signup_call(prefix):
+    counter = itertools.count()
+
+    def call(client):
+        payload = {'username': f'{prefix}-{next(counter)}', 'password': 'bench-passwort-42'}
+        return client.post('/api/auth/create/', json.dumps(payload), content_type='application/json')
+    return call
+
+
+def cart_call(products, tokens):
+    counter = itertools.count()
+
+    def call(client):
+        i = next(counter)
+        body = {'product_id': products[i % len(products)], 'quantity': 1}
+        return client.post(
+            '/store/cart/add_product/', json.dumps(body), content_type='application/json',
+            headers={'Authorization': f'Bearer {tokens[i % len(tokens)]}'},
+        )
+    return call
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--signups', type=int, default=200)
+    parser.add_argument('--cart-requests', type=int, default=400)
+    parser.add_argument('--concurrency', type=int, default=8)
+    parser.add_argument('--iterations', type=int, default=0, help='PBKDF2 iterations (0 = Django default)')
+    parser.add_argument('--hash-workers', type=int, default=2)
+    parser.add_argument('--json', dest='output')
+    args = parser.parse_args()
+
+    setup_temp_database(
+        DEBUG=False, ALLOWED_HOSTS=['*'],
+        PASSWORD_HASH_ITERATIONS=args.iterations, PASSWORD_HASH_WORKERS=args.hash_workers,
+    )
+    from benchmarks.seed import seed_catalog, seed_orders
+    from cstore.authentication import ClaimsTokenObtainPairSerializer
+    from store.models import Product
+
+    products = [product.id for product in seed_catalog(products=200)]
+    orders = seed_orders(users=args.concurrency)
+    Product.objects.filter(id__in=products).update(quantity=10 ** 6)
+    tokens = [str(ClaimsTokenObtainPairSerializer.get_token(order.user).access_token) for order in orders]
+
+    results = []
+    latencies, elapsed, errors = drivers.threaded_client_load(signup_call('alone'), args.concurrency, args.signups)
+    results.append(summarize('signups', latencies, elapsed, errors=errors))
+
+    latencies, elapsed, errors = drivers.threaded_client_load(
+        cart_call(products, tokens), args.concurrency, args.cart_requests)
+    results.append(summarize('cart alone', latencies, elapsed, errors=errors))
+
+    # Registrierungswelle im Hintergrund, währenddessen dieselbe Warenkorb-Last
+    burst = {}
+    thread = threading.Thread(target=lambda: burst.update(result=drivers.threaded_client_load(
+        signup_call('burst'), args.concurrency, args.signups)))
+    thread.start()
+    latencies, elapsed, errors = drivers.threaded_client_load(
+        cart_call(products, tokens), args.concurrency, args.cart_requests)
+    thread.join()
+    results.append(summarize('cart during burst', latencies, elapsed, errors=errors))
+    results.append(summarize('signups during cart traffic', *burst['result'][:2], errors=burst['result'][2]))
+    report(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
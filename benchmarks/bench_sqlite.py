@@ -0,0 +1,115 @@
+"""
+Multi-process write/read stress test for the SQLite profile in cstore.sqlite.
+
+Writer processes add products to their own carts (Cart.add_product, one short
+transaction per call). Reader processes page through the product list at the
+same time. Each process mimics the request cycle by calling
+close_old_connections() after every operation. Two profiles run against
+copies of the same seeded database:
+
+    default  django.db.backends.sqlite3, rollback journal, CONN_MAX_AGE=0
+    tuned    cstore.sqlite: WAL, synchronous=NORMAL, mmap, cache, busy_timeout,
+             BEGIN IMMEDIATE and persistent connections
+
+Usage: python benchmarks/bench_sqlite.py [--writers 4] [--readers 8] [--duration 10] [--json results.json]
+"""
+import argparse
+import multiprocessing
+import os
+import shutil
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from benchmarks.utils import report, setup_django, setup_temp_database, summarize  # noqa: E402
+
+PROFILES = {
+    'default': {'ENGINE': 'django.db.backends.sqlite3', 'CONN_MAX_AGE': 0, 'OPTIONS': {}},
+    'tuned': {
+        'ENGINE': 'cstore.sqlite',
+        'CONN_MAX_AGE': 600,
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {'transaction_mode': 'IMMEDIATE'},
+    },
+}
+
+
+def worker(role, index, profile, path, duration, queue):
+    setup_django(DATABASES={'default': {**PROFILES[profile], 'NAME': path}})
+    from django.db import OperationalError, close_old_connections
+
+    from store.models import Cart, Product
+
+    products = list(Product.objects.order_by('id')[:50])
+    cart = Cart.objects.order_by('id')[index] if role == 'writer' else None
+    latencies, errors, step = [], 0, 0
+    deadline = time.perf_counter() + duration
+    while time.perf_counter() < deadline:
+        begin = time.perf_counter()
+        try:
+            if role == 'writer':
+                cart.add_product(products[step % len(products)], 1)
+            else:
+                offset = (step * 20) % 1000
+                list(Product.objects.order_by('id').values('id', 'name', 'price')[offset:offset + 20])
+            latencies.append(time.perf_counter() - begin)
+        except OperationalError:
+            # "database is locked"
+            errors += 1
+        step += 1
+        # Wie am Ende einer Anfrage: Verbindung schließen, sofern CONN_MAX_AGE abgelaufen ist
+        close_old_connections()
+    queue.put((role, latencies, errors))
+
+
+def run_profile(profile, source, args):
+    path = f'{source}.{profile}'
+    shutil.copy(source, path)
+    context = multiprocessing.get_context('spawn')
+    queue = context.Queue()
+    processes = [
+        context.Process(target=worker, args=(role, index, profile, path, args.duration, queue))
+        for role, count in (('writer', args.writers), ('reader', args.readers))
+        for index in range(count)
+    ]
+    for process in processes:
+        process.start()
+    outcomes = [queue.get() for _ in processes]
+    for process in processes:
+        process.join()
+
+    results = []
+    for role in ('writer', 'reader'):
+        latencies = [value for name, values, _ in outcomes if name == role for value in values]
+        errors = sum(count for name, _, count in outcomes if name == role)
+        results.append(summarize(f'{profile} {role}s', latencies, args.duration, errors=errors))
+    return results
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument('--writers', type=int, default=4)
+    parser.add_argument('--readers', type=int, default=8)
+    parser.add_argument('--duration', type=float, default=10)
+    parser.add_argument('--products', type=int, default=1000)
+    parser.add_argument('--json', dest='output')
+    args = parser.parse_args()
+
+    source = setup_temp_database()
+    from django.db import connection
+
+    from benchmarks.seed import seed_catalog, seed_orders
+
+    seed_catalog(products=args.products, comments_per_product=0)
+    seed_orders(users=args.writers, items_per_cart=0)
+    connection.close()
+
+    results = []
+    for profile in PROFILES:
+        results += run_profile(profile, source, args)
+    report(results, args.output)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,102 @@
+import threading
+import time
+import urllib.error
+import urllib.request
+
+# Lastgeneratoren: echte HTTP-Anfragen aus mehreren Threads oder Anfragen im selben Prozess
+
+
+def http_load(url, concurrency=8, requests=400, headers=None, method='GET', body=None):
+    # Anfragen aus `concurrency` Threads senden und die Latenz jeder Anfrage messen
+    latencies, errors = [], []
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker():
+        while True:
+            with lock:
+                if next(counter, None) is None:
+                    return
+            # url kann auch eine Funktion sein, die für jede Anfrage einen eigenen urllib-Request baut
+            if callable(url):
+                request = url()
+            else:
+                request = urllib.request.Request(url, data=body, headers=headers or {}, method=method)
+            begin = time.perf_counter()
+            try:
+                with urllib.request.urlopen(request, timeout=30) as response:
+                    response.read()
+            except (urllib.error.URLError, OSError) as exc:
+                errors.append(exc)
+                continue
+            with lock:
+                latencies.append(time.perf_counter() - begin)
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, time.perf_counter() - start, len(errors)
+
+
+def threaded_client_load(call, concurrency=8, requests=400):
+    # Wie http_load, aber mit einem Django-Testclient pro Thread (WSGI-Pfad im selben Prozess)
+    from django.db import connection
+    from django.test import Client
+
+    latencies, errors = [], []
+    lock = threading.Lock()
+    counter = iter(range(requests))
+
+    def worker():
+        client = Client()
+        try:
+            while True:
+                with lock:
+                    if next(counter, None) is None:
+                        return
+                begin = time.perf_counter()
+                response = call(client)
+                elapsed = time.perf_counter() - begin
+                with lock:
+                    if response.status_code >= 400:
+                        errors.append(response.status_code)
+                    latencies.append(elapsed)
+        finally:
+            connection.close()
+
+    threads = [threading.Thread(target=worker) for _ in range(concurrency)]
+    start = time.perf_counter()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    return latencies, time.perf_counter() - start, len(errors)
+
+
+def async_client_load(call, concurrency=8, requests=400):
+    # `concurrency` gleichzeitige Aufgaben mit dem AsyncClient (ASGI-Pfad im selben Prozess)
+    import asyncio
+
+    from django.test import AsyncClient
+
+    async def run():
+        latencies, errors = [], []
+        remaining = iter(range(requests))
+
+        async def worker():
+            client = AsyncClient()
+            while next(remaining, None) is not None:
+                begin = time.perf_counter()
+                response = await call(client)
+                latencies.append(time.perf_counter() - begin)
+                if response.status_code >= 400:
+                    errors.append(response.status_code)
+
+        start = time.perf_counter()
+        await asyncio.gather(*(worker() for _ in range(concurrency)))
+        return latencies, time.perf_counter() - start, len(errors)
+
+    return asyncio.run(run())
@@ -0,0 +1,80 @@
+import random
+from decimal import Decimal
+
+# Datengenerator für Benchmarks: legt Produkte mit Tags und Kommentaren an
+
+TAGS = ['audio', 'apple', 'samsung', 'kabellos', 'gaming', 'zubehör', 'smartphone', 'uhr']
+WORDS = ['kopfhörer', 'lautsprecher', 'telefon', 'ladegerät', 'kabel', 'hülle', 'display', 'akku', 'bass', 'klang']
+
+
+def seed_catalog(products=200, comments_per_product=2, seed=1):
+    from django.contrib.auth import get_user_model
+    from taggit.models import Tag
+
+    from store.models import Comment, Product
+
+    rng = random.Random(seed)
+    author, _ = get_user_model().objects.get_or_create(username='bench-author')
+    categories = [choice for choice, _ in Product.CATEGORY_CHOICES]
+    products = [
+        Product(
+            name=f'{rng.choice(WORDS).title()} {i}',
+            category=rng.choice(categories),
+            image='',
+            price=Decimal(rng.randint(100, 100000)) / 100,
+            quantity=rng.randint(0, 500),
+            description=' '.join(rng.choice(WORDS) for _ in range(30)),
+        )
+        for i in range(products)
+    ]
+    # Eindeutige Slugs wie beim Import gesammelt vergeben
+    Product.assign_slugs(products)
+    created = Product.objects.bulk_create(products)
+    tags = {name: Tag.objects.get_or_create(name=name)[0] for name in TAGS}
+    for product in created:
+        product.tags.add(*[tags[name] for name in rng.sample(TAGS, 2)])
+        comments = Comment.objects.bulk_create(
+            Comment(user=author, content=f'Kommentar {n}') for n in range(comments_per_product)
+        )
+        product.comments.add(*comments)
+    return created
+
+
+def seed_orders(users=500, items_per_cart=3, seed=1, password=None, status=None):
+    # Benutzer mit je einem Warenkorb und einer Bestellung (Cart.user und Order.cart sind 1:1).
+    # Mit password können sich die Benutzer anmelden, status legt den Bestellstatus fest (sonst zufällig).
+    from datetime import timedelta
+
+    from django.contrib.auth import get_user_model
+    from django.contrib.auth.hashers import make_password
+    from django.utils import timezone
+
+    from store.models import Cart, CartItem, Order, Product
+
+    rng = random.Random(seed)
+    User = get_user_model()
+    prices = dict(Product.objects.values_list('id', 'price'))
+    product_ids = list(prices)
+    statuses = [choice for choice, _ in Order.STATUS_CHOICES]
+    # Passwort nur einmal hashen, der Hash gilt für alle Benutzer
+    hashed = make_password(password) if password else make_password(None)
+    created_users = User.objects.bulk_create(User(username=f'bench-user-{i}', password=hashed) for i in range(users))
+    carts = Cart.objects.bulk_create(Cart(user=user, total=Decimal('0.00')) for user in created_users)
+    items = CartItem.objects.bulk_create(
+        CartItem(cart=cart, product_id=product_id, quantity=rng.randint(1, 3))
+        for cart in carts
+        for product_id in rng.sample(product_ids, min(items_per_cart, len(product_ids)))
+    )
+    # Gesamtbeträge wie Cart.add_product sie pflegt, damit Cart.total zu den Artikeln passt
+    for item in items:
+        item.cart.total += prices[item.product_id] * item.quantity
+    Cart.objects.bulk_update(carts, ['total'])
+    orders = Order.objects.bulk_create(
+        Order(user=cart.user, cart=cart, status=status or rng.choice(statuses)) for cart in carts
+    )
+    # Erstellungszeitpunkte über die letzten 90 Tage verteilen
+    now = timezone.now()
+    for order in orders:
+        order.created_at = now - timedelta(minutes=rng.randint(0, 90 * 24 * 60))
+    Order.objects.bulk_update(orders, ['created_at'])
+    return orders
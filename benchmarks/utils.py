@@ -0,0 +1,85 @@
+import json
+import os
+import statistics
+import sys
+import tempfile
+import time
+from pathlib import Path
+
+# Hilfsfunktionen für die Benchmark-Skripte in diesem Ordner
+
+BASE_DIR = Path(__file__).resolve().parent.parent
+
+
+def setup_django(settings_module='cstore.settings', **overrides):
+    # Django für ein eigenständiges Skript initialisieren; overrides ersetzen einzelne Einstellungen
+    if str(BASE_DIR) not in sys.path:
+        sys.path.insert(0, str(BASE_DIR))
+    os.environ.setdefault('DJANGO_SETTINGS_MODULE', settings_module)
+    import django
+    from django.conf import settings
+
+    for name, value in overrides.items():
+        setattr(settings, name, value)
+    django.setup()
+
+
+def setup_temp_database(**overrides):
+    # Django mit einer frischen, migrierten SQLite-Datei initialisieren, damit db.sqlite3 unberührt bleibt
+    path = os.path.join(tempfile.mkdtemp(prefix='cstore-bench-'), 'bench.sqlite3')
+    databases = {'default': {'ENGINE': 'django.db.backends.sqlite3', 'NAME': path}}
+    setup_django(DATABASES=databases, **overrides)
+    from django.core.management import call_command
+
+    call_command('migrate', verbosity=0)
+    return path
+
+
+def percentile(values, pct):
+    # Perzentil mit linearer Interpolation
+    if not values:
+        return 0.0
+    ordered = sorted(values)
+    position = (len(ordered) - 1) * pct / 100
+    lower = int(position)
+    upper = min(lower + 1, len(ordered) - 1)
+    return ordered[lower] + (ordered[upper] - ordered[lower]) * (position - lower)
+
+
+def summarize(name, latencies, elapsed, **extra):
+    # Kennzahlen eines Laufs: Durchsatz und Latenzen in Millisekunden
+    result = {
+        'name': name,
+        'requests': len(latencies),
+        'throughput': round(len(latencies) / elapsed, 1) if elapsed else 0.0,
+        'mean_ms': round(statistics.fmean(latencies) * 1000, 3) if latencies else 0.0,
+        'p50_ms': round(percentile(latencies, 50) * 1000, 3),
+        'p95_ms': round(percentile(latencies, 95) * 1000, 3),
+        'p99_ms': round(percentile(latencies, 99) * 1000, 3),
+    }
+    result.update(extra)
+    return result
+
+
+def measure(name, func, iterations, **extra):
+    # Funktion mehrfach ausführen und die Latenz jedes Aufrufs messen
+    latencies = []
+    start = time.perf_counter()
+    for _ in range(iterations):
+        begin = time.perf_counter()
+        func()
+        latencies.append(time.perf_counter() - begin)
+    return summarize(name, latencies, time.perf_counter() - start, **extra)
+
+
+def report(results, output=None):
+    # Ergebnisse als Tabelle ausgeben und optional als JSON speichern (zum Vergleich zwischen Commits)
+    for result in results:
+        extra = ''.join(f"  {key} {result[key]}" for key in ('queries', 'errors') if key in result)
+        print(
+            f"{result['name']:<40} {result['throughput']:>10} req/s  "
+            f"p50 {result['p50_ms']:>8} ms  p95 {result['p95_ms']:>8} ms  p99 {result['p99_ms']:>8} ms{extra}"
+        )
+    if output:
+        with open(output, 'w') as fh:
+            json.dump(results, fh, indent=2, sort_keys=True)
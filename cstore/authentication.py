@@ -0,0 +1,112 @@
+import time
+
+from django.conf import settings
+from django.contrib.auth import get_user_model
+from django.core import checks
+from django.core.cache import caches
+from django.utils.functional import cached_property
+from rest_framework_simplejwt.authentication import JWTAuthentication
+from rest_framework_simplejwt.exceptions import AuthenticationFailed, InvalidToken
+from rest_framework_simplejwt.models import TokenUser
+from rest_framework_simplejwt.serializers import TokenObtainPairSerializer
+from rest_framework_simplejwt.settings import api_settings
+
+# Zustandslose JWT-Authentifizierung: der Benutzer wird aus den Token-Claims gebaut, ohne Datenbankabfrage.
+# Wird ein Benutzer deaktiviert, gelöscht oder ändern sich seine Rechte, gelten alle bis dahin ausgestellten
+# Tokens als gesperrt (Sperrliste im Cache, siehe store/signals.py). Die Sperrliste muss in einem Cache liegen,
+# den alle Worker-Prozesse teilen (JWT_REVOCATION_CACHE_ALIAS), sonst gilt eine Sperre nur im eigenen Prozess.
+
+REVOKED_KEY = 'auth:revoked:{}'
+LOCAL_CACHE_MAX_SIZE = 10000
+# Änderungen an diesen Feldern sperren die ausgestellten Tokens (is_staff/is_superuser stehen in den Claims)
+REVOKING_FIELDS = ('is_active', 'is_staff', 'is_superuser')
+# Prozesslokale Cache-Backends, die für die Sperrliste nicht genügen
+LOCAL_CACHE_BACKENDS = (
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+)
+
+# Prozesslokaler TTL-Cache vor dem gemeinsamen Cache: user_id -> (gesperrt seit oder None, läuft ab um)
+_revoked = {}
+
+
+def add_user_claims(token, user):
+    # Claims, aus denen ClaimsUser den Benutzer ohne Datenbankabfrage aufbaut
+    token['username'] = user.get_username()
+    token['is_staff'] = user.is_staff
+    token['is_superuser'] = user.is_superuser
+    return token
+
+
+def get_revocation_cache():
+    return caches[getattr(settings, 'JWT_REVOCATION_CACHE_ALIAS', 'default')]
+
+
+def revoke_user(user_id):
+    # Alle bis jetzt ausgestellten Access-Tokens dieses Benutzers bis zu ihrem Ablauf abweisen;
+    # Tokens aus einem späteren Login bleiben gültig
+    timeout = int(api_settings.ACCESS_TOKEN_LIFETIME.total_seconds())
+    get_revocation_cache().set(REVOKED_KEY.format(user_id), time.time(), timeout)
+    _revoked.pop(user_id, None)
+
+
+def is_revoked(user_id, issued_at):
+    # Ergebnis für JWT_REVOCATION_LOCAL_TTL Sekunden im Prozess merken, damit der Hot Path ohne I/O auskommt
+    now = time.monotonic()
+    entry = _revoked.get(user_id)
+    if entry is None or entry[1] < now:
+        if len(_revoked) >= LOCAL_CACHE_MAX_SIZE:
+            _revoked.clear()
+        revoked_at = get_revocation_cache().get(REVOKED_KEY.format(user_id))
+        entry = _revoked[user_id] = (revoked_at, now + getattr(settings, 'JWT_REVOCATION_LOCAL_TTL', 5))
+    # iat hat Sekundenauflösung: ein Token aus derselben Sekunde wie die Sperre gilt als gesperrt
+    return entry[0] is not None and issued_at <= entry[0]
+
+
+@checks.register(checks.Tags.security, deploy=True)
+def check_revocation_cache(app_configs, **kwargs):
+    # manage.py check --deploy: die Sperrliste braucht einen gemeinsamen Cache (z. B. Redis oder Memcached)
+    alias = getattr(settings, 'JWT_REVOCATION_CACHE_ALIAS', 'default')
+    if settings.CACHES[alias]['BACKEND'] in LOCAL_CACHE_BACKENDS:
+        return [checks.Error(
+            f"JWT_REVOCATION_CACHE_ALIAS '{alias}' uses a process-local cache backend.",
+            hint='Revoked tokens would stay valid in other worker processes. Point the alias at a shared cache '
+                 '(CSTORE_CACHE_BACKEND/CSTORE_CACHE_LOCATION).',
+            id='cstore.E001',
+        )]
+    return []
+
+
+# Login-Serializer, der Benutzername und Rechte als Claims in die Tokens schreibt
+class ClaimsTokenObtainPairSerializer(TokenObtainPairSerializer):
+    @classmethod
+    def get_token(cls, user):
+        return add_user_claims(super().get_token(user), user)
+
+
+# Leichtgewichtiger Benutzer aus den Token-Claims; das Modell wird erst geladen, wenn eine View es braucht
+class ClaimsUser(TokenUser):
+    @cached_property
+    def instance(self):
+        return get_user_model()._default_manager.get(**{api_settings.USER_ID_FIELD: self.id})
+
+    def __getattr__(self, attr):
+        if attr.startswith('_'):
+            raise AttributeError(attr)
+        if attr in self.token:
+            return self.token[attr]
+        # Alles, was nicht im Token steht (z. B. email), vom Modell lesen
+        return getattr(self.instance, attr)
+
+
+class ClaimsJWTAuthentication(JWTAuthentication):
+    def get_user(self, validated_token):
+        if 'username' not in validated_token:
+            # Ältere Tokens ohne Claims: wie bisher über die Datenbank
+            return super().get_user(validated_token)
+        if api_settings.USER_ID_CLAIM not in validated_token:
+            raise InvalidToken('Token contained no recognizable user identification')
+        user = ClaimsUser(validated_token)
+        if is_revoked(user.id, validated_token.get('iat', 0)):
+            raise AuthenticationFailed('User is inactive', code='user_inactive')
+        return user
@@ -0,0 +1,53 @@
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.contrib.auth import hashers
+from rest_framework import status
+from rest_framework.exceptions import APIException
+
+_executor = None
+_slots = None
+_lock = threading.Lock()
+
+
+class HasherBusy(APIException):
+    # Alle Plätze im Hash-Pool belegt: lieber sofort 503 als Warenkorb-Anfragen auszubremsen
+    status_code = status.HTTP_503_SERVICE_UNAVAILABLE
+    default_detail = 'Too many password operations in progress, please retry shortly.'
+    default_code = 'hasher_busy'
+
+
+def get_executor():
+    # Begrenzter Thread-Pool für Passwort-Hashes (pbkdf2_hmac gibt das GIL frei)
+    global _executor, _slots
+    with _lock:
+        if _executor is None:
+            workers = settings.PASSWORD_HASH_WORKERS
+            _executor = ThreadPoolExecutor(max_workers=workers, thread_name_prefix='password-hash')
+            # Laufende plus wartende Hashes; darüber hinaus wird abgewiesen
+            _slots = threading.BoundedSemaphore(workers + settings.PASSWORD_HASH_MAX_PENDING)
+    return _executor
+
+
+def run_hash(func, *args):
+    executor = get_executor()
+    if not _slots.acquire(blocking=False):
+        raise HasherBusy()
+    try:
+        return executor.submit(func, *args).result()
+    finally:
+        _slots.release()
+
+
+class PBKDF2PasswordHasher(hashers.PBKDF2PasswordHasher):
+    # Gleicher Algorithmus wie Djangos Standard, daher bleiben bestehende Hashes gültig.
+    # Die Kosten kommen aus PASSWORD_HASH_ITERATIONS; ältere Hashes werden beim Login neu berechnet.
+
+    @property
+    def iterations(self):
+        return settings.PASSWORD_HASH_ITERATIONS or hashers.PBKDF2PasswordHasher.iterations
+
+    def encode(self, password, salt, iterations=None):
+        # Login und Registrierung hashen im Pool statt auf dem Request-Thread
+        return run_hash(super().encode, password, salt, iterations)
@@ -0,0 +1,113 @@
+import hashlib
+import mimetypes
+import os
+import re
+import threading
+
+from django.conf import settings
+from django.core.exceptions import SuspiciousFileOperation
+from django.http import FileResponse, Http404, HttpResponse, StreamingHttpResponse
+from django.utils._os import safe_join
+from django.utils.cache import get_conditional_response
+from django.utils.http import http_date, quote_etag
+from django.views.decorators.http import require_safe
+
+# Dateien mit einem Inhalts-Hash im Pfad (z. B. products/variants/<sha256>/160.webp) ändern sich nie
+HASHED_PATH = re.compile(r'(^|/)[0-9a-f]{64}(/|\.)')
+IMMUTABLE_CACHE = 'public, max-age=31536000, immutable'
+DEFAULT_CACHE = 'public, max-age=3600, must-revalidate'
+RANGE_HEADER = re.compile(r'^bytes=(\d*)-(\d*)$')
+CHUNK_SIZE = 64 * 1024
+
+# ETags pro (Pfad, Änderungszeit, Größe), damit jede Datei nur einmal gehasht wird
+_etags = {}
+_etags_lock = threading.Lock()
+
+
+def get_etag(path, stat):
+    key = (path, stat.st_mtime_ns, stat.st_size)
+    etag = _etags.get(key)
+    if etag is None:
+        digest = hashlib.sha256()
+        with open(path, 'rb') as fh:
+            for chunk in iter(lambda: fh.read(CHUNK_SIZE), b''):
+                digest.update(chunk)
+        etag = quote_etag(digest.hexdigest())
+        with _etags_lock:
+            if len(_etags) > 10000:
+                _etags.clear()
+            _etags[key] = etag
+    return etag
+
+
+def parse_range(header, size):
+    # Einen einzelnen Bytebereich auswerten; None = ganze Datei, () = nicht erfüllbar
+    match = RANGE_HEADER.match(header.strip())
+    if not match or not size:
+        return None
+    start, end = match.groups()
+    if start:
+        start, end = int(start), min(int(end), size - 1) if end else size - 1
+    elif end:
+        start, end = max(size - int(end), 0), size - 1  # Die letzten n Bytes
+    else:
+        return None
+    if start > end or start >= size:
+        return ()
+    return start, end
+
+
+def iter_range(path, start, end):
+    with open(path, 'rb') as fh:
+        fh.seek(start)
+        remaining = end - start + 1
+        while remaining > 0:
+            chunk = fh.read(min(CHUNK_SIZE, remaining))
+            if not chunk:
+                break
+            remaining -= len(chunk)
+            yield chunk
+
+
+@require_safe
+def serve(request, path, document_root=None):
+    # Mediendateien mit starken ETags, 304-Antworten, Bytebereichen und langen Cache-Zeiten ausliefern
+    try:
+        fullpath = safe_join(document_root or settings.MEDIA_ROOT, path)
+        stat = os.stat(fullpath)
+    except (SuspiciousFileOperation, OSError):
+        raise Http404('File not found')
+    if not os.path.isfile(fullpath):
+        raise Http404('File not found')
+
+    headers = {
+        'ETag': get_etag(fullpath, stat),
+        'Last-Modified': http_date(stat.st_mtime),
+        'Cache-Control': IMMUTABLE_CACHE if HASHED_PATH.search(path) else DEFAULT_CACHE,
+        'Accept-Ranges': 'bytes',
+    }
+    not_modified = get_conditional_response(request, etag=headers['ETag'], last_modified=int(stat.st_mtime))
+    if not_modified is not None:
+        for name, value in headers.items():
+            not_modified[name] = value
+        return not_modified
+
+    content_type = mimetypes.guess_type(fullpath)[0] or 'application/octet-stream'
+    byte_range = None
+    if 'HTTP_RANGE' in request.META and request.META.get('HTTP_IF_RANGE', headers['ETag']) == headers['ETag']:
+        byte_range = parse_range(request.META['HTTP_RANGE'], stat.st_size)
+
+    if byte_range == ():
+        response = HttpResponse(status=416)
+        response['Content-Range'] = f'bytes */{stat.st_size}'
+    elif byte_range:
+        start, end = byte_range
+        response = StreamingHttpResponse(iter_range(fullpath, start, end), status=206, content_type=content_type)
+        response['Content-Range'] = f'bytes {start}-{end}/{stat.st_size}'
+        response['Content-Length'] = str(end - start + 1)
+    else:
+        # FileResponse nutzt wsgi.file_wrapper und damit sendfile, wenn der Server es unterstützt
+        response = FileResponse(open(fullpath, 'rb'), content_type=content_type)
+    for name, value in headers.items():
+        response[name] = value
+    return response
@@ -0,0 +1,198 @@
+import bisect
+import hmac
+import threading
+import time
+from collections import Counter, defaultdict
+from contextlib import ExitStack
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+from django.http import Http404, HttpResponse, HttpResponseForbidden
+
+# Messpunkte pro Route: Latenz, Anzahl der SQL-Abfragen, wiederholte Abfragen (N+1) und Renderzeit.
+# Die Werte gelten pro Prozess; bei mehreren Workern liefert jeder seinen eigenen /metrics/-Stand.
+
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0)
+QUERY_BUCKETS = (0, 1, 2, 5, 10, 20, 50, 100)
+
+
+class Histogram:
+    def __init__(self, buckets):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # letzter Eintrag: +Inf
+        self.sum = 0.0
+        self.count = 0
+
+    def observe(self, value):
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.sum += value
+        self.count += 1
+
+    def samples(self, name, labels):
+        cumulative = 0
+        for bound, count in zip((*self.buckets, '+Inf'), self.counts):
+            cumulative += count
+            yield f'{name}_bucket{{{labels},le="{bound}"}} {cumulative}'
+        yield f'{name}_sum{{{labels}}} {self.sum:g}'
+        yield f'{name}_count{{{labels}}} {self.count}'
+
+
+class Registry:
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.reset()
+
+    def reset(self):
+        self.latency = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.queries = defaultdict(lambda: Histogram(QUERY_BUCKETS))
+        self.render = defaultdict(lambda: Histogram(LATENCY_BUCKETS))
+        self.db_seconds = Counter()
+        self.duplicates = Counter()
+        self.responses = Counter()
+
+    def record(self, route, method, status, stats):
+        key = (route, method)
+        with self.lock:
+            self.latency[key].observe(stats.duration)
+            self.queries[key].observe(stats.queries)
+            self.db_seconds[key] += stats.db_time
+            self.duplicates[key] += stats.duplicates
+            self.responses[(route, method, str(status))] += 1
+            if stats.render_time is not None:
+                self.render[key].observe(stats.render_time)
+
+    def render_text(self):
+        # Prometheus-Textformat (Version 0.0.4)
+        def labels(route, method, **extra):
+            pairs = {'route': route, 'method': method, **extra}
+            return ','.join(f'{k}="{v}"' for k, v in pairs.items())
+
+        lines = []
+        with self.lock:
+            for name, kind, help_text, series in (
+                ('cstore_request_duration_seconds', 'histogram', 'Request latency by route.', self.latency),
+                ('cstore_request_queries', 'histogram', 'SQL queries per request.', self.queries),
+                ('cstore_response_render_seconds', 'histogram', 'Time spent rendering the response body.', self.render),
+            ):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} {kind}']
+                for (route, method), histogram in sorted(series.items()):
+                    lines += histogram.samples(name, labels(route, method))
+            for name, help_text, series in (
+                ('cstore_request_db_seconds_total', 'Time spent in SQL queries.', self.db_seconds),
+                ('cstore_request_duplicate_queries_total', 'Repeated SQL statements within one request (N+1).', self.duplicates),
+            ):
+                lines += [f'# HELP {name} {help_text}', f'# TYPE {name} counter']
+                lines += [f'{name}{{{labels(route, method)}}} {value:g}' for (route, method), value in sorted(series.items())]
+            lines += ['# HELP cstore_responses_total Responses by route and status.', '# TYPE cstore_responses_total counter']
+            lines += [
+                f'cstore_responses_total{{{labels(route, method, status=status)}}} {value}'
+                for (route, method, status), value in sorted(self.responses.items())
+            ]
+        return '\n'.join(lines) + '\n'
+
+
+registry = Registry()
+
+
+# Messwerte einer einzelnen Anfrage; dient zugleich als execute_wrapper für alle Datenbankverbindungen
+class RequestStats:
+    def __init__(self):
+        self.queries = 0
+        self.duplicates = 0
+        self.db_time = 0.0
+        self.duration = 0.0
+        self.render_time = None
+        self.statements = Counter()
+
+    def __call__(self, execute, sql, params, many, context):
+        begin = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            self.db_time += time.perf_counter() - begin
+            self.queries += 1
+            # Dieselbe Anweisung (mit beliebigen Parametern) mehrfach pro Anfrage deutet auf N+1 hin
+            self.statements[sql] += 1
+            if self.statements[sql] > 1:
+                self.duplicates += 1
+
+
+def route_name(request):
+    match = getattr(request, 'resolver_match', None)
+    if match is None:
+        return 'unmatched'
+    return match.view_name or match.route
+
+
+class MetricsMiddleware:
+    # Synchron und asynchron nutzbar, damit die async-Views unter ASGI ohne Umschaltung laufen
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        # Abgeschaltet wird die Middleware gar nicht erst eingebunden: kein Overhead pro Anfrage
+        if not getattr(settings, 'METRICS_ENABLED', False):
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+        self.header = getattr(settings, 'METRICS_RESPONSE_HEADER', False)
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        stats = request._metrics = RequestStats()
+        begin = time.perf_counter()
+        with ExitStack() as stack:
+            self.wrap_connections(stack, stats)
+            response = self.get_response(request)
+        return self.finish(request, response, stats, begin)
+
+    async def __acall__(self, request):
+        stats = request._metrics = RequestStats()
+        begin = time.perf_counter()
+        with ExitStack() as stack:
+            self.wrap_connections(stack, stats)
+            response = await self.get_response(request)
+        return self.finish(request, response, stats, begin)
+
+    def wrap_connections(self, stack, stats):
+        for alias in connections:
+            stack.enter_context(connections[alias].execute_wrapper(stats))
+
+    def finish(self, request, response, stats, begin):
+        stats.duration = time.perf_counter() - begin
+        registry.record(route_name(request), request.method, response.status_code, stats)
+        if self.header:
+            response['Server-Timing'] = ', '.join(
+                [f'total;dur={stats.duration * 1000:.1f}', f'db;dur={stats.db_time * 1000:.1f}']
+                + ([f'render;dur={stats.render_time * 1000:.1f}'] if stats.render_time is not None else [])
+            )
+            response['X-Query-Count'] = str(stats.queries)
+            response['X-Duplicate-Queries'] = str(stats.duplicates)
+        return response
+
+    def process_template_response(self, request, response):
+        # Wird direkt vor response.render() aufgerufen (als äußerste Middleware zuletzt): Renderzeit messen
+        stats = request._metrics
+        begin = time.perf_counter()
+
+        def rendered(response):
+            stats.render_time = time.perf_counter() - begin
+
+        response.add_post_render_callback(rendered)
+        return response
+
+
+def metrics_view(request):
+    # Nur für Staff (Session) oder den Scraper mit METRICS_TOKEN als Bearer-Token
+    if not getattr(settings, 'METRICS_ENABLED', False):
+        raise Http404
+    token = getattr(settings, 'METRICS_TOKEN', '')
+    credential = request.META.get('HTTP_AUTHORIZATION', '')
+    authorized = request.user.is_staff or (token and hmac.compare_digest(credential, f'Bearer {token}'))
+    if not authorized:
+        return HttpResponseForbidden()
+    return HttpResponse(registry.render_text(), content_type='text/plain; version=0.0.4; charset=utf-8')
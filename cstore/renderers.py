@@ -0,0 +1,69 @@
+from django.http import StreamingHttpResponse
+from rest_framework.renderers import JSONRenderer
+from rest_framework.utils import encoders
+
+# orjson ist optional: ohne das Paket wird wie bisher der Encoder der Standardbibliothek verwendet
+try:
+    import orjson
+except ImportError:  # pragma: no cover
+    orjson = None
+
+# Zeilentrenner U+2028 und U+2029 wie bei DRF immer escapen (UTF-8-Bytes -> JSON-Escape)
+LINE_SEPARATORS = ((b'\xe2\x80\xa8', b'\\u2028'), (b'\xe2\x80\xa9', b'\\u2029'))
+
+_encoder = encoders.JSONEncoder()
+
+
+def _default(obj):
+    # Alles, was orjson nicht selbst kann (Decimal, datetime mit "Z", Lazy-Strings ...), wie DRF kodieren
+    return _encoder.default(obj)
+
+
+def dumps(data):
+    # Kompaktes JSON als Bytes, identisch zur Ausgabe von DRFs JSONRenderer mit den Standardeinstellungen
+    if orjson is None:
+        return JSONRenderer().render(data)
+    ret = orjson.dumps(data, default=_default, option=orjson.OPT_PASSTHROUGH_DATETIME | orjson.OPT_NON_STR_KEYS)
+    for raw, escaped in LINE_SEPARATORS:
+        if raw in ret:
+            ret = ret.replace(raw, escaped)
+    return ret
+
+
+# Schneller JSON-Renderer: nutzt orjson, wenn die Ausgabe damit identisch ist, sonst DRFs Renderer
+class FastJSONRenderer(JSONRenderer):
+    chunk_size = 64 * 1024
+
+    def use_fast_path(self, indent):
+        return orjson is not None and indent is None and self.compact and not self.ensure_ascii
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        if data is None:
+            return b''
+        indent = self.get_indent(accepted_media_type, renderer_context or {})
+        if not self.use_fast_path(indent):
+            return super().render(data, accepted_media_type, renderer_context)
+        return dumps(data)
+
+    def render_iter(self, items, chunk_size=None):
+        # Eine (lazy) Folge von Elementen stückweise als JSON-Array rendern, ohne den ganzen String aufzubauen
+        chunk_size = chunk_size or self.chunk_size
+        buffer = bytearray(b'[')
+        first = True
+        for item in items:
+            if not first:
+                buffer += b','
+            buffer += self.render(item)
+            first = False
+            if len(buffer) >= chunk_size:
+                yield bytes(buffer)
+                buffer.clear()
+        buffer += b']'
+        yield bytes(buffer)
+
+
+# Antwort, die eine große Liste stückweise an den Client sendet
+class StreamingJSONResponse(StreamingHttpResponse):
+    def __init__(self, items, chunk_size=None, **kwargs):
+        kwargs.setdefault('content_type', 'application/json')
+        super().__init__(FastJSONRenderer().render_iter(items, chunk_size), **kwargs)
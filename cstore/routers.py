@@ -0,0 +1,122 @@
+import contextlib
+import contextvars
+import hashlib
+import random
+
+from asgiref.sync import iscoroutinefunction, markcoroutinefunction
+from django.conf import settings
+from django.core.cache import caches
+
+# Lesereplikate für den Katalog: Router plus Middleware, die pro Anfrage festlegt, ob Replikate erlaubt sind.
+# Außerhalb von Anfragen (Befehle, Hintergrundjobs) wird immer die Primärdatenbank gelesen.
+
+SAFE_METHODS = ('GET', 'HEAD', 'OPTIONS')
+STICKY_KEY_PREFIX = 'db:sticky:'
+
+_replicas_allowed = contextvars.ContextVar('cstore_replicas_allowed', default=False)
+_replica_reads = contextvars.ContextVar('cstore_replica_reads', default=None)
+
+
+def get_replicas():
+    return list(getattr(settings, 'DATABASE_REPLICAS', []))
+
+
+@contextlib.contextmanager
+def track_replica_reads():
+    # Im Block festhalten, welche Replikate gelesen wurden, z. B. beim Befüllen des gemeinsamen Katalog-Caches:
+    # Daten eines nachhinkenden Replikats sollen dort nur kurz liegen
+    used = set()
+    token = _replica_reads.set(used)
+    try:
+        yield used
+    finally:
+        _replica_reads.reset(token)
+
+
+def sticky_key(request):
+    # Client über den Authorization-Header (oder das Session-Cookie) erkennen, ohne den Benutzer zu laden
+    credential = request.META.get('HTTP_AUTHORIZATION') or request.COOKIES.get(settings.SESSION_COOKIE_NAME)
+    if not credential:
+        return None
+    return STICKY_KEY_PREFIX + hashlib.sha256(credential.encode()).hexdigest()[:32]
+
+
+# Leitet Lesezugriffe auf Katalogmodelle an ein zufälliges Replikat, alles andere an die Primärdatenbank
+class PrimaryReplicaRouter:
+    catalog_models = {'store.product', 'store.comment', 'store.productslugredirect', 'taggit.tag', 'taggit.taggeditem'}
+
+    def db_for_read(self, model, **hints):
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db:
+            # Zugehörige Objekte aus derselben Datenbank wie das Ausgangsobjekt lesen
+            return instance._state.db
+        replicas = get_replicas()
+        if replicas and _replicas_allowed.get() and model._meta.label_lower in self.catalog_models:
+            alias = random.choice(replicas)
+            used = _replica_reads.get()
+            if used is not None:
+                used.add(alias)
+            return alias
+        return 'default'
+
+    def db_for_write(self, model, **hints):
+        return 'default'
+
+    def allow_relation(self, obj1, obj2, **hints):
+        aliases = {'default', *get_replicas()}
+        if obj1._state.db in aliases and obj2._state.db in aliases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # Replikate sind Kopien der Primärdatenbank und werden nicht selbst migriert
+        if db in get_replicas():
+            return False
+        return None
+
+
+# Erlaubt Replikate nur für lesende Anfragen. Nach einem Schreibzugriff liest derselbe Client
+# für DATABASE_STICKY_SECONDS von der Primärdatenbank (read-your-own-writes).
+# Bei mehreren Prozessen muss DATABASE_STICKY_CACHE_ALIAS auf einen gemeinsamen Cache zeigen.
+class ReplicaRoutingMiddleware:
+    sync_capable = True
+    async_capable = True
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        if iscoroutinefunction(self.get_response):
+            markcoroutinefunction(self)
+
+    def __call__(self, request):
+        if iscoroutinefunction(self):
+            return self.__acall__(request)
+        key = sticky_key(request)
+        token = _replicas_allowed.set(self.allows_replicas(request, key))
+        try:
+            response = self.get_response(request)
+        finally:
+            _replicas_allowed.reset(token)
+        self.process_write(request, key)
+        return response
+
+    async def __acall__(self, request):
+        key = sticky_key(request)
+        token = _replicas_allowed.set(self.allows_replicas(request, key))
+        try:
+            response = await self.get_response(request)
+        finally:
+            _replicas_allowed.reset(token)
+        self.process_write(request, key)
+        return response
+
+    def get_cache(self):
+        return caches[getattr(settings, 'DATABASE_STICKY_CACHE_ALIAS', 'default')]
+
+    def allows_replicas(self, request, key):
+        if not get_replicas() or request.method not in SAFE_METHODS:
+            return False
+        return key is None or not self.get_cache().get(key)
+
+    def process_write(self, request, key):
+        if key is not None and request.method not in SAFE_METHODS and get_replicas():
+            self.get_cache().set(key, True, getattr(settings, 'DATABASE_STICKY_SECONDS', 5))
@@ -1,4 +1,6 @@
-from django.contrib.auth import get_user_model
+from django.contrib.auth import get_user_model, password_validation
+from django.core.exceptions import ValidationError
+from rest_framework import serializers
 from rest_framework.serializers import ModelSerializer
 
 # Das User-Modell abrufen
@@ -11,3 +13,22 @@ class UserSerializer(ModelSerializer):
         model = User  # Das Modell, das dieser Serializer verwendet
         fields = ['username', 'password', 'id']  # Felder, die serialisiert werden sollen
         extra_kwargs = {'password': {'write_only': True}}  # Passwortfeld nur zum Schreiben, nicht zum Lesen
+
+
+# Eingaben der Registrierung; die Eindeutigkeit des Benutzernamens prüft die View (409 statt 400)
+class RegistrationSerializer(serializers.Serializer):
+    username = serializers.CharField(
+        max_length=User._meta.get_field('username').max_length,
+        validators=User._meta.get_field('username').validators,
+    )
+    password = serializers.CharField(write_only=True, trim_whitespace=False, style={'input_type': 'password'})
+    email = serializers.EmailField(required=False, allow_blank=True, default='')
+
+    def validate(self, attrs):
+        # Passwortregeln aus AUTH_PASSWORD_VALIDATORS anwenden (ohne zu hashen)
+        user = User(username=attrs['username'], email=attrs['email'])
+        try:
+            password_validation.validate_password(attrs['password'], user)
+        except ValidationError as exc:
+            raise serializers.ValidationError({'password': list(exc.messages)})
+        return attrs
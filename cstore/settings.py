@@ -18,6 +18,13 @@ TAGGIT_CASE_INSENSITIVE = True
 
 MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
+# Mediendateien von Django ausliefern (abschalten, wenn ein Webserver/CDN das übernimmt)
+SERVE_MEDIA = True
+
+# Bildvarianten der Produkte (Breiten in Pixeln) und Verarbeitung im Thread-Pool
+PRODUCT_IMAGE_WIDTHS = (160, 480, 960)
+PRODUCT_IMAGE_WORKERS = 2
+PRODUCT_IMAGE_ASYNC = True
 
 INSTALLED_APPS = [
     'django.contrib.admin',
@@ -33,12 +40,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    # Als äußerste Middleware, damit Latenz und Renderzeit vollständig erfasst werden
+    'cstore.metrics.MetricsMiddleware',
     'django.middleware.security.SecurityMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     "corsheaders.middleware.CorsMiddleware",
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'cstore.routers.ReplicaRoutingMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
 ]
@@ -69,13 +79,90 @@ WSGI_APPLICATION = 'cstore.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/5.0/ref/settings/#databases
 
+# Datenbank-Backend per Umgebung austauschbar (CSTORE_DB_ENGINE, z. B. django.db.backends.postgresql).
+# Standard ist das SQLite-Profil (cstore.sqlite): WAL, synchronous=NORMAL, mmap, Cache und busy_timeout beim Verbindungsaufbau,
+# atomic() mit BEGIN IMMEDIATE und wiederverwendete Verbindungen. Werte lassen sich per Umgebungsvariable anpassen.
+# db.sqlite3 ist die eingecheckte Entwicklungsdatenbank. WAL schreibt den Dateikopf um, daher gilt das
+# WAL-Profil (mit synchronous=NORMAL) nur für eigene Datenbanken über CSTORE_DB_NAME oder mit
+# CSTORE_DB_JOURNAL_MODE=WAL; sonst ändern manage.py-Befehle die Datei nur bei echten Schreibzugriffen.
+SQLITE_JOURNAL_MODE = os.environ.get('CSTORE_DB_JOURNAL_MODE', 'WAL' if 'CSTORE_DB_NAME' in os.environ else 'DELETE').upper()
+
 DATABASES = {
     'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+        'ENGINE': os.environ.get('CSTORE_DB_ENGINE', 'cstore.sqlite'),
+        'NAME': os.environ.get('CSTORE_DB_NAME', BASE_DIR / 'db.sqlite3'),
+        'USER': os.environ.get('CSTORE_DB_USER', ''),
+        'PASSWORD': os.environ.get('CSTORE_DB_PASSWORD', ''),
+        'HOST': os.environ.get('CSTORE_DB_HOST', ''),
+        'PORT': os.environ.get('CSTORE_DB_PORT', ''),
+        # Verbindungen bis zu CONN_MAX_AGE Sekunden wiederverwenden (0 = pro Anfrage neu verbinden)
+        'CONN_MAX_AGE': int(os.environ.get('CSTORE_DB_CONN_MAX_AGE', 600)),
+        'CONN_HEALTH_CHECKS': True,
+        'OPTIONS': {
+            'transaction_mode': os.environ.get('CSTORE_DB_TRANSACTION_MODE', 'IMMEDIATE'),
+            'pragmas': {
+                'journal_mode': SQLITE_JOURNAL_MODE,
+                'synchronous': 'NORMAL' if SQLITE_JOURNAL_MODE == 'WAL' else 'FULL',
+                'busy_timeout': int(os.environ.get('CSTORE_DB_BUSY_TIMEOUT', 5000)),
+                'cache_size': int(os.environ.get('CSTORE_DB_CACHE_SIZE', -20000)),
+                'mmap_size': int(os.environ.get('CSTORE_DB_MMAP_SIZE', 256 * 1024 * 1024)),
+            },
+        },
+        # Testdatenbank als Datei, damit mehrere Threads gleichzeitig darauf zugreifen können
+        'TEST': {
+            'NAME': BASE_DIR / 'test_db.sqlite3',
+        },
+    }
+}
+
+if DATABASES['default']['ENGINE'] != 'cstore.sqlite':
+    # PRAGMAs und transaction_mode gibt es nur im SQLite-Profil, die Testdatei nur bei SQLite
+    DATABASES['default']['OPTIONS'] = {}
+    if 'sqlite' not in DATABASES['default']['ENGINE']:
+        DATABASES['default']['TEST'] = {}
+
+# Lesereplikate für Katalogabfragen: CSTORE_DB_REPLICAS enthält kommagetrennte Datenbanknamen
+# (bei SQLite Dateipfade, lokal z. B. eine mit "manage.py sync_replicas" erstellte Kopie von db.sqlite3).
+# Die übrigen Verbindungsdaten werden von der Primärdatenbank übernommen.
+DATABASE_REPLICAS = []
+for index, name in enumerate(filter(None, os.environ.get('CSTORE_DB_REPLICAS', '').split(',')), 1):
+    DATABASES[f'replica{index}'] = {**DATABASES['default'], 'NAME': name.strip(), 'TEST': {'MIRROR': 'default'}}
+    DATABASE_REPLICAS.append(f'replica{index}')
+DATABASE_ROUTERS = ['cstore.routers.PrimaryReplicaRouter']
+# Nach einem Schreibzugriff liest der Client so viele Sekunden nur von der Primärdatenbank
+DATABASE_STICKY_SECONDS = int(os.environ.get('CSTORE_DB_STICKY_SECONDS', 5))
+DATABASE_STICKY_CACHE_ALIAS = 'default'
+
+
+# Cache
+# https://docs.djangoproject.com/en/5.0/topics/cache/
+
+# Mit mehreren Worker-Prozessen muss der Cache geteilt werden (Sperrliste der JWTs, Sticky-Reads),
+# z. B. CSTORE_CACHE_BACKEND=django.core.cache.backends.redis.RedisCache und CSTORE_CACHE_LOCATION=redis://...
+# manage.py check --deploy meldet einen prozesslokalen Cache als Fehler (cstore.E001).
+CACHES = {
+    'default': {
+        'BACKEND': os.environ.get('CSTORE_CACHE_BACKEND', 'django.core.cache.backends.locmem.LocMemCache'),
+        'LOCATION': os.environ.get('CSTORE_CACHE_LOCATION', ''),
     }
 }
 
+# Cache für Produktlisten und -details (Einträge werden über die Katalogversion ungültig)
+CATALOG_CACHE_ALIAS = 'default'
+CATALOG_CACHE_TIMEOUT = 300
+# Aus einem Replikat gelesene Antworten nur kurz speichern (das Replikat kann der Primärdatenbank hinterherhinken)
+CATALOG_REPLICA_CACHE_TIMEOUT = 5
+
+
+# Hintergrundaufgaben (store.jobs, Worker: manage.py run_jobs)
+JOB_WORKER_PROCESSES = int(os.environ.get('CSTORE_JOB_PROCESSES', 2))
+JOB_LEASE_SECONDS = 300  # So lange gilt eine laufende Aufgabe als gesperrt
+JOB_RETRY_DELAY = 10  # Sekunden bis zum zweiten Versuch, danach jeweils verdoppelt
+
+# E-Mails der Hintergrundaufgaben; ohne Konfiguration werden sie auf der Konsole ausgegeben
+EMAIL_BACKEND = os.environ.get('CSTORE_EMAIL_BACKEND', 'django.core.mail.backends.console.EmailBackend')
+DEFAULT_FROM_EMAIL = os.environ.get('CSTORE_DEFAULT_FROM_EMAIL', 'shop@cstore.local')
+
 
 # Password validation
 # https://docs.djangoproject.com/en/5.0/ref/settings/#auth-password-validators
@@ -96,6 +183,22 @@ AUTH_PASSWORD_VALIDATORS = [
 ]
 
 
+# Passwort-Hashing (cstore.hashers): PBKDF2 mit einstellbaren Kosten in einem begrenzten Thread-Pool.
+# Die übrigen Hasher prüfen nur noch vorhandene Hashes in anderen Formaten.
+PASSWORD_HASHERS = [
+    'cstore.hashers.PBKDF2PasswordHasher',
+    'django.contrib.auth.hashers.PBKDF2SHA1PasswordHasher',
+    'django.contrib.auth.hashers.Argon2PasswordHasher',
+    'django.contrib.auth.hashers.BCryptSHA256PasswordHasher',
+    'django.contrib.auth.hashers.ScryptPasswordHasher',
+]
+# PBKDF2-Iterationen (0 = Djangos Standard); weniger Iterationen machen Login und Registrierung billiger
+PASSWORD_HASH_ITERATIONS = int(os.environ.get('CSTORE_PASSWORD_ITERATIONS', 0))
+# Gleichzeitige Hashes und zusätzlich wartende Anfragen, bevor mit 503 abgewiesen wird
+PASSWORD_HASH_WORKERS = int(os.environ.get('CSTORE_PASSWORD_HASH_WORKERS', 2))
+PASSWORD_HASH_MAX_PENDING = int(os.environ.get('CSTORE_PASSWORD_HASH_MAX_PENDING', 32))
+
+
 # Internationalization
 # https://docs.djangoproject.com/en/5.0/topics/i18n/
 
@@ -125,6 +228,32 @@ DEFAULT_AUTO_FIELD = 'django.db.models.BigAutoField'
 
 REST_FRAMEWORK = {
     "DEFAULT_AUTHENTICATION_CLASSES":[
-        "rest_framework_simplejwt.authentication.JWTAuthentication"
-    ]
-}
\ No newline at end of file
+        # Benutzer aus den Token-Claims statt aus der Datenbank (cstore.authentication)
+        "cstore.authentication.ClaimsJWTAuthentication"
+    ],
+    # Schneller JSON-Renderer/-Parser (orjson, falls installiert); die DRF-Klassen funktionieren ebenso
+    "DEFAULT_RENDERER_CLASSES": [
+        "cstore.renderers.FastJSONRenderer",
+        "rest_framework.renderers.BrowsableAPIRenderer",
+    ],
+    "DEFAULT_PARSER_CLASSES": [
+        "cstore.parsers.FastJSONParser",
+        "rest_framework.parsers.FormParser",
+        "rest_framework.parsers.MultiPartParser",
+    ],
+}
+SIMPLE_JWT = {
+    # Login-Tokens enthalten username, is_staff und is_superuser
+    "TOKEN_OBTAIN_SERIALIZER": "cstore.authentication.ClaimsTokenObtainPairSerializer",
+}
+# Metriken pro Route (cstore.metrics) unter /metrics/; abgeschaltet wird die Middleware gar nicht geladen
+METRICS_ENABLED = os.environ.get('CSTORE_METRICS', '0') == '1'
+# /metrics/ ist nur für Staff-Benutzer oder mit "Authorization: Bearer <METRICS_TOKEN>" erreichbar
+METRICS_TOKEN = os.environ.get('CSTORE_METRICS_TOKEN', '')
+# Server-Timing, X-Query-Count und X-Duplicate-Queries an jede Antwort hängen
+METRICS_RESPONSE_HEADER = DEBUG
+
+# Sekunden, die ein Prozess das Ergebnis der Sperrlistenprüfung für einen Benutzer zwischenspeichert
+JWT_REVOCATION_LOCAL_TTL = 5
+# Muss auf einen gemeinsamen Cache zeigen, sonst gilt eine Sperre nur im Prozess, der sie gesetzt hat
+JWT_REVOCATION_CACHE_ALIAS = 'default'
@@ -0,0 +1,52 @@
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.sqlite3 import base
+
+# SQLite-Backend mit Produktionsprofil: PRAGMAs beim Verbindungsaufbau und optional BEGIN IMMEDIATE
+#
+# DATABASES['default']['OPTIONS'] akzeptiert zusätzlich zu den Argumenten von sqlite3.connect():
+#   "pragmas": Werte, die DEFAULT_PRAGMAS ergänzen oder ersetzen (None schaltet ein PRAGMA ab)
+#   "transaction_mode": "DEFERRED", "IMMEDIATE" oder "EXCLUSIVE" für transaction.atomic()
+
+DEFAULT_PRAGMAS = {
+    'journal_mode': 'WAL',  # Leser blockieren Schreiber nicht und umgekehrt
+    'synchronous': 'NORMAL',  # Im WAL-Modus sicher, spart ein fsync pro Commit
+    'busy_timeout': 5000,  # Millisekunden warten statt sofort "database is locked"
+    'cache_size': -20000,  # Seitencache pro Verbindung in KiB (negativ = Größe statt Seitenzahl)
+    'mmap_size': 256 * 1024 * 1024,  # Datenbankdatei in den Speicher abbilden
+    'temp_store': 'MEMORY',
+}
+
+TRANSACTION_MODES = ('DEFERRED', 'IMMEDIATE', 'EXCLUSIVE')
+
+
+class DatabaseWrapper(base.DatabaseWrapper):
+    def get_connection_params(self):
+        params = super().get_connection_params()
+        # Eigene Optionen entfernen, sqlite3.connect() kennt sie nicht
+        pragmas = {**DEFAULT_PRAGMAS, **params.pop('pragmas', {})}
+        self.pragmas = {name: value for name, value in pragmas.items() if value is not None}
+        self.transaction_mode = params.pop('transaction_mode', None)
+        if self.transaction_mode is not None:
+            self.transaction_mode = self.transaction_mode.upper()
+            if self.transaction_mode not in TRANSACTION_MODES:
+                raise ImproperlyConfigured(f"transaction_mode must be one of {', '.join(TRANSACTION_MODES)}.")
+        return params
+
+    def get_new_connection(self, conn_params):
+        conn = super().get_new_connection(conn_params)
+        pragmas = dict(self.pragmas)
+        if self.is_in_memory_db():
+            # Für In-Memory-Datenbanken gibt es weder WAL noch eine Datei zum Abbilden
+            pragmas.pop('journal_mode', None)
+            pragmas.pop('mmap_size', None)
+        for name, value in pragmas.items():
+            conn.execute(f'PRAGMA {name} = {value}')
+        return conn
+
+    def _start_transaction_under_autocommit(self):
+        # Mit IMMEDIATE wird die Schreibsperre schon bei BEGIN angefordert (und per busy_timeout abgewartet).
+        # Bei DEFERRED scheitert der spätere Wechsel vom Lesen zum Schreiben sofort mit "database is locked".
+        if self.transaction_mode is None:
+            super()._start_transaction_under_autocommit()
+        else:
+            self.cursor().execute(f'BEGIN {self.transaction_mode}')
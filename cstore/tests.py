@@ -0,0 +1,408 @@
+import datetime
+import io
+import time
+import os
+import shutil
+import tempfile
+from decimal import Decimal
+from unittest import mock
+
+from asgiref.sync import iscoroutinefunction
+from django.conf import settings
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.db import connection, transaction
+from django.http import HttpResponse
+from django.test import RequestFactory, SimpleTestCase, TestCase, TransactionTestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.utils.translation import gettext_lazy
+from rest_framework.renderers import JSONRenderer
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import AccessToken, RefreshToken
+
+from . import authentication, hashers, metrics, parsers, renderers, routers
+from .sqlite.base import DatabaseWrapper
+
+
+class MediaServingTests(SimpleTestCase):
+    def setUp(self):
+        self.media_root = tempfile.mkdtemp()
+        self.settings = override_settings(MEDIA_ROOT=self.media_root)
+        self.settings.enable()
+        self.content = bytes(range(256)) * 40
+        digest = "ab" * 32
+        os.makedirs(os.path.join(self.media_root, "products", "variants", digest))
+        for name in ("products/bild.png", f"products/variants/{digest}/160.webp"):
+            with open(os.path.join(self.media_root, name), "wb") as fh:
+                fh.write(self.content)
+        self.hashed_url = f"/media/products/variants/{digest}/160.webp"
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.media_root)
+
+    def test_full_response_with_validators(self):
+        response = self.client.get("/media/products/bild.png")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(b"".join(response.streaming_content), self.content)
+        self.assertEqual(response["Content-Type"], "image/png")
+        self.assertTrue(response["ETag"].startswith('"'))
+        self.assertIn("Last-Modified", response)
+        self.assertEqual(response["Cache-Control"], "public, max-age=3600, must-revalidate")
+        self.assertEqual(self.client.get(self.hashed_url)["Cache-Control"], "public, max-age=31536000, immutable")
+
+    def test_conditional_requests_return_304(self):
+        first = self.client.get("/media/products/bild.png")
+        response = self.client.get("/media/products/bild.png", HTTP_IF_NONE_MATCH=first["ETag"])
+        self.assertEqual(response.status_code, 304)
+        self.assertEqual(response["ETag"], first["ETag"])
+        response = self.client.get("/media/products/bild.png", HTTP_IF_MODIFIED_SINCE=first["Last-Modified"])
+        self.assertEqual(response.status_code, 304)
+
+    def test_byte_ranges(self):
+        response = self.client.get("/media/products/bild.png", HTTP_RANGE="bytes=10-19")
+        self.assertEqual(response.status_code, 206)
+        self.assertEqual(response["Content-Range"], f"bytes 10-19/{len(self.content)}")
+        self.assertEqual(b"".join(response.streaming_content), self.content[10:20])
+        response = self.client.get("/media/products/bild.png", HTTP_RANGE="bytes=-5")
+        self.assertEqual(b"".join(response.streaming_content), self.content[-5:])
+        response = self.client.get("/media/products/bild.png", HTTP_RANGE=f"bytes={len(self.content)}-")
+        self.assertEqual(response.status_code, 416)
+        # Veraltetes If-Range liefert die ganze Datei
+        response = self.client.get("/media/products/bild.png", HTTP_RANGE="bytes=0-1", HTTP_IF_RANGE='"alt"')
+        self.assertEqual(response.status_code, 200)
+
+    def test_path_traversal_is_rejected(self):
+        self.assertEqual(self.client.get("/media/../manage.py").status_code, 404)
+        self.assertEqual(self.client.get("/media/products/fehlt.png").status_code, 404)
+
+
+class FastJSONTests(SimpleTestCase):
+    data = {
+        "id": 1,
+        "price": Decimal("19.99"),
+        "total": Decimal("0.10"),
+        "created_at": datetime.datetime(2024, 5, 30, 20, 53, 54, 617671, tzinfo=datetime.timezone.utc),
+        "date": datetime.date(2024, 5, 30),
+        "name": "Kopfhörer \u2028 \u2029 \u00e9",
+        "label": gettext_lazy("Pending"),
+        "tags": ["audio", "apple"],
+        "nested": [{"a": None, "b": True, "c": 1.5}],
+    }
+
+    def test_output_matches_drf_renderer(self):
+        expected = JSONRenderer().render(self.data)
+        self.assertEqual(renderers.FastJSONRenderer().render(self.data), expected)
+        with mock.patch.object(renderers, "orjson", None):
+            self.assertEqual(renderers.FastJSONRenderer().render(self.data), expected)
+        # Eingerückte Ausgabe (z. B. für die Browsable API) fällt auf DRF zurück
+        self.assertEqual(
+            renderers.FastJSONRenderer().render(self.data, "application/json; indent=4"),
+            JSONRenderer().render(self.data, "application/json; indent=4"),
+        )
+
+    def test_streaming_renders_the_same_array(self):
+        items = [dict(self.data, id=i) for i in range(50)]
+        chunks = list(renderers.FastJSONRenderer().render_iter(iter(items), chunk_size=256))
+        self.assertGreater(len(chunks), 1)
+        self.assertEqual(b"".join(chunks), JSONRenderer().render(items))
+        self.assertEqual(b"".join(renderers.FastJSONRenderer().render_iter([])), b"[]")
+
+    def test_parser_round_trip(self):
+        body = renderers.FastJSONRenderer().render({"product_id": 3, "name": "Kopfhörer"})
+        parsed = parsers.FastJSONParser().parse(io.BytesIO(body))
+        self.assertEqual(parsed, {"product_id": 3, "name": "Kopfhörer"})
+        with self.assertRaises(parsers.ParseError):
+            parsers.FastJSONParser().parse(io.BytesIO(b"{kaputt"))
+
+
+class SQLiteProfileTests(TransactionTestCase):
+    def pragma(self, name):
+        with connection.cursor() as cursor:
+            cursor.execute(f"PRAGMA {name}")
+            return cursor.fetchone()[0]
+
+    def test_pragmas_are_applied_on_connect(self):
+        connection.close()
+        # Ohne CSTORE_DB_NAME/CSTORE_DB_JOURNAL_MODE bleibt es beim Rollback-Journal (eingecheckte db.sqlite3)
+        self.assertEqual(self.pragma("journal_mode"), "delete")
+        self.assertEqual(self.pragma("synchronous"), 2)  # FULL
+        self.assertEqual(self.pragma("busy_timeout"), 5000)
+        self.assertEqual(self.pragma("cache_size"), -20000)
+
+    def test_default_profile_uses_wal(self):
+        directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, directory)
+        settings_dict = dict(connection.settings_dict, NAME=os.path.join(directory, "wal.sqlite3"), OPTIONS={})
+        wrapper = DatabaseWrapper(settings_dict)
+        self.addCleanup(wrapper.close)
+        with wrapper.cursor() as cursor:
+            self.assertEqual(cursor.execute("PRAGMA journal_mode").fetchone()[0], "wal")
+            self.assertEqual(cursor.execute("PRAGMA synchronous").fetchone()[0], 1)  # NORMAL
+
+    def test_atomic_begins_immediate_transaction(self):
+        with CaptureQueriesContext(connection) as queries:
+            with transaction.atomic():
+                pass
+        self.assertEqual(queries.captured_queries[0]["sql"], "BEGIN IMMEDIATE")
+
+    def test_invalid_transaction_mode_is_rejected(self):
+        settings_dict = dict(connection.settings_dict, OPTIONS={"transaction_mode": "LAZY"})
+        with self.assertRaises(ImproperlyConfigured):
+            DatabaseWrapper(settings_dict).get_connection_params()
+
+
+@override_settings(DATABASE_REPLICAS=["replica1", "replica2"], DATABASE_STICKY_SECONDS=5)
+class ReplicaRouterTests(SimpleTestCase):
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+        from store.models import Cart, Product
+
+        self.router = routers.PrimaryReplicaRouter()
+        self.Product, self.Cart, self.User = Product, Cart, get_user_model()
+        self.factory = RequestFactory()
+        cache.clear()
+
+    def route(self, request):
+        # Ziel für Produkt- und Warenkorb-Lesezugriffe innerhalb der Anfrage ermitteln
+        seen = {}
+
+        def view(request):
+            seen["product"] = self.router.db_for_read(self.Product)
+            seen["cart"] = self.router.db_for_read(self.Cart)
+            return HttpResponse()
+
+        routers.ReplicaRoutingMiddleware(view)(request)
+        return seen
+
+    def test_reads_outside_requests_use_primary(self):
+        self.assertEqual(self.router.db_for_read(self.Product), "default")
+        self.assertEqual(self.router.db_for_write(self.Product), "default")
+
+    def test_catalog_reads_go_to_replicas(self):
+        seen = self.route(self.factory.get("/store/products/"))
+        self.assertIn(seen["product"], ("replica1", "replica2"))
+        self.assertEqual(seen["cart"], "default")
+        self.assertEqual(self.route(self.factory.post("/store/products/"))["product"], "default")
+
+    def test_client_sticks_to_primary_after_write(self):
+        auth = {"HTTP_AUTHORIZATION": "Bearer abc"}
+        self.route(self.factory.post("/store/cart/add_product/", **auth))
+        self.assertEqual(self.route(self.factory.get("/store/products/", **auth))["product"], "default")
+        # Andere Clients lesen weiter vom Replikat
+        other = self.route(self.factory.get("/store/products/", HTTP_AUTHORIZATION="Bearer xyz"))
+        self.assertIn(other["product"], ("replica1", "replica2"))
+
+    def test_catalog_cache_fill_from_replica_is_short_lived(self):
+        from rest_framework.response import Response
+
+        from store.cache import cached_response
+
+        seen = []
+
+        def view(request):
+            def fill():
+                seen.append(self.router.db_for_read(self.Product))
+                return Response({})
+            cached_response(request, fill)
+            seen.append(self.router.db_for_read(self.Product))
+            return HttpResponse()
+
+        with mock.patch.object(cache, "set") as cache_set:
+            routers.ReplicaRoutingMiddleware(view)(self.factory.get("/store/products/"))
+        self.assertIn(seen[0], ("replica1", "replica2"))
+        self.assertIn(seen[1], ("replica1", "replica2"))
+        self.assertEqual(cache_set.call_args.args[2], settings.CATALOG_REPLICA_CACHE_TIMEOUT)
+
+    def test_related_reads_follow_instance_and_replicas_are_not_migrated(self):
+        product = self.Product(name="Stuhl")
+        product._state.db = "replica2"
+        self.assertEqual(self.router.db_for_read(self.User, instance=product), "replica2")
+        self.assertIs(self.router.allow_migrate("replica1", "store"), False)
+        self.assertIsNone(self.router.allow_migrate("default", "store"))
+        other = self.Product(name="Tisch")
+        other._state.db = "default"
+        self.assertIs(self.router.allow_relation(product, other), True)
+
+
+class ClaimsJWTAuthenticationTests(TestCase):
+    def setUp(self):
+        from django.contrib.auth import get_user_model
+
+        cache.clear()
+        authentication._revoked.clear()
+        self.user = get_user_model().objects.create_user(username="kunde", password="geheim123", email="k@example.com")
+        self.client = APIClient()
+
+    def login(self):
+        response = self.client.post("/api/auth/login/", {"username": "kunde", "password": "geheim123"}, format="json")
+        self.assertEqual(response.status_code, 200)
+        return {"HTTP_AUTHORIZATION": f"Bearer {response.json()['access']}"}
+
+    def test_login_token_carries_user_claims(self):
+        token = AccessToken(self.login()["HTTP_AUTHORIZATION"].split()[1])
+        self.assertEqual((token["username"], token["is_staff"]), ("kunde", False))
+
+    def test_authenticated_request_does_not_query_users(self):
+        auth = self.login()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/store/carts/", **auth)
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse([q for q in queries.captured_queries if "auth_user" in q["sql"]])
+
+    def test_claims_user_loads_model_lazily(self):
+        token = AccessToken(self.login()["HTTP_AUTHORIZATION"].split()[1])
+        user = authentication.ClaimsUser(token)
+        with self.assertNumQueries(0):
+            self.assertEqual((user.id, user.username, user.is_authenticated), (self.user.id, "kunde", True))
+        with self.assertNumQueries(1):
+            self.assertEqual(user.email, "k@example.com")
+            self.assertEqual(user.email, "k@example.com")
+
+    def token(self, age=0):
+        # Access-Token wie aus einem Login; age verschiebt den Ausstellungszeitpunkt (iat) in die Vergangenheit
+        token = authentication.ClaimsTokenObtainPairSerializer.get_token(self.user).access_token
+        token["iat"] -= age
+        return {"HTTP_AUTHORIZATION": f"Bearer {token}"}
+
+    def save_user(self, ago=2, **changes):
+        # Sperre `ago` Sekunden "früher" setzen, damit danach ausgestellte Tokens (iat in Sekunden) gültig sind
+        for field, value in changes.items():
+            setattr(self.user, field, value)
+        with mock.patch.object(authentication.time, "time", return_value=time.time() - ago):
+            self.user.save()
+
+    def test_deactivated_user_is_rejected(self):
+        auth = self.token(age=5)
+        self.assertEqual(self.client.get("/store/carts/", **auth).status_code, 200)
+        self.save_user(is_active=False)
+        self.assertEqual(self.client.get("/store/carts/", **auth).status_code, 401)
+        # Reaktivieren gibt die alten Tokens nicht wieder frei, ein neuer Login schon
+        self.save_user(is_active=True)
+        self.assertEqual(self.client.get("/store/carts/", **auth).status_code, 401)
+        self.assertEqual(self.client.get("/store/carts/", **self.token()).status_code, 200)
+
+    def test_demoted_staff_loses_admin_claims(self):
+        self.save_user(ago=10, is_staff=True)
+        auth = self.token(age=5)
+        self.assertTrue(AccessToken(auth["HTTP_AUTHORIZATION"].split()[1])["is_staff"])
+        self.assertEqual(self.client.get("/store/carts/", **auth).status_code, 200)
+        self.save_user(is_staff=False)
+        self.assertEqual(self.client.get("/store/carts/", **auth).status_code, 401)
+        self.assertFalse(AccessToken(self.token()["HTTP_AUTHORIZATION"].split()[1])["is_staff"])
+
+    def test_unrelated_changes_do_not_revoke(self):
+        auth = self.token()
+        self.login()  # Aktualisiert last_login
+        self.user.email = "neu@example.com"
+        self.user.save()
+        self.assertEqual(self.client.get("/store/carts/", **auth).status_code, 200)
+
+    def test_deploy_check_requires_shared_revocation_cache(self):
+        self.assertEqual([e.id for e in authentication.check_revocation_cache(None)], ["cstore.E001"])
+        shared = {"default": {"BACKEND": "django.core.cache.backends.filebased.FileBasedCache", "LOCATION": "/tmp"}}
+        with self.settings(CACHES=shared):
+            self.assertEqual(authentication.check_revocation_cache(None), [])
+
+    def test_tokens_without_claims_fall_back_to_database(self):
+        auth = {"HTTP_AUTHORIZATION": f"Bearer {RefreshToken.for_user(self.user).access_token}"}
+        with CaptureQueriesContext(connection) as queries:
+            self.assertEqual(self.client.get("/store/carts/", **auth).status_code, 200)
+        self.assertTrue([q for q in queries.captured_queries if "auth_user" in q["sql"]])
+
+
+@override_settings(PASSWORD_HASH_ITERATIONS=1000)
+class RegistrationTests(TestCase):
+    def register(self, **data):
+        payload = {"username": "neukunde", "password": "sicheres-passwort-42", "email": "n@example.com", **data}
+        return APIClient().post("/api/auth/create/", payload, format="json")
+
+    def test_registration_hashes_once_and_inserts_once(self):
+        from django.contrib.auth import get_user_model
+
+        with CaptureQueriesContext(connection) as queries:
+            response = self.register()
+        self.assertEqual(response.status_code, 201)
+        self.assertEqual(response.json()["username"], "neukunde")
+        writes = [q["sql"] for q in queries.captured_queries if not q["sql"].startswith(("SELECT", "SAVEPOINT", "RELEASE"))]
+        self.assertEqual(len(writes), 1)
+        self.assertTrue(writes[0].startswith('INSERT INTO "auth_user"'))
+        user = get_user_model().objects.get(username="neukunde")
+        self.assertTrue(user.password.startswith("pbkdf2_sha256$1000$"))
+        self.assertTrue(user.check_password("sicheres-passwort-42"))
+
+    def test_taken_username_conflicts_without_hashing(self):
+        self.register()
+        with mock.patch("cstore.views.make_password") as make_password:
+            response = self.register(email="")
+        self.assertEqual(response.status_code, 409)
+        make_password.assert_not_called()
+
+    def test_invalid_input_is_rejected(self):
+        self.assertEqual(self.register(username="").status_code, 400)
+        response = self.register(password="123")
+        self.assertEqual(response.status_code, 400)
+        self.assertIn("password", response.json())
+
+    def test_hasher_cost_is_configurable_and_old_hashes_are_upgraded(self):
+        from django.contrib.auth.hashers import identify_hasher, make_password
+
+        encoded = make_password("geheim", hasher="pbkdf2_sha256")
+        self.assertIn("$1000$", encoded)
+        with self.settings(PASSWORD_HASH_ITERATIONS=2000):
+            self.assertTrue(identify_hasher(encoded).must_update(encoded))
+
+    def test_full_hash_pool_returns_503(self):
+        hashers.get_executor()
+        with mock.patch.object(hashers, "_slots", mock.Mock(**{"acquire.return_value": False})):
+            self.assertEqual(self.register().status_code, 503)
+
+
+@override_settings(METRICS_ENABLED=True, METRICS_RESPONSE_HEADER=True, METRICS_TOKEN="scraper-token")
+class MetricsTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        metrics.registry.reset()
+
+    def test_request_is_recorded_per_route(self):
+        response = self.client.get("/store/products/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("render;dur=", response["Server-Timing"])
+        self.assertGreater(int(response["X-Query-Count"]), 0)
+
+        text = self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer scraper-token").content.decode()
+        self.assertIn('cstore_request_duration_seconds_count{route="product-list",method="GET"} 1', text)
+        self.assertIn('cstore_responses_total{route="product-list",method="GET",status="200"} 1', text)
+        self.assertIn('cstore_request_queries_bucket{route="product-list",method="GET",le="+Inf"} 1', text)
+
+    def test_repeated_statements_count_as_duplicates(self):
+        stats = metrics.RequestStats()
+        execute = mock.Mock(return_value=None)
+        for value in (1, 2, 3):
+            stats(execute, "SELECT * FROM t WHERE id = %s", (value,), False, {})
+        stats(execute, "SELECT 1", (), False, {})
+        self.assertEqual((stats.queries, stats.duplicates), (4, 2))
+
+    @override_settings(METRICS_ENABLED=False)
+    def test_disabled_middleware_is_not_loaded(self):
+        response = self.client.get("/store/products/")
+        self.assertNotIn("X-Query-Count", response)
+        self.assertEqual(metrics.registry.latency, {})
+        self.assertEqual(self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer scraper-token").status_code, 404)
+
+    def test_endpoint_requires_staff_or_token(self):
+        from django.contrib.auth import get_user_model
+
+        self.assertEqual(self.client.get("/metrics/").status_code, 403)
+        self.assertEqual(self.client.get("/metrics/", HTTP_AUTHORIZATION="Bearer falsch").status_code, 403)
+        self.client.force_login(get_user_model().objects.create_user(username="ops", is_staff=True))
+        self.assertEqual(self.client.get("/metrics/").status_code, 200)
+
+    async def test_async_requests_stay_async(self):
+        async def view(request):
+            return HttpResponse()
+
+        self.assertTrue(iscoroutinefunction(metrics.MetricsMiddleware(view)))
+        response = await self.async_client.get("/store/async/products/")
+        self.assertEqual(response.status_code, 200)
+        self.assertIn("X-Query-Count", response)
@@ -1,9 +1,10 @@
 from django.contrib import admin
-from django.urls import path, include
+from django.urls import path, include, re_path
 from rest_framework_simplejwt.views import TokenObtainPairView
 from django.conf import settings
 from django.conf.urls.static import static
 from .views import UserView, UserCreate
+from . import media, metrics
 from rest_framework.routers import SimpleRouter
 
 # Router für die UserView erstellen
@@ -18,7 +19,17 @@ urlpatterns = [
     path("store/", include("store.urls"), name="store"),  # URLs für die Store-Anwendung einbinden
 ]
 
-# Einstellungen für das Servieren von Medien- und statischen Dateien im Debug-Modus
+# Mediendateien (Produktbilder) über die eigene View mit ETags, Range-Anfragen und Cache-Headern ausliefern
+if settings.SERVE_MEDIA:
+    urlpatterns += [
+        re_path(r'^%s(?P<path>.*)$' % settings.MEDIA_URL.lstrip('/'), media.serve, name='media'),
+    ]
+
+# Metriken im Prometheus-Textformat (404, solange METRICS_ENABLED aus ist; sonst nur Staff oder METRICS_TOKEN)
+urlpatterns += [
+    path('metrics/', metrics.metrics_view, name='metrics'),
+]
+
+# Einstellungen für das Servieren von statischen Dateien im Debug-Modus
 if settings.DEBUG:
-    urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
     urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)
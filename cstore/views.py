@@ -1,8 +1,10 @@
 from rest_framework.viewsets import ModelViewSet
-from .serializers import UserSerializer
+from .serializers import RegistrationSerializer, UserSerializer
 from rest_framework import status, permissions
 from rest_framework.response import Response
 from django.contrib.auth import get_user_model
+from django.contrib.auth.hashers import make_password
+from django.db import IntegrityError, transaction
 from rest_framework.generics import CreateAPIView
 
 # Das User-Modell abrufen
@@ -21,23 +23,29 @@ class UserView(ModelViewSet):
 # View zum Erstellen eines neuen Benutzers
 class UserCreate(CreateAPIView):
     queryset = get_user_model().objects.all()  # Alle Benutzerobjekte abfragen
-    serializer_class = UserSerializer  # Serializer, der für diese View verwendet wird
+    serializer_class = RegistrationSerializer  # Eingaben prüfen, Ausgabe über UserSerializer
     permission_classes = []  # Keine Berechtigung erforderlich
 
     def create(self, request, *args, **kwargs):
-        # Benutzerdaten aus der Anfrage abrufen
-        username = request.data.get('username')
-        password = request.data.get('password')
-        email = request.data.get('email')
-        
+        serializer = self.get_serializer(data=request.data)
+        serializer.is_valid(raise_exception=True)  # Ungültige Eingaben -> 400
+        data = serializer.validated_data
+
+        # Indexierte Vorabprüfung (username ist unique), bevor der teure Hash berechnet wird
+        if User.objects.filter(username=data['username']).exists():
+            return self.username_taken()
+
+        # Einmal hashen (im begrenzten Pool aus cstore.hashers, bei Überlast 503) und einmal einfügen
+        user = User(username=data['username'], email=data['email'], password=make_password(data['password']))
         try:
-            # Neuen Benutzer erstellen
-            user = get_user_model().objects.create(username=username, password=password, email=email)
-            user.set_password(password)  # Passwort setzen und hashen
-            user.is_active = True  # Benutzer aktivieren
-            user.save()  # Benutzer speichern
-            return Response(status=status.HTTP_201_CREATED)
-        except Exception as e:
-            print(e)
-            # Fehlermeldung zurückgeben, wenn die Erstellung fehlschlägt
-            return Response(status=status.HTTP_401_UNAUTHORIZED, data={"status": "error", "content": f"Request failed because {e}", "exists": True})
+            with transaction.atomic():
+                user.save(force_insert=True)
+        except IntegrityError:
+            # Gleichzeitige Registrierung mit demselben Namen
+            return self.username_taken()
+        return Response(UserSerializer(user).data, status=status.HTTP_201_CREATED)
+
+    def username_taken(self):
+        return Response(
+            {'username': ['A user with that username already exists.']}, status=status.HTTP_409_CONFLICT
+        )
@@ -1,8 +1,8 @@
 from django.contrib import admin
-from .models import Product, Order, CartItem, Cart
+from .models import Product, ProductSlugRedirect, Order, CartItem, Cart, StockReservation, OrderLine, Job
 
 # Eine Liste der Modelle, die im Admin-Bereich registriert werden sollen
-models = [Product, Order, CartItem, Cart]
+models = [Product, ProductSlugRedirect, Order, OrderLine, CartItem, Cart, StockReservation, Job]
 
 # Jedes Modell in der Liste im Admin-Bereich registrieren
 for model in models:
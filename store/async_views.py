@@ -0,0 +1,107 @@
+from asgiref.sync import sync_to_async
+from django.db.models import Prefetch
+from django.http import Http404, JsonResponse
+from rest_framework import exceptions
+from rest_framework.settings import api_settings
+
+from .cache import acached_json
+from .models import Cart, Comment, Order, Product
+from .serializers import CartSerializer, OrderSerializer, ProductSerializer
+
+# Asynchrone (ASGI-native) Varianten der meistgenutzten Lesezugriffe.
+# Unter ASGI blockieren sie keinen Worker-Thread, solange auf die Datenbank gewartet wird.
+
+PAGE_SIZE = 20
+MAX_PAGE_SIZE = 100
+
+# Vorab zu ladende Beziehungen für verschachtelte Produkte in Warenkörben und Bestellungen
+PRODUCT_PREFETCHES = ['tags', Prefetch('comments', queryset=Comment.objects.select_related('user'))]
+
+
+async def authenticate(request):
+    # Die konfigurierten DRF-Authentifizierungsklassen nacheinander ausprobieren.
+    # Liefert (Benutzer, None) oder (None, Fehlerantwort); ungültige oder abgelaufene Tokens ergeben wie im
+    # synchronen Pfad einen 401 statt einer anonymen Anfrage.
+    for auth_class in api_settings.DEFAULT_AUTHENTICATION_CLASSES:
+        try:
+            result = await sync_to_async(auth_class().authenticate)(request)
+        except exceptions.APIException as exc:
+            return None, error_response(request, exc)
+        if result is not None:
+            return result[0], None
+    return None, error_response(request, exceptions.NotAuthenticated())
+
+
+def error_response(request, exc):
+    # Antwort wie DRFs exception_handler: Details unverändert, bei fehlender Anmeldung 401 mit WWW-Authenticate
+    data = exc.detail if isinstance(exc.detail, (list, dict)) else {'detail': exc.detail}
+    response = JsonResponse(data, status=exc.status_code, safe=False)
+    if isinstance(exc, (exceptions.NotAuthenticated, exceptions.AuthenticationFailed)):
+        classes = api_settings.DEFAULT_AUTHENTICATION_CLASSES
+        header = classes[0]().authenticate_header(request) if classes else None
+        if header:
+            response['WWW-Authenticate'] = header
+        else:
+            response.status_code = 403
+    return response
+
+
+async def product_list(request):
+    # Produktliste mit Keyset-Paginierung über ?after=<id>, über den Katalog-Cache
+    try:
+        after = int(request.GET.get('after', 0))
+        page_size = min(int(request.GET.get('page_size', PAGE_SIZE)), MAX_PAGE_SIZE)
+        if page_size < 1:
+            raise ValueError(page_size)
+    except ValueError:
+        return JsonResponse({'detail': 'Invalid pagination parameters.'}, status=400)
+
+    async def view():
+        queryset = Product.objects.filter(id__gt=after).order_by('id')[:page_size]
+        products = [product async for product in queryset.aiterator(chunk_size=page_size)]
+        return {
+            'next_after': products[-1].id if len(products) == page_size else None,
+            'results': ProductSerializer(
+                products, many=True, fields=ProductSerializer.LIST_FIELDS, context={'request': request}
+            ).data,
+        }
+
+    return await acached_json(request, view)
+
+
+async def product_detail(request, pk):
+    async def view():
+        try:
+            product = await Product.objects.prefetch_related('tags').aget(pk=pk)
+        except Product.DoesNotExist:
+            raise Http404('Product not found')
+        fields = [f for f in ProductSerializer.Meta.fields if f not in ProductSerializer.EXPANDABLE_FIELDS]
+        return ProductSerializer(product, fields=fields, context={'request': request}).data
+
+    return await acached_json(request, view)
+
+
+async def cart_detail(request, pk):
+    user, error = await authenticate(request)
+    if error is not None:
+        return error
+    queryset = Cart.objects.select_related('user').prefetch_related(
+        Prefetch('items__product', queryset=Product.objects.prefetch_related(*PRODUCT_PREFETCHES))
+    )
+    try:
+        cart = await queryset.aget(pk=pk, user_id=user.id)
+    except Cart.DoesNotExist:
+        raise Http404('Cart not found')
+    return JsonResponse(CartSerializer(cart, context={'request': request}).data)
+
+
+async def order_list(request):
+    user, error = await authenticate(request)
+    if error is not None:
+        return error
+    # Wie OrderViewSet: Artikel aus den Bestellzeilen statt aus Warenkorb und Produkten
+    queryset = Order.objects.filter(user_id=user.id).select_related('user').prefetch_related('lines').order_by(
+        '-created_at'
+    )
+    orders = [order async for order in queryset.aiterator(chunk_size=100)]
+    return JsonResponse(OrderSerializer(orders, many=True, context={'request': request}).data, safe=False)
@@ -0,0 +1,123 @@
+import hashlib
+import time
+
+from django.conf import settings
+from asgiref.sync import sync_to_async
+from django.core.cache import caches
+from django.http import JsonResponse
+from rest_framework.response import Response
+
+from cstore.routers import track_replica_reads
+
+# Schlüssel für den Versionszähler des Katalogs und die Trefferstatistik
+VERSION_KEY = 'catalog:version'
+HITS_KEY = 'catalog:hits'
+MISSES_KEY = 'catalog:misses'
+
+
+def get_cache():
+    # Cache-Backend für Katalogantworten (jedes Django-Cache-Backend funktioniert)
+    return caches[getattr(settings, 'CATALOG_CACHE_ALIAS', 'default')]
+
+
+def get_catalog_version():
+    cache = get_cache()
+    version = cache.get(VERSION_KEY)
+    if version is None:
+        # Startwert aus der Uhrzeit, damit nach einer Verdrängung keine alte Version wiederverwendet wird
+        cache.add(VERSION_KEY, int(time.time() * 1000), timeout=None)
+        version = cache.get(VERSION_KEY)
+    return version
+
+
+def bump_catalog_version():
+    # Neue Version -> alle bisherigen Einträge werden nicht mehr gelesen und laufen einfach ab
+    cache = get_cache()
+    try:
+        return cache.incr(VERSION_KEY)
+    except ValueError:
+        get_catalog_version()
+        return cache.incr(VERSION_KEY)
+
+
+def _increment(key):
+    cache = get_cache()
+    try:
+        cache.incr(key)
+    except ValueError:
+        if not cache.add(key, 1, timeout=None):
+            cache.incr(key)
+
+
+async def _aincrement(key):
+    cache = get_cache()
+    try:
+        await cache.aincr(key)
+    except ValueError:
+        if not await cache.aadd(key, 1, timeout=None):
+            await cache.aincr(key)
+
+
+def get_cache_stats():
+    # Treffer- und Fehlzugriffszähler des Antwort-Caches
+    cache = get_cache()
+    return {
+        'version': get_catalog_version(),
+        'hits': cache.get(HITS_KEY, 0),
+        'misses': cache.get(MISSES_KEY, 0),
+    }
+
+
+def build_cache_key(request, version):
+    # Schlüssel aus Katalogversion, Schema, Host, Pfad und sortierter Query-String
+    # (die Antworten enthalten absolute URLs und dürfen nicht über Host-Header geteilt werden)
+    query = '&'.join(sorted(request.GET.urlencode().split('&')))
+    url = f'{request.scheme}://{request.get_host()}{request.path}?{query}'
+    digest = hashlib.md5(url.encode()).hexdigest()
+    return f'catalog:{version}:{digest}'
+
+
+def get_fill_timeout(replicas_used):
+    # Von einem Replikat gelesene Daten können hinter der Katalogversion zurückliegen und werden nur kurz gespeichert
+    if replicas_used:
+        return getattr(settings, 'CATALOG_REPLICA_CACHE_TIMEOUT', 5)
+    return getattr(settings, 'CATALOG_CACHE_TIMEOUT', 300)
+
+
+def cached_response(request, view):
+    # Read-Through: Antwortdaten aus dem Cache liefern oder die View ausführen und speichern
+    cache = get_cache()
+    key = build_cache_key(request, get_catalog_version())
+    data = cache.get(key)
+    if data is not None:
+        _increment(HITS_KEY)
+        response = Response(data)
+        response['X-Cache'] = 'HIT'
+        return response
+
+    _increment(MISSES_KEY)
+    with track_replica_reads() as replicas_used:
+        response = view()
+    if response.status_code == 200:
+        cache.set(key, response.data, get_fill_timeout(replicas_used))
+    response['X-Cache'] = 'MISS'
+    return response
+
+
+async def acached_json(request, view):
+    # Asynchrone Variante von cached_response für ASGI-Views; view() liefert die Antwortdaten
+    cache = get_cache()
+    version = await cache.aget(VERSION_KEY)
+    if version is None:
+        version = await sync_to_async(get_catalog_version)()
+    key = build_cache_key(request, version)
+    data = await cache.aget(key)
+    if data is not None:
+        await _aincrement(HITS_KEY)
+        return JsonResponse(data, safe=False, headers={'X-Cache': 'HIT'})
+
+    await _aincrement(MISSES_KEY)
+    with track_replica_reads() as replicas_used:
+        data = await view()
+    await cache.aset(key, data, get_fill_timeout(replicas_used))
+    return JsonResponse(data, safe=False, headers={'X-Cache': 'MISS'})
@@ -0,0 +1,89 @@
+import csv
+
+from django.db.models import Max
+
+from cstore.renderers import FastJSONRenderer, dumps
+
+from .models import Product
+
+# Spalten des Katalogexports
+EXPORT_FIELDS = ['id', 'name', 'slug', 'category', 'price', 'quantity', 'image', 'tags', 'updated_at']
+CHUNK_SIZE = 500  # Zeilen pro Datenbankabfrage
+BUFFER_SIZE = 64 * 1024  # Bytes pro gesendetem Block
+
+
+def export_queryset(updated_since=None):
+    # Produkte für den Export und das Wasserzeichen (letzte Änderung) für den nächsten inkrementellen Lauf
+    queryset = Product.objects.all()
+    if updated_since is not None:
+        queryset = queryset.filter(updated_at__gt=updated_since)
+    watermark = queryset.aggregate(watermark=Max('updated_at'))['watermark']
+    if watermark is not None:
+        # Während des Exports geänderte Produkte kommen im nächsten Lauf
+        queryset = queryset.filter(updated_at__lte=watermark)
+    else:
+        # Nichts geändert: das bisherige Wasserzeichen bleibt gültig
+        watermark = updated_since
+    return queryset.order_by('updated_at', 'id').prefetch_related('tags'), watermark
+
+
+def export_rows(queryset, chunk_size=CHUNK_SIZE):
+    # Produkte blockweise laden, damit der Speicherbedarf unabhängig von der Kataloggröße bleibt
+    for product in queryset.iterator(chunk_size=chunk_size):
+        yield {
+            'id': product.id,
+            'name': product.name,
+            'slug': product.slug,
+            'category': product.category,
+            'price': str(product.price),
+            'quantity': product.quantity,
+            'image': product.image.url if product.image else None,
+            'tags': sorted(tag.name for tag in product.tags.all()),
+            'updated_at': product.updated_at.isoformat(),
+        }
+
+
+def buffered(chunks, size=BUFFER_SIZE):
+    # Kleine Stücke zu größeren Blöcken zusammenfassen
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer += chunk
+        if len(buffer) >= size:
+            yield bytes(buffer)
+            buffer.clear()
+    if buffer:
+        yield bytes(buffer)
+
+
+def iter_ndjson(rows):
+    return buffered(dumps(row) + b'\n' for row in rows)
+
+
+class Echo:
+    # Pseudo-Datei für csv.writer, die die geschriebene Zeile direkt zurückgibt
+    def write(self, value):
+        return value
+
+
+def iter_csv(rows):
+    writer = csv.writer(Echo())
+
+    def lines():
+        yield writer.writerow(EXPORT_FIELDS).encode()
+        for row in rows:
+            row['tags'] = ','.join(row['tags'])
+            yield writer.writerow([row[field] for field in EXPORT_FIELDS]).encode()
+
+    return buffered(lines())
+
+
+# Renderer für die Inhaltsaushandlung des Export-Endpunkts (?format=ndjson|csv|json).
+# Die Zeilen werden im View gestreamt; gerendert werden hier nur Fehlermeldungen.
+class NDJSONRenderer(FastJSONRenderer):
+    media_type = 'application/x-ndjson'
+    format = 'ndjson'
+
+
+class CSVRenderer(FastJSONRenderer):
+    media_type = 'text/csv'
+    format = 'csv'
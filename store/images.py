@@ -0,0 +1,133 @@
+import base64
+import hashlib
+import io
+import logging
+from concurrent.futures import ThreadPoolExecutor
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from django.core.files.storage import default_storage
+from django.db import connection, transaction
+from django.utils import timezone
+from PIL import Image, ImageOps
+
+from .cache import bump_catalog_version
+
+logger = logging.getLogger(__name__)
+
+# Ausgabeformate der Varianten mit ihren Pillow-Optionen
+FORMATS = {
+    'webp': ('WEBP', {'quality': 80, 'method': 4}),
+    'jpeg': ('JPEG', {'quality': 82, 'optimize': True, 'progressive': True}),
+}
+PLACEHOLDER_WIDTH = 16  # Breite des winzigen Platzhalterbilds
+
+_executor = None
+
+
+def get_executor():
+    # Thread-Pool für die Bildverarbeitung außerhalb des Requests (wird beim ersten Gebrauch angelegt)
+    global _executor
+    if _executor is None:
+        _executor = ThreadPoolExecutor(
+            max_workers=getattr(settings, 'PRODUCT_IMAGE_WORKERS', 2), thread_name_prefix='product-images'
+        )
+    return _executor
+
+
+def schedule(product_id):
+    # Verarbeitung erst nach dem Commit starten, damit der Worker das gespeicherte Produkt sieht
+    if getattr(settings, 'PRODUCT_IMAGE_ASYNC', True):
+        transaction.on_commit(lambda: get_executor().submit(_run, product_id))
+    else:
+        transaction.on_commit(lambda: process_product_image(product_id))
+
+
+def _run(product_id):
+    try:
+        process_product_image(product_id)
+    except Exception:
+        logger.exception('Processing the image of product %s failed', product_id)
+    finally:
+        connection.close()  # Jeder Worker-Thread hat seine eigene Verbindung
+
+
+def file_hash(field):
+    # SHA-256 des Dateiinhalts in Blöcken berechnen
+    digest = hashlib.sha256()
+    with field.open('rb') as fh:
+        for chunk in iter(lambda: fh.read(64 * 1024), b''):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def _encode(image, fmt):
+    # Bild im gewünschten Format kodieren; JPEG kennt keine Transparenz
+    name, options = FORMATS[fmt]
+    if fmt == 'jpeg' and image.mode == 'RGBA':
+        background = Image.new('RGB', image.size, (255, 255, 255))
+        background.paste(image, mask=image.getchannel('A'))
+        image = background
+    buffer = io.BytesIO()
+    image.save(buffer, name, **options)
+    return buffer.getvalue()
+
+
+def render_variants(field, digest):
+    # Verkleinerte WebP/JPEG-Varianten und einen Platzhalter erzeugen; Pfade enthalten den Inhalts-Hash
+    with field.open('rb') as fh:
+        image = Image.open(fh)
+        image.load()
+    image = ImageOps.exif_transpose(image)
+    has_alpha = image.mode in ('RGBA', 'LA') or (image.mode == 'P' and 'transparency' in image.info)
+    image = image.convert('RGBA' if has_alpha else 'RGB')
+
+    widths = [w for w in getattr(settings, 'PRODUCT_IMAGE_WIDTHS', (160, 480, 960)) if w < image.width] or [image.width]
+    variants = {'width': image.width, 'height': image.height}
+    for fmt in FORMATS:
+        variants[fmt] = {}
+        for width in widths:
+            path = f'products/variants/{digest}/{width}.{fmt}'
+            if not default_storage.exists(path):
+                resized = image.copy()
+                resized.thumbnail((width, image.height), Image.LANCZOS)
+                default_storage.save(path, ContentFile(_encode(resized, fmt)))
+            variants[fmt][str(width)] = path
+
+    tiny = image.copy()
+    tiny.thumbnail((PLACEHOLDER_WIDTH, PLACEHOLDER_WIDTH), Image.LANCZOS)
+    variants['placeholder'] = 'data:image/webp;base64,' + base64.b64encode(_encode(tiny, 'webp')).decode()
+    return variants
+
+
+def process_product_image(product_id, force=False):
+    # Bild eines Produkts hashen, Duplikate zusammenführen und Varianten erzeugen
+    from .models import Product
+
+    product = Product.objects.only('id', 'image', 'image_variants').filter(pk=product_id).first()
+    if product is None or not product.image:
+        return
+    if not force and product.image_variants.get('source') == product.image.name:
+        return  # Bereits verarbeitet
+
+    name = product.image.name
+    digest = file_hash(product.image)
+    twin = (
+        Product.objects.filter(image_hash=digest).exclude(pk=product.pk).exclude(image=name)
+        .only('id', 'image', 'image_variants').first()
+    )
+    if twin is not None and twin.image_variants.get('source') == twin.image.name:
+        # Identischer Upload: Datei und Varianten des anderen Produkts wiederverwenden
+        variants = dict(twin.image_variants)
+        if not Product.objects.filter(image=name).exclude(pk=product.pk).exists():
+            default_storage.delete(name)
+        name = twin.image.name
+    else:
+        variants = render_variants(product.image, digest)
+    variants['source'] = name
+
+    # Nur schreiben, wenn das Bild inzwischen nicht erneut geändert wurde; updated_at für inkrementelle Exporte setzen
+    Product.objects.filter(pk=product.pk, image=product.image.name).update(
+        image=name, image_hash=digest, image_variants=variants, updated_at=timezone.now()
+    )
+    bump_catalog_version()
@@ -0,0 +1,174 @@
+import codecs
+import csv
+import json
+from itertools import islice
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.db.models.functions import Lower
+from django.utils import timezone
+from rest_framework.parsers import BaseParser
+from taggit.models import Tag, TaggedItem
+from taggit.utils import parse_tags
+
+from cstore.renderers import orjson
+
+from . import search
+from .cache import bump_catalog_version
+from .models import Product
+from .serializers import ProductImportSerializer
+
+CHUNK_SIZE = 500  # Zeilen pro Transaktion
+# Felder, die ein Import bei vorhandenen Produkten überschreibt
+IMPORT_FIELDS = ['name', 'category', 'price', 'quantity', 'description', 'slug', 'updated_at']
+
+loads = orjson.loads if orjson is not None else json.loads
+
+
+def read_rows(lines, fmt):
+    # Zeilen einer CSV- oder NDJSON-Datei als (Zeilennummer, Daten) liefern, ohne die Datei ganz zu laden
+    if fmt == 'csv':
+        reader = csv.DictReader(codecs.iterdecode(lines, 'utf-8-sig'))
+        for row in reader:
+            row.pop(None, None)  # Überzählige Spalten ignorieren
+            if 'tags' in row:
+                row['tags'] = parse_tags(row['tags'] or '')
+            yield reader.line_num, row
+    else:
+        for number, line in enumerate(lines, 1):
+            if not line.strip():
+                continue
+            try:
+                yield number, loads(line)
+            except ValueError as exc:
+                yield number, exc
+
+
+def tag_key(name):
+    # Tags wie taggit vergleichen (TAGGIT_CASE_INSENSITIVE)
+    return name.lower() if getattr(settings, 'TAGGIT_CASE_INSENSITIVE', False) else name
+
+
+def resolve_tags(names):
+    # Tag-Objekte für alle Namen eines Blocks mit einer Abfrage suchen und fehlende gesammelt anlegen
+    wanted = {}
+    for name in names:
+        wanted.setdefault(tag_key(name), name)
+    if not wanted:
+        return {}
+    if getattr(settings, 'TAGGIT_CASE_INSENSITIVE', False):
+        existing = Tag.objects.annotate(key=Lower('name')).filter(key__in=list(wanted))
+    else:
+        existing = Tag.objects.filter(name__in=list(wanted))
+    tags = {tag_key(tag.name): tag for tag in existing}
+
+    missing = [Tag(name=name, slug=Tag().slugify(name)) for key, name in wanted.items() if key not in tags]
+    taken = set(Tag.objects.filter(slug__in=[tag.slug for tag in missing]).values_list('slug', flat=True))
+    fresh, collisions = [], []
+    for tag in missing:
+        if tag.slug and tag.slug not in taken:
+            taken.add(tag.slug)
+            fresh.append(tag)
+        else:
+            collisions.append(tag)
+    Tag.objects.bulk_create(fresh)
+    for tag in collisions:
+        # Seltener Fall: taggit sucht selbst einen freien Slug
+        tag.slug = ''
+        tag.save()
+    tags.update((tag_key(tag.name), tag) for tag in missing)
+    return tags
+
+
+def set_tags(tags_by_product):
+    # Tags mehrerer Produkte ersetzen: nur fehlende Zuordnungen einfügen, überzählige löschen
+    if not tags_by_product:
+        return
+    tags = resolve_tags(name for names in tags_by_product.values() for name in names)
+    content_type = ContentType.objects.get_for_model(Product)
+    wanted = {
+        (product_id, tags[tag_key(name)].id)
+        for product_id, names in tags_by_product.items()
+        for name in names
+    }
+    items = TaggedItem.objects.filter(content_type=content_type, object_id__in=list(tags_by_product))
+    current = {(object_id, tag_id): pk for pk, object_id, tag_id in items.values_list('id', 'object_id', 'tag_id')}
+    stale = [pk for key, pk in current.items() if key not in wanted]
+    if stale:
+        TaggedItem.objects.filter(pk__in=stale).delete()
+    TaggedItem.objects.bulk_create(
+        TaggedItem(content_type=content_type, object_id=product_id, tag_id=tag_id)
+        for product_id, tag_id in wanted - current.keys()
+    )
+
+
+def import_chunk(rows, result):
+    valid = {}
+    for number, row in rows:
+        if isinstance(row, Exception):
+            result['errors'].append({'row': number, 'errors': {'non_field_errors': [f'Invalid JSON: {row}']}})
+            continue
+        serializer = ProductImportSerializer(data=row)
+        if not serializer.is_valid():
+            result['errors'].append({'row': number, 'errors': serializer.errors})
+            continue
+        data = serializer.validated_data
+        if data['sku'] in valid:
+            result['errors'].append({'row': number, 'errors': {'sku': ['Duplicate sku in this import.']}})
+            continue
+        valid[data['sku']] = data
+    if not valid:
+        return
+
+    with transaction.atomic():
+        # Vorhandene Produkte des Blocks mit einer Abfrage über den natürlichen Schlüssel laden
+        existing = Product.objects.in_bulk(list(valid), field_name='sku')
+        now = timezone.now()
+        created, updated = [], []
+        for sku, data in valid.items():
+            fields = {key: value for key, value in data.items() if key != 'tags'}
+            product = existing.get(sku)
+            if product is None:
+                created.append(Product(image='', **fields))
+            else:
+                for key, value in fields.items():
+                    setattr(product, key, value)
+                product.updated_at = now  # bulk_update setzt auto_now nicht
+                updated.append(product)
+        # Slugs nur für neue und umbenannte Produkte vergeben, gesammelt für den ganzen Block
+        Product.assign_slugs(product for product in created + updated if product.needs_new_slug())
+        Product.objects.bulk_create(created)
+        Product.objects.bulk_update(updated, IMPORT_FIELDS)
+
+        products = created + updated
+        set_tags({product.id: valid[product.sku]['tags'] for product in products if 'tags' in valid[product.sku]})
+        search.index_products(product.id for product in products)
+        transaction.on_commit(bump_catalog_version)
+
+    result['created'] += len(created)
+    result['updated'] += len(updated)
+
+
+def import_products(rows, chunk_size=CHUNK_SIZE):
+    # Zeilen blockweise validieren und per bulk_create/bulk_update als Upsert über die Artikelnummer schreiben
+    result = {'created': 0, 'updated': 0, 'errors': []}
+    rows = iter(rows)
+    while chunk := list(islice(rows, chunk_size)):
+        import_chunk(chunk, result)
+    return result
+
+
+# Parser für Importdateien als Anfragekörper; die Zeilen werden erst beim Import gelesen
+class CSVImportParser(BaseParser):
+    media_type = 'text/csv'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return read_rows(stream or [], 'csv')
+
+
+class NDJSONImportParser(BaseParser):
+    media_type = 'application/x-ndjson'
+
+    def parse(self, stream, media_type=None, parser_context=None):
+        return read_rows(stream or [], 'ndjson')
@@ -0,0 +1,101 @@
+import json
+import logging
+import traceback
+from datetime import timedelta
+
+from django.conf import settings
+from django.core.mail import send_mail
+from django.db import transaction
+from django.db.models import F, Q
+from django.utils import timezone
+
+from .models import Job, Order
+
+logger = logging.getLogger(__name__)
+analytics_logger = logging.getLogger('store.analytics')
+
+# Handler pro Aufgabenname; eine Aufgabe kann mehrfach laufen (mindestens einmal), Handler müssen das vertragen
+HANDLERS = {}
+
+
+def handler(name):
+    def register(func):
+        HANDLERS[name] = func
+        return func
+    return register
+
+
+def claim(limit, lease=None):
+    # Fällige Aufgaben für diesen Worker sperren. Der bedingte UPDATE pro Aufgabe entscheidet,
+    # welcher Worker sie bekommt; abgelaufene Sperren (abgestürzter Worker) werden neu vergeben,
+    # solange noch Versuche übrig sind. Sonst gilt die Aufgabe als fehlgeschlagen.
+    now = timezone.now()
+    lease = timedelta(seconds=lease or settings.JOB_LEASE_SECONDS)
+    stale = Q(status='running', locked_until__lt=now)
+    Job.objects.filter(stale, attempts__gte=F('max_attempts')).update(
+        status='failed', locked_until=None, last_error='Lease expired after the last attempt.', updated_at=now
+    )
+    due = Q(status='pending', run_after__lte=now) | (stale & Q(attempts__lt=F('max_attempts')))
+    candidates = list(Job.objects.filter(due).order_by('run_after').values_list('id', flat=True)[:limit])
+    claimed = []
+    for job_id in candidates:
+        if Job.objects.filter(due, pk=job_id).update(
+            status='running', attempts=F('attempts') + 1, locked_until=now + lease, updated_at=now
+        ):
+            claimed.append(job_id)
+    return claimed
+
+
+def run_job(job_id):
+    # Eine gesperrte Aufgabe ausführen; Fehler führen zu einem späteren Versuch mit wachsendem Abstand
+    job = Job.objects.get(pk=job_id)
+    try:
+        with transaction.atomic():
+            HANDLERS[job.name](**job.payload)
+    except Exception:
+        logger.exception('Job %s (%s) failed on attempt %s', job.pk, job.name, job.attempts)
+        if job.attempts >= job.max_attempts:
+            job.status = 'failed'
+        else:
+            job.status = 'pending'
+            job.run_after = timezone.now() + timedelta(seconds=settings.JOB_RETRY_DELAY * 2 ** (job.attempts - 1))
+        job.last_error = traceback.format_exc()
+    else:
+        job.status = 'done'
+        job.last_error = ''
+    job.locked_until = None
+    job.save(update_fields=['status', 'run_after', 'locked_until', 'last_error', 'updated_at'])
+    return job.status
+
+
+# Nebenwirkungen von Bestellungen (eingereiht in Order.complete_order/cancel_order)
+
+ORDER_MAIL_SUBJECTS = {
+    'completed': 'Your order {id} is confirmed',
+    'cancelled': 'Your order {id} was cancelled',
+}
+
+
+@handler('order.email')
+def send_order_email(order_id, event):
+    order = Order.objects.select_related('user').get(pk=order_id)
+    if not order.user.email:
+        return
+    subject = ORDER_MAIL_SUBJECTS[event].format(id=order.pk)
+    send_mail(subject, f'{subject}.', None, [order.user.email])
+
+
+@handler('order.analytics')
+def track_order(order_id, event):
+    order = Order.objects.get(pk=order_id)
+    track(f'order.{event}', order_id=order.pk, user_id=order.user_id, status=order.status)
+
+
+@handler('comment.analytics')
+def track_comment(comment_id, product_id, user_id):
+    track('comment.posted', comment_id=comment_id, product_id=product_id, user_id=user_id)
+
+
+def track(event, **properties):
+    # Ereignis als JSON-Zeile über den Logger store.analytics ausgeben (dort kann ein Collector anschließen)
+    analytics_logger.info(json.dumps({'event': event, **properties}, sort_keys=True))
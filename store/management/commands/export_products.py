@@ -0,0 +1,43 @@
+import sys
+
+from django.core.management.base import BaseCommand, CommandError
+from django.utils.dateparse import parse_datetime
+
+from cstore.renderers import FastJSONRenderer
+from store.export import CHUNK_SIZE, export_queryset, export_rows, iter_csv, iter_ndjson
+
+
+# Management-Befehl zum Exportieren des Katalogs als NDJSON, CSV oder JSON
+class Command(BaseCommand):
+    help = 'Streams the product catalog to a file or stdout.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--format', choices=['ndjson', 'csv', 'json'], default='ndjson')
+        parser.add_argument('--updated-since', help='Only export products changed after this ISO 8601 timestamp.')
+        parser.add_argument('--output', help='Target file (default: stdout).')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        updated_since = None
+        if options['updated_since']:
+            updated_since = parse_datetime(options['updated_since'])
+            if updated_since is None:
+                raise CommandError('--updated-since must be an ISO 8601 timestamp.')
+
+        queryset, watermark = export_queryset(updated_since)
+        rows = export_rows(queryset, options['chunk_size'])
+        chunks = {
+            'ndjson': iter_ndjson,
+            'csv': iter_csv,
+            'json': FastJSONRenderer().render_iter,
+        }[options['format']](rows)
+
+        output = open(options['output'], 'wb') if options['output'] else sys.stdout.buffer
+        try:
+            for chunk in chunks:
+                output.write(chunk)
+        finally:
+            if options['output']:
+                output.close()
+        # Wasserzeichen für den nächsten inkrementellen Export
+        self.stderr.write(f'watermark: {watermark.isoformat() if watermark else ""}')
@@ -0,0 +1,31 @@
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from store.importer import CHUNK_SIZE, import_products, read_rows
+
+
+# Management-Befehl zum Massenimport von Produkten aus CSV- oder NDJSON-Dateien
+class Command(BaseCommand):
+    help = 'Imports products from a CSV or NDJSON file, updating existing products by sku.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('path')
+        parser.add_argument('--format', choices=['csv', 'ndjson'], help='Default: derived from the file extension.')
+        parser.add_argument('--chunk-size', type=int, default=CHUNK_SIZE)
+
+    def handle(self, *args, **options):
+        fmt = options['format'] or os.path.splitext(options['path'])[1].lstrip('.').lower()
+        if fmt not in ('csv', 'ndjson'):
+            raise CommandError('Unknown format, use --format csv or --format ndjson.')
+        try:
+            with open(options['path'], 'rb') as source:
+                result = import_products(read_rows(source, fmt), options['chunk_size'])
+        except OSError as exc:
+            raise CommandError(exc)
+
+        for error in result['errors']:
+            self.stderr.write(f"row {error['row']}: {error['errors']}")
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {result['created']}, updated {result['updated']}, failed {len(result['errors'])}."
+        ))
@@ -0,0 +1,18 @@
+from django.core.management.base import BaseCommand
+
+from store.images import process_product_image
+from store.models import Product
+
+
+# Management-Befehl zum Erzeugen der Bildvarianten für bestehende Produkte
+class Command(BaseCommand):
+    help = 'Hashes product images, merges duplicate uploads and renders resized variants.'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--force', action='store_true', help='Also reprocess images that already have variants.')
+
+    def handle(self, *args, **options):
+        product_ids = list(Product.objects.exclude(image='').values_list('id', flat=True))
+        for product_id in product_ids:
+            process_product_image(product_id, force=options['force'])
+        self.stdout.write(self.style.SUCCESS(f'Processed {len(product_ids)} products.'))
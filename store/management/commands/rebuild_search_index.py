@@ -0,0 +1,14 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from store import search
+
+
+# Management-Befehl zum vollständigen Neuaufbau des Produkt-Suchindex
+class Command(BaseCommand):
+    help = 'Rebuilds the full-text search index for all products.'
+
+    def handle(self, *args, **options):
+        if not search.is_available():
+            raise CommandError('The full-text index requires SQLite with FTS5.')
+        count = search.rebuild_index()
+        self.stdout.write(self.style.SUCCESS(f'Indexed {count} products.'))
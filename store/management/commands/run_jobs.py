@@ -0,0 +1,62 @@
+import multiprocessing
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.db import connections
+
+
+def init_worker():
+    # Neue Prozesse (spawn) laden Django selbst; geerbte Datenbankverbindungen gibt es so nicht.
+    # Dieses Modul importiert deshalb store.jobs (und damit die Modelle) erst in handle().
+    import django
+
+    django.setup()
+
+
+# Management-Befehl, der die Hintergrundaufgaben aus store.jobs abarbeitet
+class Command(BaseCommand):
+    help = 'Runs queued background jobs (order emails, analytics) in a pool of worker processes.'
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=settings.JOB_WORKER_PROCESSES,
+            help='Worker processes (0 runs the jobs in this process).',
+        )
+        parser.add_argument('--batch-size', type=int, default=50, help='Jobs claimed per round.')
+        parser.add_argument('--poll-interval', type=float, default=1.0, help='Seconds to wait when the queue is empty.')
+        parser.add_argument('--once', action='store_true', help='Stop as soon as no job is due.')
+
+    def handle(self, *args, **options):
+        from store import jobs
+
+        pool = None
+        if options['processes']:
+            pool = ProcessPoolExecutor(
+                max_workers=options['processes'], mp_context=multiprocessing.get_context('spawn'),
+                initializer=init_worker,
+            )
+        counts = {}
+        try:
+            while True:
+                job_ids = jobs.claim(options['batch_size'])
+                if not job_ids:
+                    if options['once']:
+                        break
+                    connections.close_all()  # Während des Wartens keine Verbindung offen halten
+                    time.sleep(options['poll_interval'])
+                    continue
+                if pool:
+                    results = pool.map(jobs.run_job, job_ids)
+                else:
+                    results = map(jobs.run_job, job_ids)
+                for result in results:
+                    counts[result] = counts.get(result, 0) + 1
+        except KeyboardInterrupt:
+            pass
+        finally:
+            if pool:
+                pool.shutdown()
+        summary = ', '.join(f'{count} {status}' for status, count in sorted(counts.items())) or 'nothing'
+        self.stdout.write(self.style.SUCCESS(f'Ran jobs: {summary}.'))
@@ -0,0 +1,31 @@
+import sqlite3
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.db import connections
+
+
+# Management-Befehl, der SQLite-Replikate lokal als Kopie der Primärdatenbank anlegt oder auffrischt
+class Command(BaseCommand):
+    help = 'Copies the primary SQLite database to the replica files in DATABASE_REPLICAS.'
+
+    def handle(self, *args, **options):
+        replicas = getattr(settings, 'DATABASE_REPLICAS', [])
+        if not replicas:
+            raise CommandError('No replicas configured, set CSTORE_DB_REPLICAS.')
+        if connections['default'].vendor != 'sqlite':
+            raise CommandError("Replicas can only be copied for SQLite; use the database's own replication.")
+
+        source = sqlite3.connect(settings.DATABASES['default']['NAME'])
+        try:
+            for alias in replicas:
+                # Online-Backup-API: konsistente Kopie, auch während die Primärdatenbank beschrieben wird
+                connections[alias].close()
+                target = sqlite3.connect(settings.DATABASES[alias]['NAME'])
+                try:
+                    source.backup(target)
+                finally:
+                    target.close()
+                self.stdout.write(self.style.SUCCESS(f"Copied primary to {alias} ({settings.DATABASES[alias]['NAME']})."))
+        finally:
+            source.close()
@@ -0,0 +1,59 @@
+# Generated by Django 5.0.6 on 2026-10-18 11:53
+
+import django.db.models.deletion
+from django.db import migrations, models
+
+
+def assign_items_to_carts(apps, schema_editor):
+    # Bisher gemeinsam genutzte Warenkorbartikel auf genau einen Warenkorb verteilen
+    Cart = apps.get_model('store', 'Cart')
+    CartItem = apps.get_model('store', 'CartItem')
+    Through = Cart.items.through
+
+    lines = {}
+    for link in Through.objects.order_by('id').iterator():
+        item = CartItem.objects.get(pk=link.cartitem_id)
+        key = (link.cart_id, item.product_id)
+        if key in lines:
+            # Doppelte Zeile für dasselbe Produkt im selben Warenkorb zusammenführen
+            lines[key].quantity += item.quantity
+            lines[key].save(update_fields=['quantity'])
+        elif item.cart_id is None:
+            item.cart_id = link.cart_id
+            item.save(update_fields=['cart'])
+            lines[key] = item
+        else:
+            # Artikel gehört bereits einem anderen Warenkorb: Kopie anlegen
+            lines[key] = CartItem.objects.create(cart_id=link.cart_id, product_id=item.product_id, quantity=item.quantity)
+
+    # Artikel ohne Warenkorb wurden nie angezeigt und werden entfernt
+    CartItem.objects.filter(cart__isnull=True).delete()
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0003_comment_product_comments'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='cartitem',
+            name='cart',
+            field=models.ForeignKey(null=True, on_delete=django.db.models.deletion.CASCADE, to='store.cart'),
+        ),
+        migrations.RunPython(assign_items_to_carts, migrations.RunPython.noop),
+        migrations.RemoveField(
+            model_name='cart',
+            name='items',
+        ),
+        migrations.AlterField(
+            model_name='cartitem',
+            name='cart',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='items', to='store.cart'),
+        ),
+        migrations.AddConstraint(
+            model_name='cartitem',
+            constraint=models.UniqueConstraint(fields=('cart', 'product'), name='unique_cart_product'),
+        ),
+    ]
@@ -0,0 +1,40 @@
+from django.db import migrations
+
+
+def create_fts_index(apps, schema_editor):
+    # Volltextindex nur unter SQLite (FTS5) anlegen und mit allen Produkten befüllen
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute(
+        "CREATE VIRTUAL TABLE IF NOT EXISTS store_product_fts "
+        "USING fts5(name, description, tags, category, tokenize='unicode61 remove_diacritics 2')"
+    )
+    schema_editor.execute("""
+        INSERT INTO store_product_fts (rowid, name, description, tags, category)
+        SELECT p.id, p.name, p.description,
+               COALESCE((SELECT group_concat(t.name, ' ')
+                         FROM taggit_taggeditem ti
+                         JOIN taggit_tag t ON t.id = ti.tag_id
+                         JOIN django_content_type ct ON ct.id = ti.content_type_id
+                         WHERE ti.object_id = p.id AND ct.app_label = 'store' AND ct.model = 'product'), ''),
+               p.category
+        FROM store_product p
+    """)
+
+
+def drop_fts_index(apps, schema_editor):
+    if schema_editor.connection.vendor != 'sqlite':
+        return
+    schema_editor.execute("DROP TABLE IF EXISTS store_product_fts")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('contenttypes', '0002_remove_content_type_name'),
+        ('store', '0005_stockreservation'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_fts_index, drop_fts_index),
+    ]
@@ -0,0 +1,39 @@
+# Generated by Django 5.0.6 on 2026-10-18 11:57
+
+from django.db import migrations, models
+
+
+def backfill_comment_stats(apps, schema_editor):
+    # Anzahl und Vorschau der Kommentare für bestehende Produkte berechnen
+    Product = apps.get_model('store', 'Product')
+    for product in Product.objects.annotate(count=models.Count('comments')).filter(count__gt=0).iterator():
+        latest = [
+            {
+                'id': comment.id,
+                'user': {'username': comment.user.username, 'id': comment.user.id} if comment.user else None,
+                'content': comment.content,
+            }
+            for comment in product.comments.select_related('user').order_by('-id')[:3]
+        ]
+        Product.objects.filter(pk=product.pk).update(comment_count=product.count, latest_comments=latest)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0006_product_fts'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='product',
+            name='comment_count',
+            field=models.PositiveIntegerField(default=0),
+        ),
+        migrations.AddField(
+            model_name='product',
+            name='latest_comments',
+            field=models.JSONField(blank=True, default=list),
+        ),
+        migrations.RunPython(backfill_comment_stats, migrations.RunPython.noop),
+    ]
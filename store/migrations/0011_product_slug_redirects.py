@@ -0,0 +1,55 @@
+# Generated by Django 5.0.6 on 2026-10-18 12:40
+
+import django.db.models.deletion
+from django.db import migrations, models
+from django.utils.text import slugify
+
+BATCH_SIZE = 500
+
+
+def backfill_slugs(apps, schema_editor):
+    # Eindeutige Slugs für bestehende Produkte blockweise in ID-Reihenfolge vergeben (Kollisionen: -2, -3, ...)
+    Product = apps.get_model('store', 'Product')
+    taken = set()
+    last_id = 0
+    while True:
+        batch = list(Product.objects.filter(pk__gt=last_id).order_by('pk').only('id', 'name', 'slug')[:BATCH_SIZE])
+        if not batch:
+            break
+        changed = []
+        for product in batch:
+            base = slugify(product.name)[:100].strip('-') or 'product'
+            slug, suffix = base, 2
+            while slug in taken:
+                slug, suffix = f'{base}-{suffix}', suffix + 1
+            taken.add(slug)
+            if product.slug != slug:
+                product.slug = slug
+                changed.append(product)
+        Product.objects.bulk_update(changed, ['slug'])
+        last_id = batch[-1].pk
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0010_product_sku'),
+    ]
+
+    operations = [
+        migrations.AlterField(
+            model_name='product',
+            name='slug',
+            field=models.SlugField(blank=True, max_length=120, null=True),
+        ),
+        migrations.CreateModel(
+            name='ProductSlugRedirect',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('old_slug', models.SlugField(max_length=120, unique=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('product', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='slug_redirects', to='store.product')),
+            ],
+        ),
+        migrations.RunPython(backfill_slugs, migrations.RunPython.noop),
+    ]
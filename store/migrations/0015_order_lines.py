@@ -0,0 +1,73 @@
+# Generated by Django 5.0.6 on 2026-10-18 12:28
+
+import django.db.models.deletion
+from decimal import Decimal
+from django.db import migrations, models
+
+BATCH_SIZE = 500
+
+
+def backfill_order_lines(apps, schema_editor):
+    # Abgeschlossene Bestellungen aus ihren Bestandsreservierungen nachtragen. Die damals bezahlten
+    # Preise sind nicht mehr bekannt, daher gelten Name und Preis des Produkts zum Migrationszeitpunkt.
+    # Bestellungen von vor den Reservierungen (0005) haben keine, für sie gilt der Inhalt ihres Warenkorbs.
+    Order = apps.get_model('store', 'Order')
+    OrderLine = apps.get_model('store', 'OrderLine')
+    StockReservation = apps.get_model('store', 'StockReservation')
+    CartItem = apps.get_model('store', 'CartItem')
+    fields = ('product_id', 'quantity', 'product__name', 'product__price')
+    last_id = 0
+    while True:
+        orders = dict(
+            Order.objects.filter(pk__gt=last_id, status='completed').order_by('pk').values_list('pk', 'cart_id')[:BATCH_SIZE]
+        )
+        if not orders:
+            break
+        rows = list(
+            StockReservation.objects.filter(order_id__in=orders).order_by('order_id', 'product_id')
+            .values_list('order_id', *fields)
+        )
+        reserved = {row[0] for row in rows}
+        carts = {cart_id: order_id for order_id, cart_id in orders.items() if order_id not in reserved}
+        items = CartItem.objects.filter(cart_id__in=carts, quantity__gt=0).order_by('cart_id', 'product_id')
+        rows.extend((carts[cart_id], *item) for cart_id, *item in items.values_list('cart_id', *fields))
+
+        lines, totals = [], {}
+        for order_id, product_id, quantity, name, price in rows:
+            line_total = price * quantity
+            lines.append(OrderLine(
+                order_id=order_id, product_id=product_id, name=name, unit_price=price,
+                quantity=quantity, line_total=line_total,
+            ))
+            totals[order_id] = totals.get(order_id, Decimal('0.00')) + line_total
+        OrderLine.objects.bulk_create(lines)
+        Order.objects.bulk_update([Order(pk=pk, total=total) for pk, total in totals.items()], ['total'])
+        last_id = max(orders)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('store', '0014_job'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='order',
+            name='total',
+            field=models.DecimalField(decimal_places=2, default=Decimal('0.00'), max_digits=12),
+        ),
+        migrations.CreateModel(
+            name='OrderLine',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('product_id', models.BigIntegerField()),
+                ('name', models.CharField(max_length=100)),
+                ('unit_price', models.DecimalField(decimal_places=2, max_digits=10)),
+                ('quantity', models.PositiveIntegerField()),
+                ('line_total', models.DecimalField(decimal_places=2, max_digits=12)),
+                ('order', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='lines', to='store.order')),
+            ],
+        ),
+        migrations.RunPython(backfill_order_lines, migrations.RunPython.noop),
+    ]
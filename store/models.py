@@ -1,7 +1,20 @@
-from django.db import models
+import re
+from decimal import Decimal
+from django.db import IntegrityError, models, transaction
+from django.db.models import DecimalField, ExpressionWrapper, F, Q, Subquery, Sum, Value
+from django.db.models.functions import Coalesce
 from taggit.managers import TaggableManager
 from django.contrib.auth import get_user_model
+from django.utils import timezone
 from django.utils.text import slugify
+from .cache import bump_catalog_version
+
+
+# Ausnahme, wenn beim Abschließen einer Bestellung nicht genug Bestand vorhanden ist
+class InsufficientStock(Exception):
+    def __init__(self, product_ids):
+        self.product_ids = product_ids
+        super().__init__(f"Insufficient stock for products {product_ids}")
 
 # Modell für Kommentare
 class Comment(models.Model):
@@ -25,36 +38,175 @@ class Product(models.Model):
         ("trending", "trending"),
     )
 
+    sku = models.CharField(max_length=64, unique=True, null=True, blank=True)  # Artikelnummer (natürlicher Schlüssel für Importe)
     name = models.CharField(max_length=100)  # Name des Produkts
-    category = models.CharField(max_length=255, choices=CATEGORY_CHOICES, default="new")  # Kategorie des Produkts
+    category = models.CharField(max_length=12, choices=CATEGORY_CHOICES, default="new")  # Kategorie des Produkts (längster Wert: "specialoffer")
     image = models.ImageField(upload_to="products/")  # Bild des Produkts
     price = models.DecimalField(max_digits=10, decimal_places=2)  # Preis des Produkts
     quantity = models.IntegerField()  # Menge des Produkts auf Lager
     description = models.TextField()  # Beschreibung des Produkts
-    slug = models.CharField(max_length=500, null=True, blank=True)  # URL-freundlicher Name des Produkts
+    slug = models.SlugField(max_length=120, unique=True)  # Eindeutiger, URL-freundlicher Name des Produkts
     tags = TaggableManager()  # Tags für das Produkt
     comments = models.ManyToManyField('Comment', blank=True)  # Kommentare zum Produkt
+    comment_count = models.PositiveIntegerField(default=0)  # Denormalisierte Anzahl der Kommentare
+    latest_comments = models.JSONField(default=list, blank=True)  # Vorschau der neuesten Kommentare
+    image_hash = models.CharField(max_length=64, blank=True, db_index=True)  # SHA-256 des Bildinhalts
+    image_variants = models.JSONField(default=dict, blank=True)  # Verkleinerte Varianten und Platzhalter
+    updated_at = models.DateTimeField(auto_now=True, db_index=True)  # Zeitpunkt der letzten Änderung (für inkrementelle Exporte)
+
+    LATEST_COMMENTS_SIZE = 3  # Anzahl der Kommentare in der Vorschau
+    # Felder, die nur von Hintergrundprozessen per update() geschrieben werden
+    DERIVED_FIELDS = ('comment_count', 'latest_comments', 'image_hash', 'image_variants')
+    SLUG_BASE_LENGTH = 100  # Platz für Suffixe wie "-12"
+    SLUG_QUERY_BATCH = 200  # Slug-Stämme pro Abfrage in assign_slugs
+    SLUG_SAVE_ATTEMPTS = 3  # Versuche, wenn ein gleichzeitiger Schreibzugriff den Slug belegt hat
+
+    class Meta:
+        indexes = [
+            # Suche: Filter nach Kategorie und Preisspanne
+            models.Index(fields=['category', 'price'], name='product_category_price_idx'),
+        ]
 
     def __str__(self):
         return self.name
 
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        # Geladenen Namen merken, damit der Slug nur bei einer Namensänderung neu erzeugt wird
+        instance = super().from_db(db, field_names, values)
+        instance._loaded_name = instance.__dict__.get('name')
+        return instance
+
+    @classmethod
+    def slug_base(cls, name):
+        return slugify(name)[:cls.SLUG_BASE_LENGTH].strip('-') or 'product'
+
+    def needs_new_slug(self):
+        if self._state.adding or not self.slug:
+            return True
+        loaded_name = getattr(self, '_loaded_name', None)
+        if loaded_name is None or loaded_name == self.name:
+            return False
+        # Passt der bisherige Slug (auch mit Suffix) noch zum neuen Namen, bleibt er erhalten
+        return not re.fullmatch(rf'{re.escape(self.slug_base(self.name))}(-\d+)?', self.slug)
+
+    @classmethod
+    def assign_slugs(cls, products):
+        # Eindeutige Slugs für mehrere Produkte vergeben: Kollisionen erhalten deterministisch -2, -3, ...
+        # Belegte Slugs werden gesammelt mit Abfragen auf Produkte und Weiterleitungen ermittelt
+        products = list(products)
+        if not products:
+            return
+        bases = [cls.slug_base(product.name) for product in products]
+        own = [product.pk for product in products if product.pk]
+
+        def matching(field, chunk):
+            query = Q()
+            for base in chunk:
+                query |= Q(**{field: base}) | Q(**{f'{field}__startswith': f'{base}-'})
+            return query
+
+        taken = set()
+        distinct = sorted(set(bases))
+        # In Blöcken abfragen, da SQLite die Tiefe von WHERE-Ausdrücken begrenzt
+        for start in range(0, len(distinct), cls.SLUG_QUERY_BATCH):
+            chunk = distinct[start:start + cls.SLUG_QUERY_BATCH]
+            taken.update(cls.objects.filter(matching('slug', chunk)).exclude(pk__in=own).values_list('slug', flat=True))
+            # Frühere Slugs anderer Produkte bleiben reserviert, damit alte Links nicht umgelenkt werden
+            taken.update(
+                ProductSlugRedirect.objects.filter(matching('old_slug', chunk)).exclude(product_id__in=own)
+                .values_list('old_slug', flat=True)
+            )
+
+        redirects = []
+        for product, base in zip(products, bases):
+            slug, suffix = base, 2
+            while slug in taken:
+                slug, suffix = f'{base}-{suffix}', suffix + 1
+            taken.add(slug)
+            if product.pk and product.slug and product.slug != slug:
+                redirects.append(ProductSlugRedirect(old_slug=product.slug, product_id=product.pk))
+            product.slug = slug
+
+        if own:
+            # Wieder vergebene eigene Slugs sind keine Weiterleitung mehr
+            ProductSlugRedirect.objects.filter(product_id__in=own, old_slug__in=[p.slug for p in products]).delete()
+        if redirects:
+            ProductSlugRedirect.objects.bulk_create(
+                redirects, update_conflicts=True, unique_fields=['old_slug'], update_fields=['product']
+            )
+
     def update_quantity(self, quantity):
+        # Nur die Menge schreiben statt die ganze Zeile
         self.quantity = quantity
-        self.save()
+        self.save(update_fields=['quantity', 'updated_at'])
 
     def save(self, *args, **kwargs):
-        # Automatisch einen Slug aus dem Namen generieren
-        self.slug = slugify(self.name)
-        super().save(*args, **kwargs)
+        update_fields = kwargs.get('update_fields')
+        original_slug = self.slug
+        for attempt in range(self.SLUG_SAVE_ATTEMPTS):
+            save_kwargs = dict(kwargs)
+            try:
+                with transaction.atomic():
+                    # Slug nur für neue Produkte oder nach einer Namensänderung erzeugen (alter Slug wird weitergeleitet)
+                    if (update_fields is None or 'name' in update_fields) and self.needs_new_slug():
+                        self.assign_slugs([self])
+                        if update_fields is not None:
+                            save_kwargs['update_fields'] = [*update_fields, 'slug']
+                    if not self._state.adding and update_fields is None:
+                        # Abgeleitete Felder nie mit veralteten Werten aus dieser Instanz überschreiben
+                        save_kwargs['update_fields'] = [
+                            field.name for field in self._meta.concrete_fields
+                            if not field.primary_key and field.name not in self.DERIVED_FIELDS
+                        ]
+                    super().save(*args, **save_kwargs)
+                break
+            except IntegrityError:
+                # Ein gleichzeitig gespeichertes Produkt hat denselben Slug belegt: neu ermitteln und erneut speichern
+                slug_taken = Product.objects.filter(slug=self.slug).exclude(pk=self.pk).exists()
+                if not slug_taken or attempt == self.SLUG_SAVE_ATTEMPTS - 1:
+                    raise
+                self.slug = original_slug
+        self._loaded_name = self.name
+
+    def refresh_comment_stats(self):
+        # Anzahl und Vorschau der Kommentare neu berechnen, ohne die Produktzeile über save() neu zu schreiben
+        latest = [
+            {
+                'id': comment.id,
+                'user': {'username': comment.user.username, 'id': comment.user.id} if comment.user else None,
+                'content': comment.content,
+            }
+            for comment in self.comments.select_related('user').order_by('-id')[:self.LATEST_COMMENTS_SIZE]
+        ]
+        self.comment_count = self.comments.count()
+        self.latest_comments = latest
+        Product.objects.filter(pk=self.pk).update(comment_count=self.comment_count, latest_comments=latest)
 
     def is_trending(self):
         return self.category == "trending"  # Überprüfen, ob das Produkt in der Kategorie "trending" ist
 
+# Weiterleitung von einem früheren Slug auf das umbenannte Produkt
+class ProductSlugRedirect(models.Model):
+    old_slug = models.SlugField(max_length=120, unique=True)  # Früherer Slug
+    product = models.ForeignKey(Product, on_delete=models.CASCADE, related_name='slug_redirects')  # Aktuelles Produkt
+    created_at = models.DateTimeField(auto_now_add=True)
+
+    def __str__(self):
+        return f"{self.old_slug} -> {self.product_id}"
+
 # Modell für Warenkorbartikel
 class CartItem(models.Model):
+    cart = models.ForeignKey('Cart', on_delete=models.CASCADE, related_name='items')  # Warenkorb, zu dem der Artikel gehört
     product = models.ForeignKey(Product, on_delete=models.CASCADE)  # Bezug auf das Produkt
     quantity = models.IntegerField()  # Menge des Produkts im Warenkorb
 
+    class Meta:
+        constraints = [
+            # Pro Warenkorb gibt es für jedes Produkt genau eine Zeile
+            models.UniqueConstraint(fields=['cart', 'product'], name='unique_cart_product'),
+        ]
+
     def __str__(self):
         return f"{self.product.name} ({self.quantity})"
 
@@ -62,32 +214,87 @@ class CartItem(models.Model):
 class Cart(models.Model):
     user = models.OneToOneField(get_user_model(), on_delete=models.CASCADE)  # Bezug auf den Benutzer
     total = models.DecimalField(max_digits=10, decimal_places=2, default=0.00)  # Gesamtbetrag des Warenkorbs
-    items = models.ManyToManyField(CartItem, blank=True)  # Artikel im Warenkorb
 
     def __str__(self):
         return f"{self.user.username}'s cart"
 
     def add_product(self, product, quantity=1):
         # Produkt dem Warenkorb hinzufügen
-        cart_item, created = CartItem.objects.get_or_create(product=product, quantity=quantity)
-        if not created:
-            cart_item.quantity += quantity
-            cart_item.save()
-        self.items.add(cart_item)
-        self.calculate_total()  # Gesamtbetrag neu berechnen
+        with transaction.atomic():
+            # Zuerst den Gesamtbetrag ändern: das sperrt den Warenkorb und serialisiert parallele Änderungen
+            self._adjust_total(product.price * quantity)
+            # Menge atomar in der Datenbank erhöhen statt in Python zu lesen und zu schreiben
+            updated = self.items.filter(product=product).update(quantity=F('quantity') + quantity)
+            if not updated:
+                CartItem.objects.create(cart=self, product=product, quantity=quantity)
+        self.refresh_from_db(fields=['total'])
 
     def remove_product(self, product):
         # Produkt aus dem Warenkorb entfernen
-        cart_item = CartItem.objects.filter(product=product).first()
-        if cart_item:
-            self.items.remove(cart_item)
-            cart_item.delete()
-        self.calculate_total()  # Gesamtbetrag neu berechnen
+        line_total = self.items.filter(product=product).annotate(
+            line_total=ExpressionWrapper(F('product__price') * F('quantity'), output_field=DecimalField(max_digits=10, decimal_places=2))
+        ).values('line_total')[:1]
+        with transaction.atomic():
+            # Zeilenbetrag abziehen (sperrt den Warenkorb) und anschließend die Zeile löschen
+            self._adjust_total(-Coalesce(Subquery(line_total), Value(Decimal('0.00')), output_field=DecimalField(max_digits=10, decimal_places=2)))
+            self.items.filter(product=product).delete()
+        self.refresh_from_db(fields=['total'])
+
+    def apply_operations(self, operations):
+        # Mehrere Mengenänderungen [(product_id, quantity), ...] in einer Transaktion anwenden
+        products = Product.objects.in_bulk({product_id for product_id, quantity in operations})
+        results, changes = [], {}
+        for product_id, quantity in operations:
+            if product_id not in products:
+                results.append({'product_id': product_id, 'status': 'error', 'error': 'Product not found'})
+                continue
+            changes[product_id] = changes.get(product_id, 0) + quantity
+            results.append({'product_id': product_id, 'status': 'ok'})
+        if not changes:
+            return results
+
+        with transaction.atomic():
+            # Warenkorb sperren, bevor die vorhandenen Zeilen gelesen werden
+            Cart.objects.select_for_update().filter(pk=self.pk).exists()
+            existing = {item.product_id: item for item in self.items.filter(product_id__in=changes)}
+            to_create, to_update, to_delete = [], [], []
+            delta = Decimal('0.00')
+            for product_id, quantity in changes.items():
+                item = existing.get(product_id)
+                old_quantity = item.quantity if item else 0
+                new_quantity = max(old_quantity + quantity, 0)  # Negative Mengen entfernen höchstens die ganze Zeile
+                delta += products[product_id].price * (new_quantity - old_quantity)
+                if item is None:
+                    if new_quantity:
+                        to_create.append(CartItem(cart=self, product_id=product_id, quantity=new_quantity))
+                elif new_quantity:
+                    item.quantity = new_quantity
+                    to_update.append(item)
+                else:
+                    to_delete.append(item.pk)
+            CartItem.objects.bulk_create(to_create)
+            CartItem.objects.bulk_update(to_update, ['quantity'])
+            if to_delete:
+                CartItem.objects.filter(pk__in=to_delete).delete()
+            self._adjust_total(delta)  # Eine einzige Aktualisierung des Gesamtbetrags
+        self.refresh_from_db(fields=['total'])
+        return results
+
+    def _adjust_total(self, delta):
+        # Gesamtbetrag inkrementell in der Datenbank anpassen, ohne die Artikel erneut zu laden
+        Cart.objects.filter(pk=self.pk).update(total=F('total') + delta)
+
+    def compute_total(self):
+        # Gesamtbetrag mit einer einzigen Aggregat-Abfrage berechnen
+        total = self.items.aggregate(
+            total=Sum(F('product__price') * F('quantity'), output_field=DecimalField(max_digits=10, decimal_places=2))
+        )['total']
+        return total if total is not None else Decimal('0.00')
 
     def calculate_total(self):
-        # Gesamtbetrag des Warenkorbs berechnen
-        self.total = sum(item.product.price * item.quantity for item in self.items.all())
-        self.save()
+        # Gespeicherten Gesamtbetrag mit den Artikeln abgleichen
+        self.total = self.compute_total()
+        self.save(update_fields=['total'])
 
 # Modell für Bestellungen
 class Order(models.Model):
@@ -98,21 +305,149 @@ class Order(models.Model):
         ("cancelled", "Cancelled"),
     )
 
-    user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE)  # Bezug auf den Benutzer
+    user = models.ForeignKey(get_user_model(), on_delete=models.CASCADE, db_index=False)  # Bezug auf den Benutzer (Index siehe Meta)
     cart = models.OneToOneField(Cart, on_delete=models.CASCADE)  # Bezug auf den Warenkorb
     status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")  # Status der Bestellung
     created_at = models.DateTimeField(auto_now_add=True)  # Erstellungsdatum der Bestellung
     updated_at = models.DateTimeField(auto_now=True)  # Aktualisierungsdatum der Bestellung
+    total = models.DecimalField(max_digits=12, decimal_places=2, default=Decimal("0.00"))  # Bezahlter Betrag (beim Abschließen festgehalten)
+
+    class Meta:
+        indexes = [
+            # Bestellungen eines Benutzers, neueste zuerst (ersetzt den einfachen Index auf user)
+            models.Index(fields=['user', '-created_at'], name='order_user_created_idx'),
+        ]
 
     def __str__(self):
         return f"Order {self.id} by {self.user.username}"
 
     def complete_order(self):
-        # Bestellung abschließen
-        self.status = "completed"
-        self.save()
+        # Bestellung abschließen und den Bestand für alle Artikel reservieren
+        with transaction.atomic():
+            # Statuswechsel zuerst: sperrt die Bestellung und verhindert doppeltes Abschließen
+            updated = Order.objects.filter(pk=self.pk, status__in=["pending", "processing"]).update(
+                status="completed", updated_at=timezone.now()
+            )
+            if updated:
+                self._reserve_stock()
+                self._enqueue_side_effects("completed")
+        self.refresh_from_db(fields=["status", "updated_at", "total"])
+        return bool(updated)
 
     def cancel_order(self):
-        # Bestellung stornieren
-        self.status = "cancelled"
-        self.save()
+        # Bestellung stornieren und reservierten Bestand freigeben
+        with transaction.atomic():
+            updated = Order.objects.filter(pk=self.pk).exclude(status="cancelled").update(
+                status="cancelled", updated_at=timezone.now()
+            )
+            if updated:
+                self._release_stock()
+                self._enqueue_side_effects("cancelled")
+        self.refresh_from_db(fields=["status", "updated_at"])
+        return bool(updated)
+
+    def _reserve_stock(self):
+        # Bestand pro Produkt mit einem bedingten UPDATE verringern (nur wenn genug vorhanden ist)
+        items = sorted(self.cart.items.values_list("product_id", "quantity", "product__name", "product__price"))
+        lines = [(product_id, quantity) for product_id, quantity, name, price in items]  # feste Reihenfolge gegen Deadlocks
+        shortages = [
+            product_id
+            for product_id, quantity in lines
+            if not Product.objects.filter(pk=product_id, quantity__gte=quantity).update(
+                quantity=F("quantity") - quantity, updated_at=timezone.now()
+            )
+        ]
+        if shortages:
+            raise InsufficientStock(shortages)  # Transaktion wird vollständig zurückgerollt
+        StockReservation.objects.bulk_create(
+            StockReservation(order=self, product_id=product_id, quantity=quantity) for product_id, quantity in lines
+        )
+        self._snapshot_lines(items)
+        transaction.on_commit(bump_catalog_version)
+
+    def _snapshot_lines(self, items):
+        # Bestellzeilen mit Name und Preis zum Zeitpunkt des Abschlusses festhalten (ein INSERT);
+        # die Bestellhistorie liest danach nur noch diese Zeilen statt Warenkorb und Produkte
+        lines = OrderLine.objects.bulk_create(
+            OrderLine(
+                order=self, product_id=product_id, name=name, unit_price=price,
+                quantity=quantity, line_total=price * quantity,
+            )
+            for product_id, quantity, name, price in items
+        )
+        total = sum((line.line_total for line in lines), Decimal("0.00"))
+        Order.objects.filter(pk=self.pk).update(total=total)
+
+    def _enqueue_side_effects(self, event):
+        # Transaktionaler Outbox-Eintrag: E-Mail und Analytics laufen später im Worker (store.jobs),
+        # werden aber mit dem Statuswechsel committet oder zurückgerollt
+        payload = {"order_id": self.pk, "event": event}
+        Job.enqueue("order.email", payload, key=f"order:{self.pk}:{event}:email")
+        Job.enqueue("order.analytics", payload, key=f"order:{self.pk}:{event}:analytics")
+
+    def _release_stock(self):
+        # Reservierten Bestand zurückbuchen
+        reservations = sorted(self.reservations.values_list("product_id", "quantity"))
+        for product_id, quantity in reservations:
+            Product.objects.filter(pk=product_id).update(quantity=F("quantity") + quantity, updated_at=timezone.now())
+        if reservations:
+            self.reservations.all().delete()
+            transaction.on_commit(bump_catalog_version)
+
+# Unveränderliche Zeile einer abgeschlossenen Bestellung (Momentaufnahme von Produkt und Preis)
+class OrderLine(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="lines")  # Bestellung
+    product_id = models.BigIntegerField()  # ID des Produkts; bleibt erhalten, auch wenn das Produkt gelöscht wird
+    name = models.CharField(max_length=100)  # Produktname beim Abschließen
+    unit_price = models.DecimalField(max_digits=10, decimal_places=2)  # Bezahlter Stückpreis
+    quantity = models.PositiveIntegerField()  # Bestellte Menge
+    line_total = models.DecimalField(max_digits=12, decimal_places=2)  # Stückpreis mal Menge
+
+    def __str__(self):
+        return f"{self.quantity} x {self.name} for order {self.order_id}"
+
+# Modell für Bestandsreservierungen abgeschlossener Bestellungen
+class StockReservation(models.Model):
+    order = models.ForeignKey(Order, on_delete=models.CASCADE, related_name="reservations")  # Bestellung, für die reserviert wurde
+    product = models.ForeignKey(Product, on_delete=models.CASCADE)  # Reserviertes Produkt
+    quantity = models.PositiveIntegerField()  # Reservierte Menge
+
+    def __str__(self):
+        return f"{self.quantity} x {self.product_id} for order {self.order_id}"
+
+
+# Modell für Hintergrundaufgaben (Warteschlange und Outbox in einer Tabelle, abgearbeitet von run_jobs)
+class Job(models.Model):
+    STATUS_CHOICES = (
+        ("pending", "Pending"),
+        ("running", "Running"),
+        ("done", "Done"),
+        ("failed", "Failed"),
+    )
+
+    name = models.CharField(max_length=100)  # Name des Handlers in store.jobs
+    payload = models.JSONField(default=dict, blank=True)  # Argumente für den Handler
+    idempotency_key = models.CharField(max_length=200, unique=True)  # Dieselbe Aufgabe wird nur einmal eingereiht
+    status = models.CharField(max_length=20, choices=STATUS_CHOICES, default="pending")
+    attempts = models.PositiveIntegerField(default=0)  # Bisherige Versuche
+    max_attempts = models.PositiveIntegerField(default=5)  # Danach bleibt die Aufgabe auf "failed"
+    run_after = models.DateTimeField(default=timezone.now)  # Frühester Zeitpunkt der (nächsten) Ausführung
+    locked_until = models.DateTimeField(null=True, blank=True)  # Ende der Sperre eines laufenden Versuchs
+    last_error = models.TextField(blank=True)  # Traceback des letzten Fehlschlags
+    created_at = models.DateTimeField(auto_now_add=True)
+    updated_at = models.DateTimeField(auto_now=True)
+
+    class Meta:
+        indexes = [
+            # Fällige Aufgaben, älteste zuerst; erledigte Aufgaben fallen aus dem Index
+            models.Index(fields=["run_after"], condition=models.Q(status="pending"), name="job_pending_idx"),
+        ]
+
+    def __str__(self):
+        return f"{self.name} ({self.status})"
+
+    @classmethod
+    def enqueue(cls, name, payload, key, run_after=None):
+        # In der laufenden Transaktion einreihen; ein bereits vorhandener Schlüssel wird ignoriert
+        job = cls(name=name, payload=payload, idempotency_key=key, run_after=run_after or timezone.now())
+        cls.objects.bulk_create([job], ignore_conflicts=True)
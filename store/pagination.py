@@ -0,0 +1,15 @@
+from rest_framework.pagination import CursorPagination
+
+# Cursor-Paginierung für den Produktkatalog: Keyset auf der ID, daher bleibt jede Seite gleich schnell
+class ProductCursorPagination(CursorPagination):
+    ordering = 'id'
+    page_size = 20
+    page_size_query_param = 'page_size'  # Clients können die Seitengröße anpassen
+    max_page_size = 100  # aber nicht beliebig groß
+
+# Cursor-Paginierung für die Kommentare eines Produkts, neueste zuerst
+class CommentCursorPagination(CursorPagination):
+    ordering = '-id'
+    page_size = 20
+    page_size_query_param = 'page_size'
+    max_page_size = 100
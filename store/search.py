@@ -0,0 +1,96 @@
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.db.models import Count, Q
+from django.db.models.expressions import RawSQL
+from taggit.models import TaggedItem
+
+# Volltextindex (SQLite FTS5) für Produkte: Name, Beschreibung, Tags und Kategorie
+FTS_TABLE = 'store_product_fts'
+
+# Indexzeilen direkt per SQL aus Produkten und Tags aufbauen
+INDEX_SELECT = f"""
+    INSERT INTO {FTS_TABLE} (rowid, name, description, tags, category)
+    SELECT p.id, p.name, p.description,
+           COALESCE((SELECT group_concat(t.name, ' ')
+                     FROM taggit_taggeditem ti
+                     JOIN taggit_tag t ON t.id = ti.tag_id
+                     JOIN django_content_type ct ON ct.id = ti.content_type_id
+                     WHERE ti.object_id = p.id AND ct.app_label = 'store' AND ct.model = 'product'), ''),
+           p.category
+    FROM store_product p
+"""
+
+
+def is_available():
+    # FTS5 gibt es nur unter SQLite, andere Datenbanken nutzen die einfache Suche
+    return connection.vendor == 'sqlite'
+
+
+def index_products(product_ids):
+    # Indexzeilen der angegebenen Produkte neu schreiben
+    product_ids = list(product_ids)
+    if not product_ids or not is_available():
+        return
+    placeholders = ', '.join(['%s'] * len(product_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", product_ids)
+        cursor.execute(f"{INDEX_SELECT} WHERE p.id IN ({placeholders})", product_ids)
+
+
+def remove_products(product_ids):
+    product_ids = list(product_ids)
+    if not product_ids or not is_available():
+        return
+    placeholders = ', '.join(['%s'] * len(product_ids))
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE} WHERE rowid IN ({placeholders})", product_ids)
+
+
+def rebuild_index():
+    # Gesamten Index mit einer einzigen INSERT ... SELECT-Abfrage neu aufbauen
+    with connection.cursor() as cursor:
+        cursor.execute(f"DELETE FROM {FTS_TABLE}")
+        cursor.execute(INDEX_SELECT)
+        cursor.execute(f"INSERT INTO {FTS_TABLE} ({FTS_TABLE}) VALUES ('optimize')")
+        cursor.execute(f"SELECT count(*) FROM {FTS_TABLE}")
+        return cursor.fetchone()[0]
+
+
+def build_match_query(text):
+    # Suchbegriffe als Präfix-Phrasen quoten, damit Benutzereingaben keine FTS-Syntax auslösen
+    terms = [term.replace('"', '""') for term in text.split()]
+    return ' '.join(f'"{term}"*' for term in terms if term)
+
+
+def search(queryset, text):
+    # Produkte nach Relevanz (bm25) filtern und sortieren
+    match = build_match_query(text)
+    if not match:
+        return queryset
+    if not is_available():
+        return queryset.filter(Q(name__icontains=text) | Q(description__icontains=text))
+    return queryset.filter(
+        id__in=RawSQL(f"SELECT rowid FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s", (match,))
+    ).annotate(
+        rank=RawSQL(
+            f"SELECT bm25({FTS_TABLE}) FROM {FTS_TABLE} WHERE {FTS_TABLE} MATCH %s AND rowid = store_product.id",
+            (match,),
+        )
+    ).order_by('rank', 'id')
+
+
+def facets(queryset):
+    # Anzahl der Treffer pro Kategorie und Tag, in SQL gezählt
+    ids = queryset.order_by().values('id')
+    categories = (
+        queryset.model.objects.filter(id__in=ids)
+        .values('category').annotate(count=Count('id')).order_by('-count', 'category')
+    )
+    tags = (
+        TaggedItem.objects.filter(content_type=ContentType.objects.get_for_model(queryset.model), object_id__in=ids)
+        .values('tag__name').annotate(count=Count('id')).order_by('-count', 'tag__name')
+    )
+    return {
+        'category': [{'value': row['category'], 'count': row['count']} for row in categories],
+        'tags': [{'value': row['tag__name'], 'count': row['count']} for row in tags],
+    }
@@ -1,7 +1,8 @@
 from rest_framework import serializers
-from .models import Product, CartItem, Cart, Order, Comment
+from .models import Product, CartItem, Cart, Order, OrderLine, Comment
 from taggit.serializers import (TagListSerializerField, TaggitSerializer)
 from cstore.serializers import UserSerializer
+from django.core.files.storage import default_storage
 
 # Kommentar Serializer
 class CommentSerializer(serializers.ModelSerializer):
@@ -12,17 +13,72 @@ class CommentSerializer(serializers.ModelSerializer):
         model = Comment
         fields = '__all__'  # Alle Felder des Comment-Modells werden serialisiert
 
+# Mixin, das die serialisierten Felder über das Argument "fields" einschränkt
+class DynamicFieldsMixin:
+    def __init__(self, *args, **kwargs):
+        fields = kwargs.pop('fields', None)
+        super().__init__(*args, **kwargs)
+        if fields is not None:
+            # Alle nicht angeforderten Felder entfernen
+            for field_name in set(self.fields) - set(fields):
+                self.fields.pop(field_name)
+
 # Produkt Serializer
-class ProductSerializer(TaggitSerializer, serializers.ModelSerializer):
+class ProductSerializer(DynamicFieldsMixin, TaggitSerializer, serializers.ModelSerializer):
     # Tags werden als Liste serialisiert
     tags = TagListSerializerField()
     # Kommentare werden serialisiert, wobei viele Kommentare erlaubt sind
     comments = CommentSerializer(many=True)
+    # URLs der verkleinerten Bildvarianten und Platzhalter
+    image_variants = serializers.SerializerMethodField()
+
+    # Schlanke Zeile für Listenansichten
+    LIST_FIELDS = ['id', 'name', 'price', 'image', 'image_variants', 'slug', 'comment_count']
+    # Felder, die nur mit ?expand= ausgeliefert werden (sonst über /products/{id}/comments/)
+    EXPANDABLE_FIELDS = ['comments']
 
     class Meta:
         model = Product
         # Diese Felder des Produktmodells werden serialisiert
-        fields = ['id', 'name', 'category', 'image', 'price', 'quantity', 'description', 'tags', 'slug', 'comments']
+        fields = ['id', 'name', 'category', 'image', 'image_variants', 'price', 'quantity', 'description', 'tags', 'slug',
+                  'comment_count', 'latest_comments', 'comments']
+        read_only_fields = ['slug', 'comment_count', 'latest_comments']
+
+    def get_image_variants(self, obj):
+        # Gespeicherte Pfade wie beim ImageField in (absolute) URLs umwandeln
+        variants = obj.image_variants
+        if not variants.get('source'):
+            return None
+        request = self.context.get('request')
+
+        def url(path):
+            location = default_storage.url(path)
+            return request.build_absolute_uri(location) if request is not None else location
+
+        result = {'placeholder': variants['placeholder'], 'width': variants['width'], 'height': variants['height']}
+        for fmt in ('webp', 'jpeg'):
+            result[fmt] = {width: url(path) for width, path in variants[fmt].items()}
+        return result
+
+# Serializer für die Parameter der Produktsuche
+class ProductSearchSerializer(serializers.Serializer):
+    q = serializers.CharField(required=False, allow_blank=True, default='')  # Suchtext
+    category = serializers.ChoiceField(choices=Product.CATEGORY_CHOICES, required=False)
+    tag = serializers.ListField(child=serializers.CharField(), required=False, default=list)  # Alle Tags müssen passen
+    min_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    max_price = serializers.DecimalField(max_digits=10, decimal_places=2, required=False)
+    limit = serializers.IntegerField(min_value=1, max_value=100, default=20)
+    offset = serializers.IntegerField(min_value=0, default=0)
+
+# Serializer für eine Zeile des Produktimports (die Artikelnummer ist der natürliche Schlüssel)
+class ProductImportSerializer(serializers.ModelSerializer):
+    # Ohne UniqueValidator: vorhandene Artikelnummern werden aktualisiert statt abgelehnt
+    sku = serializers.CharField(max_length=64)
+    tags = serializers.ListField(child=serializers.CharField(max_length=100), required=False)
+
+    class Meta:
+        model = Product
+        fields = ['sku', 'name', 'category', 'price', 'quantity', 'description', 'tags']
 
 # Warenkorbartikel Serializer
 class CartItemSerializer(serializers.ModelSerializer):
@@ -32,6 +88,22 @@ class CartItemSerializer(serializers.ModelSerializer):
     class Meta:
         model = CartItem
         fields = ['id', 'product', 'quantity']  # Diese Felder des CartItem-Modells werden serialisiert
+        extra_kwargs = {'quantity': {'min_value': 1}}  # Entfernen nur per DELETE
+
+# Serializer für eine einzelne Zeile einer Sammeländerung am Warenkorb
+class CartOperationSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(default=1)  # Negative Werte verringern die Menge
+
+    def validate_quantity(self, value):
+        if value == 0:
+            raise serializers.ValidationError('Quantity must not be zero.')
+        return value
+
+# Serializer für das Hinzufügen eines Produkts zum Warenkorb (Formulare senden die Menge als Text)
+class AddProductSerializer(serializers.Serializer):
+    product_id = serializers.IntegerField()
+    quantity = serializers.IntegerField(min_value=1, default=1)
 
 # Warenkorb Serializer
 class CartSerializer(serializers.ModelSerializer):
@@ -69,17 +141,27 @@ class CartSerializer(serializers.ModelSerializer):
 
         return instance
 
+# Serializer für eine Bestellzeile (Momentaufnahme beim Abschließen)
+class OrderLineSerializer(serializers.ModelSerializer):
+    class Meta:
+        model = OrderLine
+        fields = ['product_id', 'name', 'unit_price', 'quantity', 'line_total']
+
 # Bestellungs-Serializer
 class OrderSerializer(serializers.ModelSerializer):
-    # Warenkorbdaten werden nur gelesen
-    cart = CartSerializer(read_only=True)
+    # Nur die ID des Warenkorbs; die bestellten Artikel kommen aus den Bestellzeilen
+    cart = serializers.PrimaryKeyRelatedField(read_only=True)
     # Benutzername des Bestellbenutzers wird nur gelesen
     user = serializers.ReadOnlyField(source='user.username')
+    # Bestellzeilen mit den bezahlten Preisen (leer, solange die Bestellung offen ist)
+    lines = OrderLineSerializer(many=True, read_only=True)
 
     class Meta:
         model = Order
         # Diese Felder des Bestellmodells werden serialisiert
-        fields = ['id', 'user', 'cart', 'status', 'created_at', 'updated_at']
+        fields = ['id', 'user', 'cart', 'status', 'total', 'lines', 'created_at', 'updated_at']
+        # Der Status ändert sich nur über complete_order/cancel_order (Bestandsreservierung und Bestellzeilen)
+        read_only_fields = ['status', 'total']
 
     def create(self, validated_data):
         # Daten des Warenkorbs aus den validierten Daten entfernen
@@ -102,7 +184,5 @@ class OrderSerializer(serializers.ModelSerializer):
             cart_serializer.is_valid(raise_exception=True)
             cart_serializer.save()
 
-        # Status der Bestellung aktualisieren
-        instance.status = validated_data.get('status', instance.status)
         instance.save()
         return instance
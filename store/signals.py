@@ -0,0 +1,115 @@
+from django.conf import settings
+from django.db import transaction
+from django.db.models.signals import m2m_changed, post_delete, post_save, pre_delete, pre_save
+from django.dispatch import receiver
+from django.utils import timezone
+
+from cstore import authentication
+
+from . import images, search
+from .cache import bump_catalog_version
+from .models import Comment, Product
+
+
+# Jede Änderung am Katalog erhöht die Version, damit keine veralteten Antworten ausgeliefert werden
+@receiver(post_save, sender=Product)
+@receiver(post_delete, sender=Product)
+def product_changed(sender, **kwargs):
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(m2m_changed, sender=Product.tags.through)
+def product_tags_changed(sender, instance, action, **kwargs):
+    # Tags eines Produkts wurden geändert: Änderungszeitpunkt für inkrementelle Exporte setzen
+    if action in ('post_add', 'post_remove', 'post_clear'):
+        if isinstance(instance, Product):
+            Product.objects.filter(pk=instance.pk).update(updated_at=timezone.now())
+        transaction.on_commit(bump_catalog_version)
+
+
+def refresh_comment_stats(product_ids):
+    # Kommentarzähler der betroffenen Produkte aktualisieren, danach erst die Katalogversion erhöhen
+    for product in Product.objects.filter(pk__in=product_ids).only('id'):
+        product.refresh_comment_stats()
+    transaction.on_commit(bump_catalog_version)
+
+
+@receiver(m2m_changed, sender=Product.comments.through)
+def product_comments_changed(sender, instance, action, reverse, pk_set, **kwargs):
+    if action not in ('pre_clear', 'post_add', 'post_remove', 'post_clear'):
+        return
+    if not reverse:
+        if action != 'pre_clear':
+            refresh_comment_stats([instance.pk])
+    elif action == 'pre_clear':
+        # Beim Leeren von der Kommentarseite sind die Produkte danach nicht mehr bekannt
+        instance._comment_product_ids = list(instance.product_set.values_list('id', flat=True))
+    else:
+        refresh_comment_stats(pk_set if action != 'post_clear' else instance._comment_product_ids)
+
+
+@receiver(post_save, sender=Comment)
+def comment_saved(sender, instance, created, **kwargs):
+    # Neue Kommentare sind noch keinem Produkt zugeordnet, geänderte ändern die Vorschau
+    if not created:
+        refresh_comment_stats(instance.product_set.values_list('id', flat=True))
+
+
+@receiver(pre_delete, sender=Comment)
+def comment_deleting(sender, instance, **kwargs):
+    instance._comment_product_ids = list(instance.product_set.values_list('id', flat=True))
+
+
+@receiver(post_delete, sender=Comment)
+def comment_deleted(sender, instance, **kwargs):
+    refresh_comment_stats(instance._comment_product_ids)
+
+
+# Volltextindex synchron mit den Produkten halten
+@receiver(post_save, sender=Product)
+def index_product(sender, instance, **kwargs):
+    search.index_products([instance.pk])
+
+
+@receiver(post_delete, sender=Product)
+def unindex_product(sender, instance, **kwargs):
+    search.remove_products([instance.pk])
+
+
+@receiver(m2m_changed, sender=Product.tags.through)
+def index_product_tags(sender, instance, action, **kwargs):
+    if action in ('post_add', 'post_remove', 'post_clear') and isinstance(instance, Product):
+        search.index_products([instance.pk])
+
+
+# Bildvarianten erzeugen, sobald ein neues Bild gespeichert wurde
+@receiver(post_save, sender=Product)
+def product_image_changed(sender, instance, **kwargs):
+    if instance.image and instance.image_variants.get('source') != instance.image.name:
+        images.schedule(instance.pk)
+
+
+# Zustandslose JWTs: Tokens sperren, wenn ein Benutzer deaktiviert wird, seine Rechte verliert
+# oder gelöscht wird (is_staff/is_superuser stehen in den Claims)
+@receiver(pre_save, sender=settings.AUTH_USER_MODEL)
+def user_saving(sender, instance, update_fields=None, **kwargs):
+    instance._revoking_values = None
+    if instance.pk is None or (update_fields is not None and not set(update_fields) & set(authentication.REVOKING_FIELDS)):
+        return  # z. B. last_login beim Login
+    instance._revoking_values = sender._default_manager.filter(pk=instance.pk).values_list(
+        *authentication.REVOKING_FIELDS
+    ).first()
+
+
+@receiver(post_save, sender=settings.AUTH_USER_MODEL)
+def user_saved(sender, instance, created, **kwargs):
+    before = getattr(instance, '_revoking_values', None)
+    if created or before is None:
+        return
+    if before != tuple(getattr(instance, field) for field in authentication.REVOKING_FIELDS):
+        authentication.revoke_user(instance.pk)
+
+
+@receiver(post_delete, sender=settings.AUTH_USER_MODEL)
+def user_deleted(sender, instance, **kwargs):
+    authentication.revoke_user(instance.pk)
@@ -1,3 +1,907 @@
-from django.test import TestCase
+import io
+import json
+import os
+import shutil
+import tempfile
+import threading
+from datetime import timedelta
+from decimal import Decimal
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth import get_user_model
+from django.core.cache import cache
+from django.core.files.storage import default_storage
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core import mail
+from django.core.management import call_command
+from django.db import connection
+from django.test import TestCase, TransactionTestCase, override_settings
+from PIL import Image
+from django.test.utils import CaptureQueriesContext
+from django.utils import timezone
+from rest_framework.test import APIClient
+from rest_framework_simplejwt.tokens import RefreshToken
+
+from .cache import get_cache_stats, get_catalog_version
+from . import jobs
+from .models import Cart, Comment, Job, Order, Product
+
+User = get_user_model()
+
+
+def create_product(name="Produkt", price="10.00", quantity=10, tags=("neu",), **kwargs):
+    # Hilfsfunktion zum Anlegen eines Produkts mit Tags
+    product = Product.objects.create(
+        name=name,
+        price=Decimal(price),
+        quantity=quantity,
+        description=kwargs.pop("description", f"Beschreibung von {name}"),
+        image=kwargs.pop("image", ""),
+        **kwargs,
+    )
+    if tags:
+        product.tags.add(*tags)
+    return product
+
+
+class ProductListQueryTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="kunde", password="geheim123")
+
+    def seed(self, count):
+        # Produkte mit Tags und kommentierenden Benutzern anlegen (Katalogversion wie nach dem Commit erhöhen)
+        with self.captureOnCommitCallbacks(execute=True):
+            self._seed(count)
+
+    def _seed(self, count):
+        for i in range(count):
+            product = create_product(name=f"Produkt {Product.objects.count()}", tags=("neu", f"tag{i}"))
+            for j in range(2):
+                author = User.objects.create_user(username=f"autor-{product.id}-{j}")
+                product.comments.add(Comment.objects.create(user=author, content="Super"))
+
+    def count_list_queries(self, url="/store/products/"):
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return len(ctx.captured_queries)
+
+    def test_query_count_is_constant_as_catalog_grows(self):
+        url = "/store/products/?fields=id,name,tags,comments"
+        self.seed(3)
+        small = self.count_list_queries(url)
+        self.seed(12)
+        large = self.count_list_queries(url)
+        self.assertEqual(small, large)
+        self.assertLessEqual(large, 3)
+
+
+class ProductListPaginationTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        for i in range(5):
+            product = create_product(name=f"Produkt {i}")
+            author = User.objects.create_user(username=f"autor{i}")
+            product.comments.add(Comment.objects.create(user=author, content="Gut"))
+
+    def test_list_returns_slim_rows_page_by_page(self):
+        response = self.client.get("/store/products/?page_size=2")
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(len(response.data["results"]), 2)
+        self.assertEqual(set(response.data["results"][0]), {"id", "name", "price", "image", "image_variants", "slug", "comment_count"})
+
+        seen = [row["id"] for row in response.data["results"]]
+        next_url = response.data["next"]
+        while next_url:
+            response = self.client.get(next_url)
+            seen += [row["id"] for row in response.data["results"]]
+            next_url = response.data["next"]
+        self.assertEqual(seen, list(Product.objects.order_by("id").values_list("id", flat=True)))
+
+    def test_fields_and_expand_parameters(self):
+        response = self.client.get("/store/products/?fields=id,price&expand=comments")
+        self.assertEqual(set(response.data["results"][0]), {"id", "price", "comments"})
+
+    def test_detail_includes_comment_preview(self):
+        product = Product.objects.first()
+        response = self.client.get(f"/store/products/{product.id}/")
+        self.assertNotIn("comments", response.data)
+        self.assertEqual(response.data["latest_comments"][0]["content"], "Gut")
+        self.assertEqual(response.data["tags"], ["neu"])
+        response = self.client.get(f"/store/products/{product.id}/?expand=comments")
+        self.assertEqual(response.data["comments"][0]["content"], "Gut")
+
+
+class ProductCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="kunde", password="geheim123")
+        self.product = create_product(name="Kopfhörer")
+
+    def test_second_read_is_served_from_cache(self):
+        first = self.client.get("/store/products/")
+        with self.assertNumQueries(0):
+            second = self.client.get("/store/products/")
+        self.assertEqual(first["X-Cache"], "MISS")
+        self.assertEqual(second["X-Cache"], "HIT")
+        self.assertEqual(first.data, second.data)
+        stats = get_cache_stats()
+        self.assertEqual((stats["hits"], stats["misses"]), (1, 1))
+
+    @override_settings(ALLOWED_HOSTS=["shop.example", "evil.example"])
+    def test_entries_are_not_shared_across_hosts(self):
+        self.client.get("/store/products/", HTTP_HOST="evil.example")
+        response = self.client.get("/store/products/", HTTP_HOST="shop.example")
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertNotIn("evil.example", response.content.decode())
+        secure = self.client.get("/store/products/", HTTP_HOST="shop.example", secure=True)
+        self.assertEqual(secure["X-Cache"], "MISS")
+
+    @override_settings(DATABASE_REPLICAS=["replica1"], CATALOG_REPLICA_CACHE_TIMEOUT=0)
+    def test_cold_read_reaches_a_replica(self):
+        # Das Replikat ist hier die Testdatenbank selbst; nur die Routing-Entscheidung wird geprüft
+        with mock.patch("cstore.routers.random") as choice:
+            choice.choice.return_value = "default"
+            first = self.client.get("/store/products/")
+            second = self.client.get("/store/products/")
+        choice.choice.assert_called_with(["replica1"])
+        self.assertEqual(first.data, second.data)
+        # Vom Replikat gelesene Daten liegen nur CATALOG_REPLICA_CACHE_TIMEOUT Sekunden im Cache
+        self.assertEqual((first["X-Cache"], second["X-Cache"]), ("MISS", "MISS"))
+
+    def test_writes_bump_the_catalog_version(self):
+        url = f"/store/products/{self.product.id}/"
+        self.client.get(url)
+
+        self.product.price = Decimal("99.00")
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.save()
+        self.assertEqual(self.client.get(url).data["price"], "99.00")
+
+        with self.captureOnCommitCallbacks(execute=True):
+            self.product.tags.add("angebot")
+        self.assertIn("angebot", self.client.get(url).data["tags"])
+
+        self.client.force_authenticate(self.user)
+        with self.captureOnCommitCallbacks(execute=True):
+            self.client.post("/store/product/add_comment/", {"product_id": self.product.id, "content": "Toll"})
+        response = self.client.get(url)
+        self.assertEqual(response["X-Cache"], "MISS")
+        self.assertEqual(response.data["latest_comments"][0]["content"], "Toll")
+
+
+    def test_version_is_bumped_only_after_commit(self):
+        # Ein Lesezugriff vor dem Commit darf alte Zeilen nicht unter der neuen Version ablegen
+        version = get_catalog_version()
+        with self.captureOnCommitCallbacks() as callbacks:
+            self.product.price = Decimal("99.00")
+            self.product.save()
+            self.assertEqual(get_catalog_version(), version)
+        for callback in callbacks:
+            callback()
+        self.assertGreater(get_catalog_version(), version)
+
+
+class CartTotalTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="kunde", password="geheim123")
+        self.cart = Cart.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_total_is_adjusted_incrementally(self):
+        headset = create_product(name="Headset", price="19.99")
+        phone = create_product(name="Telefon", price="250.00")
+        self.cart.add_product(headset, 2)
+        self.cart.add_product(phone, 1)
+        self.assertEqual(self.cart.total, Decimal("289.98"))
+        self.cart.remove_product(headset)
+        self.assertEqual(self.cart.total, Decimal("250.00"))
+        self.assertEqual(self.cart.compute_total(), self.cart.total)
+
+    def test_calculate_total_endpoint_is_read_only(self):
+        self.cart.add_product(create_product(price="5.50"), 2)
+        with CaptureQueriesContext(connection) as ctx:
+            response = self.client.get(f"/store/carts/{self.cart.id}/calculate_total/")
+        self.assertEqual(response.data["total"], Decimal("11.00"))
+        self.assertFalse([q for q in ctx.captured_queries if not q["sql"].startswith("SELECT")])
+
+
+class CartConcurrencyTests(TransactionTestCase):
+    def test_parallel_adds_are_not_lost(self):
+        user = User.objects.create_user(username="kunde", password="geheim123")
+        other = User.objects.create_user(username="andere", password="geheim123")
+        cart = Cart.objects.create(user=user)
+        other_cart = Cart.objects.create(user=other)
+        headset = create_product(name="Headset", price="19.99")
+        phone = create_product(name="Telefon", price="250.00")
+        other_cart.add_product(headset, 3)
+
+        errors = []
+
+        def worker():
+            client = APIClient()
+            client.force_authenticate(user)
+            try:
+                for product in (headset, phone, headset):
+                    response = client.post(
+                        f"/store/carts/{cart.id}/add_product/",
+                        {"product_id": product.id, "quantity": 1},
+                        format="json",
+                    )
+                    if response.status_code != 200:
+                        errors.append(response.status_code)
+            except Exception as exc:
+                errors.append(exc)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=worker) for _ in range(8)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        self.assertEqual(errors, [])
+        cart.refresh_from_db()
+        quantities = dict(cart.items.values_list("product__name", "quantity"))
+        self.assertEqual(quantities, {"Headset": 16, "Telefon": 8})
+        self.assertEqual(cart.total, Decimal("2319.84"))
+        self.assertEqual(cart.total, cart.compute_total())
+        # Der Warenkorb des anderen Benutzers bleibt unberührt
+        self.assertEqual(list(other_cart.items.values_list("quantity", flat=True)), [3])
+
+
+class CartBatchTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="kunde", password="geheim123")
+        self.cart = Cart.objects.create(user=self.user)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.headset = create_product(name="Headset", price="20.00")
+        self.phone = create_product(name="Telefon", price="100.00")
+        self.cart.add_product(self.headset, 3)
+
+    def test_batch_applies_valid_lines_and_reports_errors(self):
+        response = self.client.post(f"/store/carts/{self.cart.id}/batch/", {"operations": [
+            {"product_id": self.phone.id, "quantity": 2},
+            {"product_id": self.headset.id, "quantity": -1},
+            {"product_id": 999999, "quantity": 1},
+            {"product_id": self.phone.id, "quantity": 0},
+        ]}, format="json")
+        self.assertEqual(response.status_code, 200)
+        statuses = [line["status"] for line in response.data["results"]]
+        self.assertEqual(statuses, ["ok", "ok", "error", "error"])
+        self.assertEqual(response.data["results"][2]["error"], "Product not found")
+        quantities = dict(self.cart.items.values_list("product__name", "quantity"))
+        self.assertEqual(quantities, {"Headset": 2, "Telefon": 2})
+        self.assertEqual(response.data["total"], Decimal("240.00"))
+        self.assertEqual(self.cart.compute_total(), Decimal("240.00"))
+
+    def test_batch_removes_lines_that_drop_to_zero(self):
+        response = self.client.post("/store/cart/batch/", [
+            {"product_id": self.headset.id, "quantity": -5},
+        ], format="json")
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(self.cart.items.exists())
+        self.assertEqual(response.data["total"], Decimal("0.00"))
+
+    def test_add_product_validates_quantity(self):
+        # Formulardaten liefern Text: wird umgewandelt statt einen 500 auszulösen
+        response = self.client.post("/store/cart/add_product/", {"product_id": self.phone.id, "quantity": "2"})
+        self.assertEqual(response.status_code, 200)
+        for quantity in (0, -1, 1.5, "viele"):
+            response = self.client.post(
+                f"/store/carts/{self.cart.id}/add_product/", {"product_id": self.phone.id, "quantity": quantity}, format="json"
+            )
+            self.assertEqual(response.status_code, 400)
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.total, Decimal("260.00"))
+        self.assertEqual(self.cart.compute_total(), self.cart.total)
+
+    def test_cart_item_changes_keep_the_total(self):
+        item = self.cart.items.get()
+        response = self.client.patch(f"/store/cart-items/{item.id}/", {"quantity": 5}, format="json")
+        self.assertEqual((response.status_code, response.data["quantity"]), (200, 5))
+        self.assertEqual(self.client.patch(f"/store/cart-items/{item.id}/", {"quantity": 0}, format="json").status_code, 400)
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.total, Decimal("100.00"))
+
+        self.assertEqual(self.client.delete(f"/store/cart-items/{item.id}/").status_code, 204)
+        self.cart.refresh_from_db()
+        self.assertEqual(self.cart.total, Decimal("0.00"))
+        self.assertEqual(self.client.post("/store/cart-items/", {}, format="json").status_code, 405)
+
+    def test_unknown_product_on_add_product_is_404(self):
+        response = self.client.post(f"/store/carts/{self.cart.id}/add_product/", {"product_id": 999999}, format="json")
+        self.assertEqual(response.status_code, 404)
+
+
+class OrderStockTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="kunde", password="geheim123")
+        self.cart = Cart.objects.create(user=self.user)
+        self.order = Order.objects.create(user=self.user, cart=self.cart)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def test_complete_and_cancel_move_stock(self):
+        product = create_product(quantity=5)
+        self.cart.add_product(product, 3)
+        response = self.client.post(f"/store/orders/{self.order.id}/complete_order/")
+        self.assertEqual(response.status_code, 200)
+        product.refresh_from_db()
+        self.assertEqual(product.quantity, 2)
+
+        # Erneutes Abschließen bucht nicht noch einmal ab
+        self.client.post(f"/store/orders/{self.order.id}/complete_order/")
+        product.refresh_from_db()
+        self.assertEqual(product.quantity, 2)
+
+        self.client.post(f"/store/orders/{self.order.id}/cancel_order/")
+        product.refresh_from_db()
+        self.assertEqual(product.quantity, 5)
+        self.assertFalse(self.order.reservations.exists())
+
+    def test_status_cannot_be_patched_around_the_reservation(self):
+        product = create_product(quantity=10)
+        self.cart.add_product(product, 2)
+        self.client.post(f"/store/orders/{self.order.id}/complete_order/")
+        for status in ("pending", "cancelled"):
+            response = self.client.patch(f"/store/orders/{self.order.id}/", {"status": status}, format="json")
+            self.assertEqual(response.status_code, 200)
+            self.assertEqual(response.data["status"], "completed")
+        self.client.post(f"/store/orders/{self.order.id}/complete_order/")
+        product.refresh_from_db()
+        self.assertEqual(product.quantity, 8)
+        self.assertEqual((self.order.reservations.count(), self.order.lines.count()), (1, 1))
+
+        self.client.post(f"/store/orders/{self.order.id}/cancel_order/")
+        product.refresh_from_db()
+        self.assertEqual(product.quantity, 10)
+
+    def test_shortfall_rolls_back_everything(self):
+        plenty = create_product(name="Viel", quantity=10)
+        scarce = create_product(name="Knapp", quantity=1)
+        self.cart.add_product(plenty, 2)
+        self.cart.add_product(scarce, 2)
+        response = self.client.post(f"/store/orders/{self.order.id}/complete_order/")
+        self.assertEqual(response.status_code, 409)
+        self.assertEqual(response.data["products"], [scarce.id])
+        plenty.refresh_from_db()
+        self.order.refresh_from_db()
+        self.assertEqual(plenty.quantity, 10)
+        self.assertEqual(self.order.status, "pending")
+
+
+class OrderHistoryTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="kunde", password="geheim123")
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.products = [create_product(name=f"Produkt {i}", price=f"{i + 1}.50") for i in range(3)]
+
+    def checkout(self, quantities):
+        # Cart.user ist 1:1, daher gehört jeder Warenkorb einem eigenen Benutzer; die Bestellungen alle self.user
+        cart = Cart.objects.create(user=User.objects.create_user(username=f"k{Cart.objects.count()}"))
+        for product, quantity in zip(self.products, quantities):
+            cart.add_product(product, quantity)
+        order = Order.objects.create(user=self.user, cart=cart)
+        self.assertEqual(self.client.post(f"/store/orders/{order.id}/complete_order/").status_code, 200)
+        return order
+
+    def test_checkout_snapshots_lines_and_prices(self):
+        order = self.checkout([2, 1])
+        self.products[0].name = "Umbenannt"
+        self.products[0].price = Decimal("99.00")
+        self.products[0].save()
+        Comment.objects.create(user=self.user, content="x" * 1000)
+        self.products[0].comments.add(Comment.objects.get())
+
+        response = self.client.get("/store/orders/")
+        self.assertEqual(response.status_code, 200)
+        data = response.json()[0]
+        self.assertEqual(data["total"], "5.50")
+        self.assertEqual(data["lines"], [
+            {"product_id": self.products[0].id, "name": "Produkt 0", "unit_price": "1.50", "quantity": 2, "line_total": "3.00"},
+            {"product_id": self.products[1].id, "name": "Produkt 1", "unit_price": "2.50", "quantity": 1, "line_total": "2.50"},
+        ])
+        self.assertNotIn(b"xxxx", response.content)
+        order.refresh_from_db()
+        self.assertEqual(order.total, Decimal("5.50"))
+
+    def test_order_list_uses_constant_queries(self):
+        self.checkout([1, 1, 1])
+        with CaptureQueriesContext(connection) as queries:
+            self.client.get("/store/orders/")
+        expected = len(queries)
+        self.checkout([3, 2, 1])
+        self.checkout([1])
+        with self.assertNumQueries(expected):
+            response = self.client.get("/store/orders/")
+        self.assertEqual([len(order["lines"]) for order in response.json()], [1, 3, 3])
+
+
+class OrderJobTests(TestCase):
+    def setUp(self):
+        self.user = User.objects.create_user(username="kunde", password="geheim123", email="kunde@example.com")
+        self.cart = Cart.objects.create(user=self.user)
+        self.order = Order.objects.create(user=self.user, cart=self.cart)
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def run_jobs(self):
+        call_command("run_jobs", processes=0, once=True, stdout=io.StringIO())
+
+    def test_side_effects_run_in_the_worker(self):
+        self.cart.add_product(create_product(quantity=5), 1)
+        self.assertEqual(self.client.post(f"/store/orders/{self.order.id}/complete_order/").status_code, 200)
+        # Im Request wurde nur die Outbox geschrieben
+        self.assertEqual(sorted(Job.objects.values_list("name", flat=True)), ["order.analytics", "order.email"])
+        self.assertEqual(mail.outbox, [])
+
+        with self.assertLogs("store.analytics") as logs:
+            self.run_jobs()
+        self.assertEqual(len(mail.outbox), 1)
+        self.assertEqual(mail.outbox[0].to, ["kunde@example.com"])
+        self.assertIn('"event": "order.completed"', logs.output[0])
+        self.assertFalse(Job.objects.exclude(status="done").exists())
+
+        self.run_jobs()
+        self.assertEqual(len(mail.outbox), 1)
+
+    def test_outbox_rolls_back_with_the_order(self):
+        self.cart.add_product(create_product(quantity=1), 2)
+        self.assertEqual(self.client.post(f"/store/orders/{self.order.id}/complete_order/").status_code, 409)
+        self.assertFalse(Job.objects.exists())
+
+    def test_idempotency_key_enqueues_once(self):
+        Job.enqueue("order.email", {"order_id": self.order.id, "event": "completed"}, key="einmalig")
+        Job.enqueue("order.email", {"order_id": self.order.id, "event": "completed"}, key="einmalig")
+        self.assertEqual(Job.objects.count(), 1)
+
+    @override_settings(JOB_RETRY_DELAY=10)
+    def test_failures_are_retried_with_backoff_until_max_attempts(self):
+        Job.enqueue("kaputt", {}, key="kaputt")
+        Job.objects.update(max_attempts=2)
+        with mock.patch.dict(jobs.HANDLERS, {"kaputt": mock.Mock(side_effect=RuntimeError("SMTP weg"))}):
+            with self.assertLogs("store.jobs", "ERROR"):
+                self.run_jobs()
+            job = Job.objects.get()
+            self.assertEqual((job.status, job.attempts), ("pending", 1))
+            self.assertIn("SMTP weg", job.last_error)
+            self.assertGreater(job.run_after, timezone.now() + timedelta(seconds=5))
+
+            # Noch nicht fällig
+            self.assertEqual(jobs.claim(10), [])
+            Job.objects.update(run_after=timezone.now())
+            with self.assertLogs("store.jobs", "ERROR"):
+                self.run_jobs()
+        self.assertEqual(Job.objects.get().status, "failed")
+
+    def test_expired_lease_is_claimed_again(self):
+        Job.enqueue("order.analytics", {"order_id": self.order.id, "event": "completed"}, key="haengt")
+        self.assertEqual(len(jobs.claim(10)), 1)
+        self.assertEqual(jobs.claim(10), [])
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(len(jobs.claim(10)), 1)
+        self.assertEqual(Job.objects.get().attempts, 2)
+
+    def test_expired_lease_after_last_attempt_fails_the_job(self):
+        Job.enqueue("order.analytics", {"order_id": self.order.id, "event": "completed"}, key="haengt")
+        Job.objects.update(max_attempts=1)
+        self.assertEqual(len(jobs.claim(10)), 1)
+        Job.objects.update(locked_until=timezone.now() - timedelta(seconds=1))
+        self.assertEqual(jobs.claim(10), [])
+        job = Job.objects.get()
+        self.assertEqual((job.status, job.attempts, job.locked_until), ("failed", 1, None))
+
+    def test_comment_analytics_is_queued(self):
+        product = create_product()
+        self.client.post("/store/product/add_comment/", {"product_id": product.id, "content": "Super"}, format="json")
+        self.assertTrue(Job.objects.filter(name="comment.analytics").exists())
+
+
+class OrderStockConcurrencyTests(TransactionTestCase):
+    def test_parallel_checkouts_never_oversell(self):
+        product = create_product(quantity=5)
+        orders = []
+        for i in range(12):
+            user = User.objects.create_user(username=f"kunde{i}")
+            cart = Cart.objects.create(user=user)
+            cart.add_product(product, 1)
+            orders.append(Order.objects.create(user=user, cart=cart))
+
+        codes = []
+
+        def checkout(order):
+            client = APIClient()
+            client.force_authenticate(order.user)
+            try:
+                codes.append(client.post(f"/store/orders/{order.id}/complete_order/").status_code)
+            finally:
+                connection.close()
+
+        threads = [threading.Thread(target=checkout, args=(order,)) for order in orders]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+
+        product.refresh_from_db()
+        self.assertEqual(sorted(codes), [200] * 5 + [409] * 7)
+        self.assertEqual(product.quantity, 0)
+        self.assertEqual(Order.objects.filter(status="completed").count(), 5)
+
+
+class ProductSearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.airpods = create_product(name="AirPods Pro", price="249.00", category="hot", tags=("audio", "apple"),
+                                      description="Kabellose Kopfhörer mit Geräuschunterdrückung")
+        self.headset = create_product(name="Gaming Headset", price="59.00", category="cheap", tags=("audio",),
+                                      description="Kopfhörer mit Mikrofon")
+        self.phone = create_product(name="iPhone 5s", price="99.00", category="cheap", tags=("apple",),
+                                    description="Telefon")
+
+    def search(self, query):
+        response = self.client.get(f"/store/products/search/?{query}")
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_ranked_text_search_with_facets(self):
+        data = self.search("q=kopfhörer")
+        self.assertEqual(data["count"], 2)
+        self.assertEqual({row["id"] for row in data["results"]}, {self.airpods.id, self.headset.id})
+        self.assertEqual(data["facets"]["tags"], [{"value": "audio", "count": 2}, {"value": "apple", "count": 1}])
+        self.assertEqual({f["value"] for f in data["facets"]["category"]}, {"hot", "cheap"})
+
+    def test_filters_and_index_follows_changes(self):
+        data = self.search("tag=apple&category=cheap&max_price=100")
+        self.assertEqual([row["id"] for row in data["results"]], [self.phone.id])
+
+        self.phone.name = "Smartphone Deluxe"
+        self.phone.save()
+        self.phone.tags.add("deluxe")
+        self.assertEqual([row["id"] for row in self.search("q=deluxe")["results"]], [self.phone.id])
+        self.assertEqual(self.search("q=iphone")["count"], 0)
+
+        self.phone.delete()
+        self.assertEqual(self.search("q=smartphone")["count"], 0)
+
+    def test_invalid_category_is_rejected(self):
+        response = self.client.get("/store/products/search/?category=unbekannt")
+        self.assertEqual(response.status_code, 400)
+
+
+class ProductCommentTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+        self.user = User.objects.create_user(username="kunde", password="geheim123")
+        self.product = create_product()
+
+    def add_comment(self, content):
+        self.client.force_authenticate(self.user)
+        response = self.client.post("/store/product/add_comment/", {"product_id": self.product.id, "content": content})
+        self.assertEqual(response.status_code, 200)
+
+    def test_counts_and_preview_follow_adds_and_deletes(self):
+        for i in range(5):
+            self.add_comment(f"Kommentar {i}")
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.comment_count, 5)
+        self.assertEqual([c["content"] for c in self.product.latest_comments], ["Kommentar 4", "Kommentar 3", "Kommentar 2"])
+        self.assertEqual(self.product.latest_comments[0]["user"]["username"], "kunde")
+
+        Comment.objects.filter(content="Kommentar 4").delete()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.comment_count, 4)
+        self.assertEqual(self.product.latest_comments[0]["content"], "Kommentar 3")
+
+    def test_stale_save_keeps_comment_stats(self):
+        stale = Product.objects.get(pk=self.product.pk)
+        self.add_comment("Neu")
+        stale.price = Decimal("12.00")
+        stale.save()
+        self.product.refresh_from_db()
+        self.assertEqual(self.product.comment_count, 1)
+
+    def test_comments_sub_resource_is_paginated(self):
+        for i in range(5):
+            self.add_comment(f"Kommentar {i}")
+        self.client.force_authenticate(None)
+        response = self.client.get(f"/store/products/{self.product.id}/comments/?page_size=2")
+        self.assertEqual([c["content"] for c in response.data["results"]], ["Kommentar 4", "Kommentar 3"])
+        response = self.client.get(response.data["next"])
+        self.assertEqual([c["content"] for c in response.data["results"]], ["Kommentar 2", "Kommentar 1"])
+        self.assertEqual(self.client.get("/store/products/999999/comments/").status_code, 404)
+
+
+class ProductImageTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.media_root = tempfile.mkdtemp()
+        self.settings = override_settings(MEDIA_ROOT=self.media_root, PRODUCT_IMAGE_ASYNC=False)
+        self.settings.enable()
+
+    def tearDown(self):
+        self.settings.disable()
+        shutil.rmtree(self.media_root)
+
+    def upload(self, name):
+        buffer = io.BytesIO()
+        Image.new("RGBA", (1200, 800), (200, 30, 30, 128)).save(buffer, "PNG")
+        return SimpleUploadedFile(name, buffer.getvalue(), content_type="image/png")
+
+    def test_variants_are_generated_and_duplicates_merged(self):
+        with self.captureOnCommitCallbacks(execute=True):
+            first = create_product(name="Erstes", image=self.upload("bild.png"))
+        first.refresh_from_db()
+        self.assertEqual(first.image_variants["width"], 1200)
+        self.assertEqual(sorted(first.image_variants["webp"], key=int), ["160", "480", "960"])
+        self.assertTrue(first.image_variants["placeholder"].startswith("data:image/webp;base64,"))
+        with default_storage.open(first.image_variants["jpeg"]["480"]) as fh:
+            self.assertEqual(Image.open(fh).size, (480, 320))
+
+        with self.captureOnCommitCallbacks(execute=True):
+            second = create_product(name="Zweites", image=self.upload("bild.png"))
+        duplicate = second.image.name
+        saved_at = second.updated_at
+        second.refresh_from_db()
+        # Das umgeschriebene Bildfeld erscheint im nächsten inkrementellen Export
+        self.assertGreater(second.updated_at, saved_at)
+        self.assertEqual(second.image.name, first.image.name)
+        self.assertEqual(second.image_hash, first.image_hash)
+        self.assertFalse(default_storage.exists(duplicate))
+
+        response = APIClient().get(f"/store/products/{second.id}/")
+        self.assertTrue(response.data["image_variants"]["webp"]["160"].endswith(f"/media/products/variants/{first.image_hash}/160.webp"))
+
+
+class AsyncReadEndpointTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.user = User.objects.create_user(username="kunde", password="geheim123")
+        self.cart = Cart.objects.create(user=self.user)
+        self.products = [create_product(name=f"Produkt {i}", price="10.00") for i in range(3)]
+        self.cart.add_product(self.products[0], 2)
+        self.order = Order.objects.create(user=self.user, cart=self.cart)
+        self.auth = {"Authorization": f"Bearer {RefreshToken.for_user(self.user).access_token}"}
+
+    async def test_product_list_and_detail(self):
+        response = await self.async_client.get("/store/async/products/?page_size=2")
+        data = response.json()
+        self.assertEqual([row["id"] for row in data["results"]], [p.id for p in self.products[:2]])
+        response = await self.async_client.get(f"/store/async/products/?after={data['next_after']}")
+        self.assertEqual([row["id"] for row in response.json()["results"]], [self.products[2].id])
+
+        response = await self.async_client.get(f"/store/async/products/{self.products[0].id}/")
+        self.assertEqual(response.json()["tags"], ["neu"])
+        response = await self.async_client.get(f"/store/async/products/{self.products[0].id}/")
+        self.assertEqual(response["X-Cache"], "HIT")
+        self.assertEqual((await self.async_client.get("/store/async/products/999999/")).status_code, 404)
+
+    async def test_invalid_page_size_is_a_bad_request(self):
+        for page_size in ("0", "-1", "abc"):
+            response = await self.async_client.get(f"/store/async/products/?page_size={page_size}")
+            self.assertEqual(response.status_code, 400)
+
+    async def test_cart_and_orders_require_authentication(self):
+        response = await self.async_client.get(f"/store/async/carts/{self.cart.id}/", headers=self.auth)
+        self.assertEqual(response.json()["total"], "20.00")
+        self.assertEqual(response.json()["items"][0]["quantity"], 2)
+        response = await self.async_client.get("/store/async/orders/", headers=self.auth)
+        self.assertEqual([order["id"] for order in response.json()], [self.order.id])
+        self.assertEqual((await self.async_client.get("/store/async/orders/")).status_code, 401)
+
+    async def test_invalid_token_is_rejected_not_anonymous(self):
+        response = await self.async_client.get("/store/async/orders/", headers={"Authorization": "Bearer kaputt"})
+        self.assertEqual(response.status_code, 401)
+        self.assertEqual(response.json()["code"], "token_not_valid")
+        self.assertTrue(response["WWW-Authenticate"].startswith("Bearer"))
+
+
+class ProductExportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(username="admin", password="geheim123")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+        self.products = [create_product(name=f"Produkt {i}", tags=("neu", "sale")) for i in range(3)]
+
+    def export(self, **params):
+        response = self.client.get("/store/products/export/", params)
+        self.assertEqual(response.status_code, 200)
+        return response, b"".join(response.streaming_content)
+
+    def test_ndjson_export_streams_all_products(self):
+        response, body = self.export(format="ndjson")
+        self.assertEqual(response["Content-Type"], "application/x-ndjson")
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row["id"] for row in rows], [p.id for p in self.products])
+        self.assertEqual(rows[0]["tags"], ["neu", "sale"])
+        self.assertEqual(rows[0]["price"], "10.00")
+
+    def test_csv_and_json_formats(self):
+        response, body = self.export(format="csv")
+        lines = body.decode().splitlines()
+        self.assertEqual(lines[0], "id,name,slug,category,price,quantity,image,tags,updated_at")
+        self.assertEqual(len(lines), 4)
+        self.assertIn('"neu,sale"', lines[1])
+        response, body = self.export(format="json")
+        self.assertEqual(len(json.loads(body)), 3)
+
+    def test_incremental_export_uses_watermark(self):
+        response, body = self.export(format="ndjson")
+        watermark = response["X-Export-Watermark"]
+        product = self.products[1]
+        product.quantity = 3
+        product.save()
+        response, body = self.export(format="ndjson", updated_since=watermark)
+        rows = [json.loads(line) for line in body.splitlines()]
+        self.assertEqual([row["id"] for row in rows], [product.id])
+        self.assertEqual(rows[0]["quantity"], 3)
+        # Ohne neue Änderungen bleibt das Wasserzeichen erhalten
+        response, body = self.export(format="ndjson", updated_since=response["X-Export-Watermark"])
+        self.assertEqual(body, b"")
+
+    def test_export_requires_admin_and_valid_timestamp(self):
+        response = self.client.get("/store/products/export/", {"updated_since": "gestern"})
+        self.assertEqual(response.status_code, 400)
+        self.client.force_authenticate(None)
+        self.assertIn(self.client.get("/store/products/export/").status_code, (401, 403))
+
+    def test_management_command_writes_file(self):
+        output = io.StringIO()
+        with tempfile.NamedTemporaryFile(suffix=".ndjson") as target:
+            call_command("export_products", output=target.name, stderr=output)
+            lines = open(target.name, "rb").read().splitlines()
+        self.assertEqual(len(lines), 3)
+        self.assertIn("watermark:", output.getvalue())
+
+
+class ProductImportTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.admin = User.objects.create_superuser(username="admin", password="geheim123")
+        self.client = APIClient()
+        self.client.force_authenticate(self.admin)
+
+    def post(self, body, content_type):
+        response = self.client.post("/store/products/import/", body, content_type=content_type)
+        self.assertEqual(response.status_code, 200)
+        return response.json()
+
+    def test_csv_import_creates_products_with_tags(self):
+        body = (
+            "sku,name,category,price,quantity,description,tags\n"
+            'A-1,Roter Stuhl,new,19.90,5,Ein Stuhl,"holz, rot"\n'
+            "A-2,Blauer Tisch,sale,49.00,2,Ein Tisch,holz\n"
+        )
+        result = self.post(body, "text/csv")
+        self.assertEqual(result, {"created": 2, "updated": 0, "errors": []})
+        product = Product.objects.get(sku="A-1")
+        self.assertEqual(product.slug, "roter-stuhl")
+        self.assertEqual(sorted(product.tags.names()), ["holz", "rot"])
+        self.assertEqual(Product.objects.get(sku="A-2").tags.get().pk, product.tags.get(name="holz").pk)
+        response = self.client.get("/store/products/search/", {"q": "stuhl"})
+        self.assertEqual([p["id"] for p in response.json()["results"]], [product.id])
+
+    def test_reimport_is_an_upsert(self):
+        row = {"sku": "A-1", "name": "Stuhl", "category": "new", "price": "10.00", "quantity": 1,
+               "description": "Stuhl", "tags": ["holz", "rot"]}
+        self.post(json.dumps(row), "application/x-ndjson")
+        row.update(name="Sessel", quantity=7, tags=["Holz", "bequem"])
+        result = self.post(json.dumps(row), "application/x-ndjson")
+        self.assertEqual((result["created"], result["updated"]), (0, 1))
+        product = Product.objects.get()
+        self.assertEqual((product.name, product.slug, product.quantity), ("Sessel", "sessel", 7))
+        self.assertEqual(sorted(product.tags.names()), ["bequem", "holz"])
+
+    def test_invalid_rows_are_reported_per_row(self):
+        body = "\n".join([
+            json.dumps({"sku": "A-1", "name": "Stuhl", "category": "new", "price": "10.00", "quantity": 1,
+                        "description": "Stuhl"}),
+            "{kaputt",
+            json.dumps({"sku": "A-2", "name": "Tisch", "category": "unbekannt", "price": "x", "quantity": 1,
+                        "description": "Tisch"}),
+            json.dumps({"sku": "A-1", "name": "Stuhl", "category": "new", "price": "10.00", "quantity": 1,
+                        "description": "Stuhl"}),
+        ])
+        result = self.post(body, "application/x-ndjson")
+        self.assertEqual(result["created"], 1)
+        self.assertEqual([error["row"] for error in result["errors"]], [2, 3, 4])
+        self.assertEqual(set(result["errors"][1]["errors"]), {"category", "price"})
+
+    def test_import_uses_constant_queries_per_chunk(self):
+        rows = [
+            {"sku": f"S-{i}", "name": f"Produkt {i}", "category": "new", "price": "1.00", "quantity": 1,
+             "description": "x", "tags": [f"tag{i % 3}", "alle"]}
+            for i in range(50)
+        ]
+        with CaptureQueriesContext(connection) as queries:
+            self.post(json.dumps(rows), "application/json")
+        self.assertLess(len(queries), 30)
+        self.assertEqual(Product.objects.count(), 50)
+
+    def test_import_requires_admin(self):
+        self.client.force_authenticate(None)
+        response = self.client.post("/store/products/import/", "[]", content_type="application/json")
+        self.assertIn(response.status_code, (401, 403))
+
+    def test_management_command_imports_file(self):
+        with tempfile.NamedTemporaryFile("w", suffix=".csv", delete=False) as source:
+            source.write("sku,name,category,price,quantity,description\nA-1,Stuhl,new,10.00,1,Stuhl\n")
+        self.addCleanup(os.remove, source.name)
+        output = io.StringIO()
+        call_command("import_products", source.name, stdout=output)
+        self.assertIn("Created 1, updated 0, failed 0.", output.getvalue())
+        self.assertTrue(Product.objects.filter(sku="A-1").exists())
+
+
+class ProductSlugTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.client = APIClient()
+
+    def test_colliding_names_get_numbered_suffixes(self):
+        slugs = [create_product(name="Roter Stuhl").slug for _ in range(3)]
+        self.assertEqual(slugs, ["roter-stuhl", "roter-stuhl-2", "roter-stuhl-3"])
+
+    def test_concurrent_slug_collision_is_retried(self):
+        create_product(name="Roter Stuhl")
+        assign_slugs = Product.assign_slugs.__func__
+        calls = []
+
+        def stale(cls, products):
+            # Erster Versuch sieht den gleichzeitig angelegten Stuhl noch nicht
+            calls.append(1)
+            if len(calls) == 1:
+                for product in products:
+                    product.slug = "roter-stuhl"
+                return
+            assign_slugs(cls, products)
+
+        with mock.patch.object(Product, "assign_slugs", classmethod(stale)):
+            product = create_product(name="Roter Stuhl", tags=())
+        self.assertEqual((product.slug, len(calls)), ("roter-stuhl-2", 2))
+
+    def test_slug_only_changes_with_name_and_old_slug_redirects(self):
+        product = create_product(name="Roter Stuhl")
+        product.quantity = 3
+        product.save()
+        self.assertEqual(product.slug, "roter-stuhl")
+
+        product = Product.objects.get(pk=product.pk)
+        product.name = "Blauer Stuhl"
+        product.save()
+        self.assertEqual(product.slug, "blauer-stuhl")
+
+        response = self.client.get("/store/products/by-slug/roter-stuhl/?fields=id")
+        self.assertEqual(response.status_code, 301)
+        self.assertEqual(response["Location"], "/store/products/by-slug/blauer-stuhl/?fields=id")
+        # Der alte Slug bleibt reserviert
+        self.assertEqual(create_product(name="Roter Stuhl").slug, "roter-stuhl-2")
+
+    def test_by_slug_uses_single_product_query(self):
+        product = create_product(name="Roter Stuhl")
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get("/store/products/by-slug/roter-stuhl/", {"fields": "id,name,slug"})
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {"id": product.id, "name": "Roter Stuhl", "slug": "roter-stuhl"})
+        product_queries = [q for q in queries.captured_queries if 'FROM "store_product"' in q["sql"]]
+        self.assertEqual(len(product_queries), 1)
+        self.assertEqual(self.client.get("/store/products/by-slug/gibt-es-nicht/").status_code, 404)
+
+    def test_assign_slugs_handles_large_batches(self):
+        create_product(name="Artikel 7")
+        products = [Product(name=f"Artikel {i}") for i in range(600)]
+        Product.assign_slugs(products)
+        self.assertEqual(len({p.slug for p in products}), 600)
+        self.assertEqual(products[7].slug, "artikel-7-2")
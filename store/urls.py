@@ -1,6 +1,7 @@
 from django.urls import path, include
 from rest_framework.routers import DefaultRouter
-from .views import ProductViewSet, CartItemViewSet, CartViewSet, OrderViewSet, AddProductToCartView, RemoveProductFromCartView, AddProductComment
+from . import async_views
+from .views import ProductViewSet, CartItemViewSet, CartViewSet, OrderViewSet, AddProductToCartView, RemoveProductFromCartView, AddProductComment, BatchCartView
 
 # DefaultRouter erstellen
 router = DefaultRouter()
@@ -20,6 +21,13 @@ urlpatterns = [
     path('cart/add_product/', AddProductToCartView.as_view(), name='add_product_to_cart'),
     # Route für das Entfernen eines Produkts aus dem Warenkorb
     path('cart/remove_product/', RemoveProductFromCartView.as_view(), name='remove_product_from_cart'),
+    # Route für Sammeländerungen am Warenkorb
+    path('cart/batch/', BatchCartView.as_view(), name='batch_cart'),
+    # Asynchrone Lesezugriffe für den Betrieb unter ASGI
+    path('async/products/', async_views.product_list, name='async-product-list'),
+    path('async/products/<int:pk>/', async_views.product_detail, name='async-product-detail'),
+    path('async/carts/<int:pk>/', async_views.cart_detail, name='async-cart-detail'),
+    path('async/orders/', async_views.order_list, name='async-order-list'),
     # Route für das Hinzufügen eines Kommentars zu einem Produkt
     path('product/add_comment/', AddProductComment.as_view(), name='add_comment_to_product'),
 ]
@@ -1,22 +1,229 @@
-from rest_framework import viewsets, generics, permissions, status
+from rest_framework import viewsets, generics, mixins, permissions, status
 from rest_framework.response import Response
 from rest_framework.decorators import action
-from .models import Product, CartItem, Cart, Order, Comment
-from .serializers import ProductSerializer, CartItemSerializer, CartSerializer, OrderSerializer
+from .models import Product, ProductSlugRedirect, CartItem, Cart, Order, Comment, InsufficientStock, Job
+from .serializers import AddProductSerializer, ProductSerializer, CartItemSerializer, CartSerializer, OrderSerializer, CartOperationSerializer, ProductSearchSerializer, CommentSerializer
 from rest_framework.views import APIView
+from django.db import transaction
+from django.db.models import Prefetch
+from django.shortcuts import get_object_or_404
+from django.http import Http404, HttpResponsePermanentRedirect, StreamingHttpResponse
+from django.urls import reverse
+from django.utils.dateparse import parse_datetime
+from rest_framework.exceptions import ValidationError
+from cstore.renderers import FastJSONRenderer
+from cstore.parsers import FastJSONParser
+from .pagination import ProductCursorPagination, CommentCursorPagination
+from .cache import cached_response, get_cache_stats
+from . import search as product_search
+from . import export as product_export
+from . import importer as product_importer
 
 # ViewSet für Produkte
 class ProductViewSet(viewsets.ModelViewSet):
-    queryset = Product.objects.all()
+    queryset = Product.objects.order_by('id')
     serializer_class = ProductSerializer
+    pagination_class = ProductCursorPagination  # Keyset-Paginierung statt des ganzen Katalogs
     permission_classes = [permissions.IsAuthenticatedOrReadOnly]  # Authentifizierte Benutzer können schreiben, andere nur lesen
 
-# ViewSet für Warenkorbartikel
-class CartItemViewSet(viewsets.ModelViewSet):
+    def get_product_fields(self):
+        # Felder bestimmen, die bei Lesezugriffen ausgeliefert werden (None = alle)
+        if self.action not in ('list', 'retrieve', 'by_slug', 'search'):
+            return None
+        all_fields = ProductSerializer.Meta.fields
+        requested = [f for f in self.request.query_params.get('fields', '').split(',') if f in all_fields]
+        expand = self.request.query_params.get('expand', '').split(',')
+        if requested:
+            fields = requested
+        elif self.action in ('list', 'search'):
+            fields = list(ProductSerializer.LIST_FIELDS)
+        else:
+            fields = [f for f in all_fields if f not in ProductSerializer.EXPANDABLE_FIELDS]
+        # Erweiterbare Felder wie Kommentare nur auf Anfrage hinzufügen
+        fields += [f for f in ProductSerializer.EXPANDABLE_FIELDS if f in expand and f not in fields]
+        return fields
+
+    def get_queryset(self):
+        queryset = super().get_queryset()
+        fields = self.get_product_fields()
+        # Nur Beziehungen vorab laden, die auch serialisiert werden, damit die Anzahl der Abfragen konstant bleibt
+        if fields is None or 'tags' in fields:
+            queryset = queryset.prefetch_related('tags')
+        if fields is None or 'comments' in fields:
+            queryset = queryset.prefetch_related(
+                Prefetch('comments', queryset=Comment.objects.select_related('user'))
+            )
+        return queryset
+
+    def get_serializer(self, *args, **kwargs):
+        fields = self.get_product_fields()
+        if fields is not None:
+            kwargs.setdefault('fields', fields)
+        return super().get_serializer(*args, **kwargs)
+
+    def list(self, request, *args, **kwargs):
+        # Liste über den versionierten Katalog-Cache ausliefern
+        return cached_response(request, lambda: super(ProductViewSet, self).list(request, *args, **kwargs))
+
+    def retrieve(self, request, *args, **kwargs):
+        # Detailansicht über den versionierten Katalog-Cache ausliefern
+        return cached_response(request, lambda: super(ProductViewSet, self).retrieve(request, *args, **kwargs))
+
+    @action(detail=False, methods=['get'], url_path=r'by-slug/(?P<slug>[-\w]+)')
+    def by_slug(self, request, slug=None):
+        # Detailansicht über den eindeutigen Slug, ebenfalls über den Katalog-Cache
+        return cached_response(request, lambda: self.retrieve_by_slug(request, slug))
+
+    def retrieve_by_slug(self, request, slug):
+        # Eine indizierte Abfrage auf den Slug; frühere Slugs werden dauerhaft weitergeleitet
+        product = self.get_queryset().filter(slug=slug).first()
+        if product is not None:
+            return Response(self.get_serializer(product).data)
+        current = ProductSlugRedirect.objects.filter(old_slug=slug).values_list('product__slug', flat=True).first()
+        if current is None:
+            raise Http404
+        location = reverse('product-by-slug', kwargs={'slug': current})
+        if request.META.get('QUERY_STRING'):
+            location += '?' + request.META['QUERY_STRING']
+        return HttpResponsePermanentRedirect(location)
+
+    @action(detail=False, methods=['get'])
+    def search(self, request):
+        # Volltextsuche mit Filtern und Facetten, ebenfalls über den Katalog-Cache
+        return cached_response(request, lambda: self.run_search(request))
+
+    def run_search(self, request):
+        params = ProductSearchSerializer(data=request.query_params)
+        params.is_valid(raise_exception=True)
+        params = params.validated_data
+
+        queryset = self.get_queryset()
+        if 'category' in params:
+            queryset = queryset.filter(category=params['category'])
+        for tag in params['tag']:
+            queryset = queryset.filter(tags__name__iexact=tag)
+        if 'min_price' in params:
+            queryset = queryset.filter(price__gte=params['min_price'])
+        if 'max_price' in params:
+            queryset = queryset.filter(price__lte=params['max_price'])
+        queryset = product_search.search(queryset, params['q'])
+
+        page = queryset[params['offset']:params['offset'] + params['limit']]
+        return Response({
+            'count': queryset.count(),
+            'results': self.get_serializer(page, many=True).data,
+            'facets': product_search.facets(queryset),
+        })
+
+    @action(detail=True, methods=['get'])
+    def comments(self, request, pk=None):
+        # Kommentare eines Produkts seitenweise ausliefern
+        return cached_response(request, lambda: self.list_comments(request, pk))
+
+    def list_comments(self, request, pk):
+        product = get_object_or_404(Product.objects.only('id'), pk=pk)
+        queryset = product.comments.select_related('user')
+        paginator = CommentCursorPagination()
+        page = paginator.paginate_queryset(queryset, request, view=self)
+        return paginator.get_paginated_response(CommentSerializer(page, many=True).data)
+
+    @action(detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser])
+    def cache_stats(self, request):
+        # Treffer-/Fehlzugriffszähler des Katalog-Caches
+        return Response(get_cache_stats())
+
+    @action(
+        detail=False, methods=['post'], url_path='import', permission_classes=[permissions.IsAdminUser],
+        parser_classes=[product_importer.CSVImportParser, product_importer.NDJSONImportParser, FastJSONParser],
+    )
+    def import_products(self, request):
+        # Massenimport als CSV, NDJSON oder JSON-Liste; vorhandene Artikelnummern werden aktualisiert
+        rows = request.data
+        if isinstance(rows, list):
+            rows = enumerate(rows, 1)
+        elif isinstance(rows, dict):
+            return Response({'error': 'Expected a list of products'}, status=status.HTTP_400_BAD_REQUEST)
+        return Response(product_importer.import_products(rows))
+
+    @action(
+        detail=False, methods=['get'], permission_classes=[permissions.IsAdminUser],
+        renderer_classes=[product_export.NDJSONRenderer, product_export.CSVRenderer, FastJSONRenderer],
+    )
+    def export(self, request):
+        # Gesamten Katalog (oder nur seit ?updated_since geänderte Produkte) als Stream ausliefern
+        updated_since = request.query_params.get('updated_since')
+        if updated_since:
+            updated_since = parse_datetime(updated_since)
+            if updated_since is None:
+                raise ValidationError({'updated_since': 'Must be an ISO 8601 timestamp.'})
+
+        queryset, watermark = product_export.export_queryset(updated_since or None)
+        rows = product_export.export_rows(queryset)
+        export_format = request.accepted_renderer.format
+        if export_format == 'csv':
+            chunks = product_export.iter_csv(rows)
+        elif export_format == 'ndjson':
+            chunks = product_export.iter_ndjson(rows)
+        else:
+            chunks = FastJSONRenderer().render_iter(rows)
+
+        response = StreamingHttpResponse(chunks, content_type=request.accepted_renderer.media_type)
+        response['Content-Disposition'] = f'attachment; filename="products.{export_format}"'
+        # Wasserzeichen für den nächsten inkrementellen Export
+        response['X-Export-Watermark'] = watermark.isoformat() if watermark else ''
+        return response
+
+# ViewSet für Warenkorbartikel (Anlegen nur über die Warenkorb-Endpunkte)
+class CartItemViewSet(mixins.UpdateModelMixin, mixins.DestroyModelMixin, viewsets.ReadOnlyModelViewSet):
     queryset = CartItem.objects.all()
     serializer_class = CartItemSerializer
     permission_classes = [permissions.IsAuthenticated]  # Nur authentifizierte Benutzer können zugreifen
 
+    def get_queryset(self):
+        # Nur Artikel aus dem Warenkorb des aktuellen Benutzers zurückgeben
+        return CartItem.objects.filter(cart__user_id=self.request.user.id)
+
+    def perform_update(self, serializer):
+        # Mengenänderung als Differenz über den Warenkorb buchen, damit Cart.total stimmt
+        item = serializer.instance
+        quantity = serializer.validated_data.get('quantity', item.quantity)
+        if quantity != item.quantity:
+            item.cart.apply_operations([(item.product_id, quantity - item.quantity)])
+        item.refresh_from_db()
+
+    def perform_destroy(self, instance):
+        # Zeile über den Warenkorb entfernen (zieht den Zeilenbetrag vom Gesamtbetrag ab)
+        instance.cart.remove_product(instance.product)
+
+def add_product_to_cart(cart, data):
+    # Produkt-ID und Menge prüfen (ganze Zahl >= 1), sonst 400 statt eines kaputten Gesamtbetrags
+    serializer = AddProductSerializer(data=data)
+    serializer.is_valid(raise_exception=True)
+    try:
+        product = Product.objects.get(id=serializer.validated_data['product_id'])
+    except Product.DoesNotExist:
+        return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
+    cart.add_product(product, serializer.validated_data['quantity'])
+    return Response({'status': 'product added'}, status=status.HTTP_200_OK)
+
+def apply_cart_operations(cart, data):
+    # Zeilen einer Sammeländerung einzeln validieren und gültige Zeilen gemeinsam anwenden
+    lines = data.get('operations', []) if isinstance(data, dict) else data
+    if not isinstance(lines, list):
+        return Response({'error': 'Expected a list of operations'}, status=status.HTTP_400_BAD_REQUEST)
+
+    results, operations, positions = [None] * len(lines), [], []
+    for index, line in enumerate(lines):
+        serializer = CartOperationSerializer(data=line)
+        if serializer.is_valid():
+            operations.append((serializer.validated_data['product_id'], serializer.validated_data['quantity']))
+            positions.append(index)
+        else:
+            results[index] = {'status': 'error', 'error': serializer.errors}
+    for index, result in zip(positions, cart.apply_operations(operations)):
+        results[index] = result
+    return Response({'results': results, 'total': cart.total})
+
 # ViewSet für Warenkörbe
 class CartViewSet(viewsets.ModelViewSet):
     queryset = Cart.objects.all()
@@ -25,32 +232,35 @@ class CartViewSet(viewsets.ModelViewSet):
 
     def get_queryset(self):
         # Nur den Warenkorb des aktuellen Benutzers zurückgeben
-        return Cart.objects.filter(user=self.request.user)
+        return Cart.objects.filter(user_id=self.request.user.id)
 
     @action(detail=True, methods=['post'])
     def add_product(self, request, pk=None):
         # Produkt dem Warenkorb hinzufügen
         cart = self.get_object()
-        product_id = request.data.get('product_id')
-        quantity = request.data.get('quantity', 1)
-        product = Product.objects.get(id=product_id)
-        cart.add_product(product, quantity)
-        return Response({'status': 'product added'})
+        return add_product_to_cart(cart, request.data)
 
     @action(detail=True, methods=['post'])
     def remove_product(self, request, pk=None):
         # Produkt aus dem Warenkorb entfernen
         cart = self.get_object()
         product_id = request.data.get('product_id')
-        product = Product.objects.get(id=product_id)
+        try:
+            product = Product.objects.get(id=product_id)
+        except Product.DoesNotExist:
+            return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
         cart.remove_product(product)
         return Response({'status': 'product removed'})
 
+    @action(detail=True, methods=['post'])
+    def batch(self, request, pk=None):
+        # Mehrere Produkte in einer Transaktion hinzufügen oder entfernen
+        return apply_cart_operations(self.get_object(), request.data)
+
     @action(detail=True, methods=['get'])
     def calculate_total(self, request, pk=None):
-        # Gesamtsumme des Warenkorbs berechnen
+        # Gesamtsumme des Warenkorbs zurückgeben (wird bei jeder Änderung inkrementell gepflegt)
         cart = self.get_object()
-        cart.calculate_total()
         return Response({'total': cart.total})
 
 # ViewSet für Bestellungen
@@ -60,19 +270,28 @@ class OrderViewSet(viewsets.ModelViewSet):
     permission_classes = [permissions.IsAuthenticated]  # Nur authentifizierte Benutzer können zugreifen
 
     def get_queryset(self):
-        # Nur Bestellungen des aktuellen Benutzers zurückgeben
-        return Order.objects.filter(user=self.request.user)
+        # Nur Bestellungen des aktuellen Benutzers zurückgeben, neueste zuerst (Index order_user_created_idx).
+        # Die Artikel kommen aus den Bestellzeilen: zwei Abfragen, egal wie viele Bestellungen und Artikel.
+        return Order.objects.filter(user_id=self.request.user.id).select_related('user').prefetch_related(
+            'lines'
+        ).order_by('-created_at')
 
     @action(detail=True, methods=['post'])
     def complete_order(self, request, pk=None):
         # Bestellung abschließen
         order = self.get_object()
-        order.complete_order()
+        try:
+            order.complete_order()
+        except InsufficientStock as exc:
+            # Nicht genug Bestand: nichts wurde gebucht
+            return Response({'error': 'Insufficient stock', 'products': exc.product_ids}, status=status.HTTP_409_CONFLICT)
+        if order.status != 'completed':
+            return Response({'error': f'Order is {order.status}'}, status=status.HTTP_409_CONFLICT)
         return Response({'status': 'order completed'})
 
     @action(detail=True, methods=['post'])
     def cancel_order(self, request, pk=None):
-        # Bestellung stornieren
+        # Bestellung stornieren und reservierten Bestand freigeben
         order = self.get_object()
         order.cancel_order()
         return Response({'status': 'order cancelled'})
@@ -83,15 +302,16 @@ class AddProductToCartView(APIView):
 
     def post(self, request, *args, **kwargs):
         # Produkt dem Warenkorb hinzufügen
-        cart, created = Cart.objects.get_or_create(user=request.user)
-        product_id = request.data.get('product_id')
-        quantity = request.data.get('quantity', 1)
-        try:
-            product = Product.objects.get(id=product_id)
-            cart.add_product(product, quantity)
-            return Response({'status': 'product added'}, status=status.HTTP_200_OK)
-        except Product.DoesNotExist:
-            return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
+        cart, created = Cart.objects.get_or_create(user_id=request.user.id)
+        return add_product_to_cart(cart, request.data)
+
+# APIView für Sammeländerungen am Warenkorb des aktuellen Benutzers
+class BatchCartView(APIView):
+    permission_classes = [permissions.IsAuthenticated]  # Nur authentifizierte Benutzer können zugreifen
+
+    def post(self, request, *args, **kwargs):
+        cart, created = Cart.objects.get_or_create(user_id=request.user.id)
+        return apply_cart_operations(cart, request.data)
 
 # APIView zum Hinzufügen eines Kommentars zu einem Produkt
 class AddProductComment(APIView):
@@ -103,10 +323,17 @@ class AddProductComment(APIView):
         content = request.data.get('content')
 
         try:
-            product = Product.objects.get(id=product_id)
-            comment = Comment.objects.create(user=request.user, content=content)
-            product.comments.add(comment)
-            product.save()
+            product = Product.objects.only('id').get(id=product_id)
+            with transaction.atomic():
+                # Das Hinzufügen aktualisiert Kommentarzähler und Vorschau über ein Signal
+                comment = Comment.objects.create(user_id=request.user.id, content=content)
+                product.comments.add(comment)
+                # Analytics läuft im Hintergrund (store.jobs)
+                Job.enqueue(
+                    'comment.analytics',
+                    {'comment_id': comment.pk, 'product_id': product.pk, 'user_id': request.user.id},
+                    key=f'comment:{comment.pk}:analytics',
+                )
             return Response({'status': 'comment added'}, status=status.HTTP_200_OK)
         except Product.DoesNotExist:
             return Response({'error': 'Product not found'}, status=status.HTTP_404_NOT_FOUND)
@@ -117,7 +344,7 @@ class RemoveProductFromCartView(APIView):
 
     def post(self, request, *args, **kwargs):
         # Produkt aus dem Warenkorb entfernen
-        cart, created = Cart.objects.get_or_create(user=request.user)
+        cart, created = Cart.objects.get_or_create(user_id=request.user.id)
         product_id = request.data.get('product_id')
         try:
             product = Product.objects.get(id=product_id)